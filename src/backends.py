@@ -0,0 +1,331 @@
+"""Storage backends behind `src.utils`.
+
+`persist_dataframe_to_database`, `copy_dataframe_to_database` and `read_sql_query` pick a backend
+from the scheme of their connection string:
+
+* `postgresql+psycopg2://...` (the default `CONN_STR`): the Postgres server managed by the
+  migrations in `src/migrations`.
+* `duckdb:///path/to/finances.duckdb` or `duckdb:///:memory:`: an embedded DuckDB database,
+  created from `tables.sql` on first use. It needs no server, so tests, benchmarks and heavy
+  analytics can run in-process on columnar storage. Requires the optional `duckdb` package.
+
+Backends are cached per connection string, so engines and connections are reused between calls.
+"""
+
+import io
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import MetaData, Table, create_engine, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from src.tracing import trace_statement
+
+DUCKDB_SCHEME = "duckdb://"
+TABLES_SQL = Path(__file__).parent / "tables.sql"
+UPSERT_BATCH_SIZE = 1_000
+
+
+class StorageBackend:
+    """Interface of the storages used by `src.utils`."""
+
+    def upsert(
+        self, df: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> None:
+        """Insert the rows of `df`, updating the rows whose primary key already exists."""
+        raise NotImplementedError
+
+    def bulk_upsert(
+        self, df: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> None:
+        """Same as `upsert`, through the fastest bulk load path of the backend."""
+        self.upsert(df, schema, table, pk_columns)
+
+    def append(self, df: pd.DataFrame, schema: str, table: str, **kwargs) -> None:
+        """Insert the rows of `df` without checking for existing keys."""
+        raise NotImplementedError
+
+    def query(self, query: str, params: dict | None = None) -> pd.DataFrame:
+        """Execute `query` and return its result."""
+        raise NotImplementedError
+
+    def diff_rows(
+        self, hashes: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> pd.DataFrame:
+        """Compare incoming row hashes with the stored ones in a single set-based query.
+
+        `hashes` holds the primary key, `_row_hash` and `_row` (the position of the incoming
+        row). Returns the `_row` and `status` ("new" or "changed") of the rows to write.
+        """
+        raise NotImplementedError
+
+    @contextmanager
+    def lock(self, lock_ids: list[int]):
+        """Hold the exclusive locks `lock_ids`, acquired in the given order, during the block.
+
+        The default locks are process-local, enough for an embedded database only one process
+        opens. Locks are not reentrant: a block must not take a lock it already holds.
+        """
+        locks = [_local_lock(lock_id) for lock_id in lock_ids]
+        acquired = []
+        try:
+            for local_lock in locks:
+                local_lock.acquire()
+                acquired.append(local_lock)
+            yield
+        finally:
+            for local_lock in reversed(acquired):
+                local_lock.release()
+
+
+_LOCAL_LOCKS: dict[int, threading.Lock] = {}
+_LOCAL_LOCKS_GUARD = threading.Lock()
+
+
+def _local_lock(lock_id: int) -> threading.Lock:
+    with _LOCAL_LOCKS_GUARD:
+        return _LOCAL_LOCKS.setdefault(lock_id, threading.Lock())
+
+
+class PostgresBackend(StorageBackend):
+    def __init__(self, conn_str: str):
+        self.engine = create_engine(conn_str)
+
+    def upsert(
+        self, df: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> None:
+        # A key repeated in the same statement cannot be updated twice, the last row wins. Rows
+        # are written in key order, so concurrent upserts lock shared rows in the same order
+        # instead of deadlocking.
+        df = df.drop_duplicates(subset=pk_columns, keep="last").sort_values(pk_columns)
+        t = Table(table, MetaData(schema=schema), autoload_with=self.engine)
+        records = df.to_dict(orient="records")
+        with self.engine.begin() as conn:
+            for start in range(0, len(records), UPSERT_BATCH_SIZE):
+                stmt = pg_insert(t).values(records[start:start + UPSERT_BATCH_SIZE])
+                update_cols = {c: stmt.excluded[c] for c in df.columns if c not in pk_columns}
+                if update_cols:
+                    stmt = stmt.on_conflict_do_update(index_elements=pk_columns, set_=update_cols)
+                else:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=pk_columns)
+                conn.execute(stmt)
+
+    def bulk_upsert(
+        self, df: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> None:
+        # Rows are streamed as CSV with COPY into a temporary table, then merged into the
+        # target table with a single `INSERT ... ON CONFLICT DO UPDATE`, in key order as in
+        # `upsert`.
+        df = df.drop_duplicates(subset=pk_columns, keep="last")
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        keys = ", ".join(pk_columns)
+        on_conflict = _on_conflict_clause(df.columns, pk_columns)
+        buffer = io.StringIO()
+        df.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        raw_conn = self.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                cursor.execute(
+                    # Defaults keep the NOT NULL columns the frame leaves out valid, as in
+                    # `upsert`.
+                    f"CREATE TEMP TABLE _copy_staging (LIKE {schema}.{table} INCLUDING DEFAULTS)"
+                    " ON COMMIT DROP"
+                )
+                copy = f"COPY _copy_staging ({columns}) FROM STDIN WITH (FORMAT csv)"
+                with trace_statement(copy) as traced:
+                    cursor.copy_expert(copy, buffer)
+                    traced["rows"] = cursor.rowcount
+                merge = f"""
+                    INSERT INTO {schema}.{table} ({columns})
+                    SELECT {columns} FROM _copy_staging ORDER BY {keys}
+                    ON CONFLICT ({keys}) {on_conflict}
+                    """
+                with trace_statement(merge) as traced:
+                    cursor.execute(merge)
+                    traced["rows"] = cursor.rowcount
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+    def diff_rows(
+        self, hashes: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> pd.DataFrame:
+        columns = ", ".join(f'"{col}"' for col in hashes.columns)
+        key_columns = ", ".join(f'"{col}"' for col in pk_columns)
+        buffer = io.StringIO()
+        hashes.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+
+        raw_conn = self.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                cursor.execute(
+                    f"""
+                    CREATE TEMP TABLE _diff_staging ON COMMIT DROP AS
+                    SELECT {key_columns}, _row_hash, 0::BIGINT AS _row
+                    FROM {schema}.{table} WITH NO DATA
+                    """
+                )
+                copy = f"COPY _diff_staging ({columns}) FROM STDIN WITH (FORMAT csv)"
+                with trace_statement(copy) as traced:
+                    cursor.copy_expert(copy, buffer)
+                    traced["rows"] = cursor.rowcount
+                diff = _diff_query("_diff_staging", schema, table, pk_columns)
+                with trace_statement(diff) as traced:
+                    cursor.execute(diff)
+                    rows = cursor.fetchall()
+                    traced["rows"] = len(rows)
+            raw_conn.commit()
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+        return pd.DataFrame(rows, columns=["_row", "status"])
+
+    def append(self, df: pd.DataFrame, schema: str, table: str, **kwargs) -> None:
+        df.to_sql(
+            name=table, schema=schema, con=self.engine, if_exists="append", index=False, **kwargs
+        )
+
+    def query(self, query: str, params: dict | None = None) -> pd.DataFrame:
+        with self.engine.connect() as connection:
+            if params is None:
+                return pd.read_sql_query(query, connection)
+            return pd.read_sql_query(text(query), connection, params=params)
+
+    @contextmanager
+    def lock(self, lock_ids: list[int]):
+        # Session-level advisory locks, held by a dedicated connection for the whole block, so
+        # they are shared by every process and host using the database.
+        with self.engine.connect() as connection:
+            try:
+                for lock_id in lock_ids:
+                    connection.execute(text("SELECT pg_advisory_lock(:id)"), {"id": lock_id})
+                connection.commit()
+                yield
+            finally:
+                connection.rollback()
+                connection.execute(text("SELECT pg_advisory_unlock_all()"))
+                connection.commit()
+
+
+class DuckDBBackend(StorageBackend):
+    """Embedded DuckDB database.
+
+    The connection is shared by the threads of the process, each query using its own cursor.
+    Writes are serialized. Keys repeated in an upserted frame keep their last row, as in Postgres.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError(
+                "The DuckDB backend needs the duckdb package: pip install duckdb"
+            ) from e
+        self.path = path
+        self.connection = duckdb.connect(path)
+        self._lock = threading.Lock()
+        self.connection.execute(TABLES_SQL.read_text())
+
+    def _cursor(self):
+        return self.connection.cursor()
+
+    def upsert(
+        self, df: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> None:
+        df = df.drop_duplicates(subset=pk_columns, keep="last")
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        keys = ", ".join(f'"{col}"' for col in pk_columns)
+        on_conflict = _on_conflict_clause(df.columns, pk_columns)
+        self._insert(
+            df,
+            f"INSERT INTO {schema}.{table} ({columns}) SELECT {columns} FROM _staging"
+            f" ON CONFLICT ({keys}) {on_conflict}",
+        )
+
+    def append(self, df: pd.DataFrame, schema: str, table: str, **kwargs) -> None:
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        self._insert(
+            df, f"INSERT INTO {schema}.{table} ({columns}) SELECT {columns} FROM _staging"
+        )
+
+    def _insert(self, df: pd.DataFrame, statement: str) -> None:
+        # Registering the frame lets DuckDB scan it in place, without serializing any row.
+        with self._lock:
+            cursor = self._cursor()
+            try:
+                cursor.register("_staging", df)
+                cursor.execute(statement)
+            finally:
+                cursor.unregister("_staging")
+                cursor.close()
+
+    def diff_rows(
+        self, hashes: pd.DataFrame, schema: str, table: str, pk_columns: list[str]
+    ) -> pd.DataFrame:
+        cursor = self._cursor()
+        try:
+            cursor.register("_diff_staging", hashes)
+            return cursor.execute(_diff_query("_diff_staging", schema, table, pk_columns)).df()
+        finally:
+            cursor.unregister("_diff_staging")
+            cursor.close()
+
+    def query(self, query: str, params: dict | None = None) -> pd.DataFrame:
+        cursor = self._cursor()
+        try:
+            if params is None:
+                return cursor.execute(query).df()
+            # Parameters are written SQLAlchemy style (:name), DuckDB expects $name.
+            return cursor.execute(_NAMED_PARAM.sub(r"$\1", query), params).df()
+        finally:
+            cursor.close()
+
+
+_NAMED_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+
+def _on_conflict_clause(columns: list[str], pk_columns: list[str]) -> str:
+    update_cols = ", ".join(
+        f'"{col}" = EXCLUDED."{col}"' for col in columns if col not in pk_columns
+    )
+    return f"DO UPDATE SET {update_cols}" if update_cols else "DO NOTHING"
+
+
+def _diff_query(staging: str, schema: str, table: str, pk_columns: list[str]) -> str:
+    join = " AND ".join(f's."{col}" = t."{col}"' for col in pk_columns)
+    return f"""
+        SELECT s._row, CASE WHEN t."{pk_columns[0]}" IS NULL THEN 'new' ELSE 'changed' END AS status
+        FROM {staging} s
+        LEFT JOIN {schema}.{table} t ON {join}
+        WHERE t._row_hash IS DISTINCT FROM s._row_hash
+    """
+
+
+_BACKENDS_GUARD = threading.Lock()
+
+
+def get_backend(conn_str: str) -> StorageBackend:
+    """Return the backend of `conn_str`, creating it on the first call."""
+    # Threads of a concurrent ingestion may ask for a new backend at once, and an embedded
+    # database must only be opened once.
+    with _BACKENDS_GUARD:
+        return _create_backend(conn_str)
+
+
+@lru_cache(maxsize=None)
+def _create_backend(conn_str: str) -> StorageBackend:
+    if conn_str.startswith(DUCKDB_SCHEME):
+        return DuckDBBackend(conn_str[len(DUCKDB_SCHEME):].removeprefix("/"))
+    return PostgresBackend(conn_str)
@@ -0,0 +1,188 @@
+"""Monthly capital gains tax (DARF) of the swing-trade sales of `stocks.transactions`.
+
+Brazilian swing-trade gains are taxed month by month:
+
+- stock sales are exempt in months whose stock sales total at most R$20,000 (`EXEMPTION_LIMIT`);
+- gains of the other months, and of ETFs and BDRs in every month, are taxed at 15%;
+- FIIs are taxed at 20%, without exemption, and their losses only offset FII gains;
+- losses are carried forward without limit, exempt months included, and offset later gains;
+- taxes below R$10 (`DARF_MINIMUM`) are not paid but added to the next month's DARF.
+
+The realized result of each sale comes from the stored average price, `sold * (price -
+avg_price) - taxes`, as the average price a sale leaves is the one it sold at. Sales are
+aggregated into one row per month in a single vectorized pass over the ledger. Losses carried
+forward are the reflected cumulative sum of the monthly results, so every month is computed at
+once as well. Day trades are not told apart from swing trades.
+
+Asset classes come from `ASSET_CLASSES`, tickers missing there being stocks. Monthly results are
+cached until the ledger changes, and `run` persists them to `stocks.darf_monthly`.
+
+Usage:
+    python -m src.darf
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.utils import (
+    CONN_STR,
+    cache_on_tables_watermark,
+    copy_dataframe_to_database,
+    read_sql_query,
+)
+
+SOURCE_TABLES = ["stocks.transactions"]
+EXEMPTION_LIMIT = 20_000.0
+DARF_MINIMUM = 10.0
+# Loss pools, with their tax rates. Stocks, ETFs and BDRs share the "common" pool.
+RATES = {"common": 0.15, "fii": 0.20}
+# Asset class of the tickers that are not stocks: "etf", "bdr" or "fii".
+ASSET_CLASSES: dict[str, str] = {}
+
+MONTHLY_COLUMNS = ["stock_sales", "sales", "stock_result", "other_result", "fii_result"]
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+
+def get_monthly_sales(
+    sales: pd.DataFrame, asset_classes: dict[str, str] = ASSET_CLASSES
+) -> pd.DataFrame:
+    """Aggregate the sales of the ledger by month.
+
+    Parameters
+    ----------
+    sales : pd.DataFrame
+        Transactions with columns date, ticker, quantity, price, taxes and avg_price. Purchases
+        (positive quantities) are ignored.
+    asset_classes : dict[str, str]
+        Asset class of the tickers that are not stocks.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed by year_month, the months with sales, with the gross `stock_sales` and `sales`
+        and the realized results of stocks (`stock_result`), ETFs and BDRs (`other_result`)
+        and FIIs (`fii_result`).
+    """
+    sales = sales[sales["quantity"] < 0]
+    sold = -sales["quantity"].to_numpy(dtype=float)
+    price = sales["price"].to_numpy(dtype=float)
+    value = sold * price
+    cost = sold * sales["avg_price"].to_numpy(dtype=float)
+    result = value - sales["taxes"].to_numpy(dtype=float) - cost
+    asset_class = sales["ticker"].map(asset_classes).fillna("stock").to_numpy()
+    is_stock, is_fii = asset_class == "stock", asset_class == "fii"
+    monthly = pd.DataFrame({
+        "year_month": _to_month(sales["date"]).to_numpy(),
+        "stock_sales": np.where(is_stock, value, 0.0),
+        "sales": value,
+        "stock_result": np.where(is_stock, result, 0.0),
+        "other_result": np.where(~is_stock & ~is_fii, result, 0.0),
+        "fii_result": np.where(is_fii, result, 0.0),
+    })
+    return monthly.groupby("year_month").sum()[MONTHLY_COLUMNS]
+
+
+def compute_darf(monthly: pd.DataFrame) -> pd.DataFrame:
+    """Compute the tax of every month of `monthly`, as returned by `get_monthly_sales`.
+
+    Returns
+    -------
+    pd.DataFrame
+        `monthly` with the columns exempt, exempt_gains, the taxable base and the loss carried
+        at the end of the month of each pool (common_taxable, common_loss_carried, fii_taxable,
+        fii_loss_carried), tax, darf_due and tax_carried (below `DARF_MINIMUM`, paid later).
+    """
+    stock_result = monthly["stock_result"].to_numpy(dtype=float)
+    exempt = monthly["stock_sales"].to_numpy(dtype=float) <= EXEMPTION_LIMIT
+    # Exempt months keep the stock losses, to be carried forward, but not the gains.
+    stock_taxable = np.where(exempt, np.minimum(stock_result, 0.0), stock_result)
+    results = np.column_stack([
+        monthly["other_result"].to_numpy(dtype=float) + stock_taxable,
+        monthly["fii_result"].to_numpy(dtype=float),
+    ])
+
+    # The loss carried follows L[t] = max(0, L[t - 1] - result[t]), a cumulative sum reflected
+    # at zero: L[t] = S[t] - min(0, min(S[:t + 1])), with S the cumulative sum of -result.
+    sums = np.cumsum(-results, axis=0)
+    loss = sums - np.minimum(np.minimum.accumulate(sums, axis=0), 0.0)
+    previous_loss = np.vstack([np.zeros(2), loss])[:-1]
+    taxable = np.maximum(results - previous_loss, 0.0)
+    tax = taxable @ np.array(list(RATES.values()))
+
+    darf_due, tax_carried = _apply_darf_minimum(tax)
+    return monthly.assign(
+        exempt=exempt,
+        exempt_gains=np.where(exempt, np.maximum(stock_result, 0.0), 0.0),
+        common_taxable=taxable[:, 0],
+        common_loss_carried=loss[:, 0],
+        fii_taxable=taxable[:, 1],
+        fii_loss_carried=loss[:, 1],
+        tax=tax,
+        darf_due=darf_due,
+        tax_carried=tax_carried,
+    )
+
+
+def _apply_darf_minimum(tax: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # One step per month: the threshold resets the carried tax, which no cumulative sum does.
+    carried = 0.0
+    darf_due = np.zeros(len(tax))
+    tax_carried = np.zeros(len(tax))
+    for i, month_tax in enumerate(tax.tolist()):
+        carried += month_tax
+        if carried >= DARF_MINIMUM:
+            darf_due[i], carried = carried, 0.0
+        tax_carried[i] = carried
+    return darf_due, tax_carried
+
+
+@cache_on_tables_watermark(SOURCE_TABLES)
+def compute_darf_monthly(*, conn_str: str = CONN_STR) -> pd.DataFrame:
+    """Compute the DARF table of every month with sales in the database.
+
+    Results are cached until `stocks.transactions` changes.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per month, as returned by `compute_darf`, with a year_month column.
+    """
+    sales = read_sql_query(
+        """
+        SELECT date, ticker, quantity, price, taxes, avg_price
+        FROM stocks.transactions
+        WHERE quantity < 0
+        """,
+        conn_str,
+    )
+    return compute_darf(get_monthly_sales(sales)).reset_index()
+
+
+def run(conn_str: str = CONN_STR) -> None:
+    """Persist the DARF table, writing only the months that changed."""
+    darf = compute_darf_monthly(conn_str=conn_str)
+    copy_dataframe_to_database(
+        darf.assign(year_month=lambda df: df["year_month"].dt.date),
+        "stocks",
+        "darf_monthly",
+        pk_columns=["year_month"],
+        assign_processed_at_column=True,
+        conn_str=conn_str,
+        diff=True,
+    )
+    due = darf[darf["darf_due"] > 0]
+    if not due.empty:
+        last = due.iloc[-1]
+        logging.info(f"Last DARF due: R${last['darf_due']:.2f} for {last['year_month']:%Y-%m}.")
+
+
+def _to_month(dates: pd.Series) -> pd.Series:
+    return pd.to_datetime(dates).dt.to_period("M").dt.to_timestamp()
+
+
+if __name__ == "__main__":
+    with pd.option_context("display.max_rows", None, "display.width", 250):
+        print(compute_darf_monthly())
@@ -1,5 +1,4 @@
 """Fetch and persist currency prices from AwesomeAPI."""
-import requests
 import psycopg2
 from psycopg2 import OperationalError
 from datetime import datetime
@@ -8,6 +7,8 @@ import pandas as pd
 from dateutil.relativedelta import relativedelta
 import logging
 
+from .sessions import get_session
+
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 
 
@@ -46,7 +47,7 @@ def get_awesome_close_prices(
     )
 
     try:
-        response = requests.get(url, timeout=5)
+        response = get_session().get(url, timeout=5)
         response.raise_for_status()
         json_data = response.json()
         if isinstance(json_data, list) and len(json_data) > 0:
@@ -0,0 +1,206 @@
+"""Resumable historical backfills of quotation series.
+
+A backfill splits its date range into windows sized for the provider, fetches them with bounded
+concurrency and bulk upserts each one as soon as it arrives, so memory and transaction size do
+not grow with the range. Every completed window is recorded in `currencies.backfill_progress`;
+running the same backfill again skips them, resuming an interrupted run where it stopped.
+
+Providers report errors by returning nothing, so windows without data are not recorded and are
+fetched again by the next run.
+
+Usage:
+    python -m src.data_ingestion.data_ingestion --mode backfill --provider yfinance \\
+        --symbol ^GSPC --asset S&P500 --currency USD --start_date 2000-01-01
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+from src.locks import ingestion_lock
+from src.utils import (
+    CONN_STR,
+    copy_dataframe_to_database,
+    persist_dataframe_to_database,
+    read_sql_query,
+)
+
+PROGRESS_SCHEMA = "currencies"
+PROGRESS_TABLE = "backfill_progress"
+PROGRESS_PK = ["asset", "currency", "window_start", "window_end"]
+QUOTATIONS_PK = ["date", "asset", "currency"]
+
+# Window of each provider. Binance returns at most 1000 daily klines per request and IPEA
+# downloads the whole series at once, so it is fetched in a single window.
+WINDOWS = {
+    "awesome": relativedelta(days=90),
+    "binance": relativedelta(days=365),
+    "yfinance": relativedelta(years=5),
+    "ipea": None,
+}
+
+Window = tuple[date, date]
+
+
+def split_windows(start: date, end: date, window: relativedelta | None) -> list[Window]:
+    """Split the days from `start` to `end` into consecutive windows of at most `window`.
+
+    Each window ends on the day the next one starts, and the last one on the day after `end`.
+    This covers providers with exclusive end dates (yfinance); the others fetch the shared day
+    twice, which the upsert absorbs.
+    """
+    stop = end + relativedelta(days=1)
+    if window is None:
+        return [(start, stop)]
+    windows = []
+    while start < stop:
+        windows.append((start, min(start + window, stop)))
+        start = windows[-1][1]
+    return windows
+
+
+def get_completed_windows(asset: str, currency: str, conn_str: str = CONN_STR) -> set[Window]:
+    """Return the windows already backfilled for the series of `asset` in `currency`."""
+    done = read_sql_query(
+        f"""
+        SELECT window_start, window_end
+        FROM {PROGRESS_SCHEMA}.{PROGRESS_TABLE}
+        WHERE asset = :asset AND currency = :currency
+        """,
+        conn_str,
+        params={"asset": asset, "currency": currency},
+    )
+    return set(zip(
+        pd.to_datetime(done["window_start"]).dt.date, pd.to_datetime(done["window_end"]).dt.date
+    ))
+
+
+def backfill_window(
+    fetch_function: callable,
+    provider: str,
+    symbol: str,
+    asset: str,
+    currency: str,
+    window: Window,
+    table_schema: str = "currencies",
+    table_name: str = "quotations",
+    conn_str: str = CONN_STR,
+) -> int:
+    """Fetch, upsert and checkpoint one window, returning the number of rows written.
+
+    The window is locked meanwhile, and skipped if a concurrent backfill completed it first.
+    """
+    start, end = window
+    with ingestion_lock(
+        (f"{PROGRESS_SCHEMA}.{PROGRESS_TABLE}", f"{asset}/{currency}/{start}"),
+        conn_str=conn_str,
+    ):
+        if window in get_completed_windows(asset, currency, conn_str):
+            logging.info(f"{symbol} from {start} to {end} was backfilled concurrently.")
+            return 0
+        data = fetch_function(
+            symbol=symbol, start_date=start.strftime("%Y-%m-%d"), end_date=end.strftime("%Y-%m-%d")
+        )
+        if data is None:
+            raise RuntimeError(f"{provider} returned no data for {symbol} from {start} to {end}.")
+        if not data.empty:
+            copy_dataframe_to_database(
+                data.assign(asset=asset, currency=currency),
+                table_schema,
+                table_name,
+                QUOTATIONS_PK,
+                assign_processed_at_column=True,
+                conn_str=conn_str,
+            )
+        progress = pd.DataFrame([{
+            "asset": asset,
+            "currency": currency,
+            "window_start": start,
+            "window_end": end,
+            "provider": provider,
+            "symbol": symbol,
+            "n_rows": len(data),
+        }])
+        persist_dataframe_to_database(
+            progress, PROGRESS_SCHEMA, PROGRESS_TABLE, True, conn_str, pk_columns=PROGRESS_PK
+        )
+        return len(data)
+
+
+def backfill_series(
+    fetch_function: callable,
+    provider: str,
+    symbol: str,
+    asset: str,
+    currency: str,
+    start_date: str,
+    end_date: str | None = None,
+    max_workers: int = 4,
+    table_schema: str = "currencies",
+    table_name: str = "quotations",
+    conn_str: str = CONN_STR,
+) -> dict[Window, Exception]:
+    """Backfill a quotation series from `start_date`, skipping the windows already done.
+
+    Parameters
+    ----------
+    fetch_function : callable
+        Provider function, see `data_ingestion.PROVIDERS`.
+    provider : str
+        Provider name, which sets the window size (see `WINDOWS`).
+    symbol : str
+        Symbol passed to the provider.
+    asset : str
+        Asset code stored in the database.
+    currency : str
+        Currency code stored in the database.
+    start_date : str
+        First day to backfill, in format "%Y-%m-%d".
+    end_date : str, optional
+        Last day to backfill, in format "%Y-%m-%d". Defaults to today.
+    max_workers : int
+        Number of windows fetched at once.
+
+    Returns
+    -------
+    dict[tuple[date, date], Exception]
+        Error of each failed window. Failed windows are retried by the next run.
+    """
+    windows = split_windows(
+        datetime.strptime(start_date, "%Y-%m-%d").date(),
+        datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else datetime.now().date(),
+        WINDOWS[provider],
+    )
+    done = get_completed_windows(asset, currency, conn_str)
+    pending = [window for window in windows if window not in done]
+    logging.info(f"Backfilling {symbol}: {len(pending)} of {len(windows)} windows pending.")
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                backfill_window,
+                fetch_function,
+                provider,
+                symbol,
+                asset,
+                currency,
+                window,
+                table_schema,
+                table_name,
+                conn_str,
+            ): window
+            for window in pending
+        }
+        for future in as_completed(futures):
+            start, end = window = futures[future]
+            try:
+                n_rows = future.result()
+                logging.info(f"Backfilled {n_rows} rows of {symbol} from {start} to {end}.")
+            except Exception as error:
+                logging.error(f"Could not backfill {symbol} from {start} to {end}: {error}")
+                errors[window] = error
+    return errors
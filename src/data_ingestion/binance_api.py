@@ -1,13 +1,25 @@
 import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 from functools import partial
 
 import pandas as pd
-import requests
 import os
 
+from .sessions import get_session
+
 BASE_URL = "https://api.binance.com/api/v3/"
+KLINES_LIMIT = 1000
+INTERVAL_MINUTES = {
+    "1m": 1,
+    "5m": 5,
+    "15m": 15,
+    "30m": 30,
+    "1h": 60,
+    "4h": 240,
+    "1d": 1440,
+}
 
 format_date = partial(lambda x: int(datetime.strptime(x, "%Y-%m-%d").timestamp() * 1000))
 
@@ -25,7 +37,7 @@ def get_binance_close_prices(
             - relativedelta(days=1), "%Y-%m-%d"
         )
     )
-    response = requests.get(
+    response = get_session().get(
         os.path.join(BASE_URL, "klines"),
         params={
             "symbol": symbol.upper(),
@@ -48,3 +60,70 @@ def get_binance_close_prices(
             ).dt.date
         )
     )
+
+
+def get_binance_klines(
+    symbol: str,
+    start_date: str,
+    end_date: str,
+    interval: str = "1h",
+    max_workers: int = 8,
+) -> pd.DataFrame | None:
+    """Fetch OHLCV candles of a given interval for a symbol between start_date and end_date.
+
+    The range is split into pages of `KLINES_LIMIT` candles, which are requested concurrently.
+
+    Parameters
+    ----------
+    symbol : str
+        Binance symbol, e.g. "BTCUSDT".
+    start_date : str
+        The start date in 'YYYY-MM-DD' format.
+    end_date : str
+        The end date in 'YYYY-MM-DD' format, inclusive.
+    interval : str
+        One of `INTERVAL_MINUTES` keys.
+    max_workers : int
+        Maximum number of concurrent requests.
+
+    Returns
+    -------
+    pd.DataFrame or None
+        Candles with columns ts, open, high, low, close and volume, or None if there is no data.
+    """
+    page_ms = INTERVAL_MINUTES[interval] * 60 * 1000 * KLINES_LIMIT
+    start_ms = format_date(start_date)
+    end_ms = format_date(end_date) + 24 * 60 * 60 * 1000 - 1
+
+    def fetch_page(page_start: int) -> list:
+        response = get_session().get(
+            os.path.join(BASE_URL, "klines"),
+            params={
+                "symbol": symbol.upper(),
+                "interval": interval,
+                "startTime": page_start,
+                "endTime": min(page_start + page_ms - 1, end_ms),
+                "limit": KLINES_LIMIT,
+            },
+            timeout=10,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pages = list(executor.map(fetch_page, range(start_ms, end_ms + 1, page_ms)))
+
+    rows = [row for page in pages for row in page]
+    if not rows:
+        return None
+
+    return (
+        pd.DataFrame(
+            [row[:6] for row in rows],
+            columns=["ts", "open", "high", "low", "close", "volume"],
+        )
+        .astype({"open": float, "high": float, "low": float, "close": float, "volume": float})
+        .assign(ts=lambda df: pd.to_datetime(df["ts"], unit="ms"))
+        .drop_duplicates("ts")
+        .sort_values("ts", ignore_index=True)
+    )
@@ -6,24 +6,58 @@ processes transaction files downloaded from the Binance website. It parses swaps
 
 Main Functions:
 - solve_parseable_swaps: Parses standard swap operations.
+- reconcile_multi_fill_swaps: Aggregates partial fills of swaps with more than 3 rows.
 - solve_parseable_binance_convert: Handles Binance Convert operations.
 - get_binance_earn: Extracts staking and earn rewards.
 - get_airdrop_assets: Processes airdrop transactions.
 - get_brl_deposits: Extracts BRL deposit records.
-- parse_binance_report: Orchestrates parsing and returns all relevant tables.
-- persist_transactions_database: Persists parsed data to the database.
+- parse_binance_report: Orchestrates parsing and returns all relevant tables, with pandas or
+  polars.
+- parse_binance_report_parallel: Same as above, sharding the report by account and month in a
+  process pool.
+- persist_transactions_database: Persists parsed data to the database, account by account.
 - run: Main entry point for reading, parsing, and persisting Binance transaction data.
 
+`BINANCE_STATEMENT` registers the report with the exchange statements engine, so it also loads
+with `python -m src.data_ingestion.exchange_statements --exchange binance PATH [PATH ...]`. Only
+the column renames, account ids and persistence are shared, though: the report is a ledger, one
+row per balance change, so its `parse` replaces the engine's classifiers and table builders,
+which only Coinext and Biscoint use.
+
+Reports may mix the exports of several accounts, told apart by their `User_ID`, which becomes the
+`account_id` of every parsed row. Each account is parsed on its own, so swaps of two accounts at
+the same second are never paired together, and persisted in parallel with the others under its
+own locks, writing its own manual inspection file. Records stored before accounts existed were
+moved to the "default" account by migration 0008, manually inserted keys included; the reports of
+their owner, the `User_ID` set in `FINANCES_BINANCE_DEFAULT_USER_ID`, keep that account so they
+still match them.
+
 Usage:
     Run this module directly or call the `run()` function with a list of CSV file paths containing
     Binance transactions.
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from functools import partial
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
+from ..locks import ingestion_lock
 from ..utils import persist_dataframe_to_database, read_sql_query
+from .exchange_statements import (
+    ACCOUNT_COLUMN,
+    DEFAULT_ACCOUNT,
+    PK_COLUMNS,
+    StatementSpec,
+    account_locks,
+    assign_account_ids,
+    parse_statement,
+    split_accounts,
+)
 
 import logging
 
@@ -32,6 +66,9 @@ SWAP_CATEGS = [
     ["Transaction Spend", "Transaction Buy", "Transaction Fee"],
     ["Transaction Revenue", "Transaction Fee", "Transaction Sold"]
 ]
+# Every swap leg once: "Transaction Fee" is in both flavours. Legs are selected with this list
+# rather than per flavour, since identical rows of an id are distinct partial fills.
+SWAP_OPERATIONS = list(dict.fromkeys(SWAP_CATEGS[0] + SWAP_CATEGS[1]))
 SWAP_TABLE_COLS = [
     "id",
     "date",
@@ -44,6 +81,28 @@ SWAP_TABLE_COLS = [
     "exchange_name",
 ]
 
+SWAP_LEG_ROLES = {
+    "Transaction Buy": "received",
+    "Transaction Revenue": "received",
+    "Transaction Spend": "paid",
+    "Transaction Sold": "paid",
+    "Transaction Fee": "paid_taxes",
+}
+SWAP_PIVOT_OPERATIONS = [
+    "Transaction Buy",
+    "Transaction Revenue",
+    "Transaction Spend",
+    "Transaction Sold",
+    "Transaction Fee",
+]
+
+ID_FORMAT = "%Y-%m-%d %H:%M:%S"
+ID_KEY = "id_key"
+# User_ID whose rows get DEFAULT_ACCOUNT, the account of the records stored before accounts.
+DEFAULT_USER_ID = os.environ.get("FINANCES_BINANCE_DEFAULT_USER_ID")
+# Each account writes its records to this path suffixed by its id, see `get_account_path`.
+MANUAL_INSPECTION_PATH = "/home/ubuntu/finances/binance_manual_inspection.csv"
+
 format_date = partial(
     lambda x: int(datetime.strptime(x, "%Y-%m-%d").timestamp() * 1000)
 )
@@ -55,12 +114,16 @@ def solve_parseable_swaps(df: pd.DataFrame) -> pd.DataFrame:
     They are automatically parseable. Other swaps with more rows need manual input, and need
     to be treated separately and manually.
     """
+    clean_swaps = df.merge(_get_dates_with_clean_swap(df))
+    if clean_swaps.empty:
+        return pd.DataFrame(columns=SWAP_TABLE_COLS)
+
     result = (
-        df.merge(_get_dates_with_clean_swap(df))
-        .groupby(["User_ID", "id", "Account", "Operation", "Coin"], as_index=False)
+        clean_swaps
+        .groupby([ACCOUNT_COLUMN, "id", "Account", "Operation", "Coin"], as_index=False)
         .sum()
         .pivot(
-            index=["User_ID", "id", "Account"],
+            index=[ACCOUNT_COLUMN, "id", "Account"],
             columns=["Operation"],
             values=["Change", "Coin"],
         )
@@ -71,13 +134,22 @@ def solve_parseable_swaps(df: pd.DataFrame) -> pd.DataFrame:
             ).dt.date,
             exchange_name="binance",
         )
-        .drop(columns=["User_ID", "Account"])
+        .drop(columns=[ACCOUNT_COLUMN, "Account"])
     )
 
     result.columns = [
         "_".join(col).strip("_") if isinstance(col, tuple) else col
         for col in result.columns.values
     ]
+    # A subset of the report (e.g. a single month) may not contain every swap flavour.
+    result = result.reindex(
+        columns=list(result.columns) + [
+            f"{value}_{operation}"
+            for value in ["Change", "Coin"]
+            for operation in SWAP_PIVOT_OPERATIONS
+            if f"{value}_{operation}" not in result.columns
+        ]
+    )
     result["Change_Transaction Buy"] = result["Change_Transaction Buy"].fillna(
         result["Change_Transaction Revenue"]
     )
@@ -109,11 +181,76 @@ def solve_parseable_swaps(df: pd.DataFrame) -> pd.DataFrame:
     return result[SWAP_TABLE_COLS]
 
 
+def reconcile_multi_fill_swaps(
+    manual_input_swaps: pd.DataFrame,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Turn swaps split in several partial fills into single swaps.
+
+    Legs under the same id are grouped by role (received, paid or fee) and coin, and their
+    changes summed. Ids left with exactly one received coin, one paid coin and at most one fee
+    coin are balanced swaps.
+
+    Only those are reconciled, as a `crypto.swaps` row holds a single coin per role. Ids with
+    several received or paid coins, e.g. one spend buying two coins, or with fees charged in
+    more than one coin, e.g. partly in BNB, are left for manual input: splitting them would
+    need a way to tell which legs belong together, which the report does not give.
+
+    Parameters
+    ----------
+    manual_input_swaps : pd.DataFrame
+        Swap legs not solved by `solve_parseable_swaps`, as returned by
+        `get_manual_input_needed_swaps`.
+
+    Returns
+    -------
+    tuple[pd.DataFrame, pd.DataFrame]
+        The reconciled swaps, with the columns of `SWAP_TABLE_COLS`, and the legs of the ids
+        that still need manual input.
+    """
+    legs = manual_input_swaps.assign(role=lambda df: df["Operation"].map(SWAP_LEG_ROLES))
+    aggregated = legs.groupby(["id", "role", "Coin"], as_index=False)["Change"].sum()
+
+    coins_per_role = (
+        aggregated.groupby(["id", "role"]).size()
+        .unstack("role")
+        .reindex(columns=["received", "paid", "paid_taxes"])
+        .fillna(0)
+    )
+    balanced_ids = coins_per_role.index[
+        (coins_per_role["received"] == 1)
+        & (coins_per_role["paid"] == 1)
+        & (coins_per_role["paid_taxes"] <= 1)
+    ]
+    balanced = aggregated[aggregated["id"].isin(balanced_ids)]
+    if balanced.empty:
+        return pd.DataFrame(columns=SWAP_TABLE_COLS), manual_input_swaps
+
+    roles = ["received", "paid", "paid_taxes"]
+    amounts = balanced.pivot(index="id", columns="role", values="Change").reindex(columns=roles)
+    coins = balanced.pivot(index="id", columns="role", values="Coin").reindex(columns=roles)
+    valid = (amounts["received"] > 0) & (amounts["paid"] < 0)
+    amounts, coins = amounts[valid], coins[valid]
+
+    swaps = pd.DataFrame({
+        "id": amounts.index,
+        "date": pd.to_datetime(amounts.index, format="%Y-%m-%d %H:%M:%S").date,
+        "received_amount": amounts["received"].to_numpy(),
+        "paid_taxes_amount": -amounts["paid_taxes"].fillna(0).to_numpy(),
+        "paid_amount": -amounts["paid"].to_numpy(),
+        "received_currency": coins["received"].to_numpy(),
+        "paid_taxes_currency": coins["paid_taxes"].to_numpy(),
+        "paid_currency": coins["paid"].to_numpy(),
+        "exchange_name": "binance",
+    })
+
+    unresolved = manual_input_swaps[~manual_input_swaps["id"].isin(swaps["id"])]
+    return swaps[SWAP_TABLE_COLS], unresolved
+
+
 def _get_dates_with_clean_swap(df: pd.DataFrame) -> pd.DataFrame:
     """Get dates with clean swaps (2 or 3 rows) from the Binance transactions dataframe."""
     swap_buy_count = (
-        pd.concat([df.query("Operation.isin(@swap_categ)") for swap_categ in SWAP_CATEGS])
-        .drop_duplicates()
+        df[df["Operation"].isin(SWAP_OPERATIONS)]
         .groupby("id")
         .agg({"Operation": ["nunique", "size"]})
         .reset_index()
@@ -262,8 +399,7 @@ def get_manual_input_needed_swaps(
     """Get timestamps that need manual input for swaps that have more than 3 rows."""
     df["date"] = pd.to_datetime(df["id"], format="%Y-%m-%d %H:%M:%S").dt.date
     result = (
-        pd.concat([df.query("Operation.isin(@swap_categ)") for swap_categ in SWAP_CATEGS])
-        .drop_duplicates()
+        df[df["Operation"].isin(SWAP_OPERATIONS)]
         .merge(valid_swaps[["id"]].drop_duplicates(), how="left", indicator=True)
         .query("_merge == 'left_only'")
         .drop(columns=["_merge"])
@@ -275,25 +411,155 @@ def get_manual_input_needed_converts(
     df: pd.DataFrame, solved_binance_convert: pd.DataFrame
 ) -> pd.DataFrame:
     """Return binance convert records that were not parsed and should be checked manually."""
-    all_convert_utcs = set(df[df["Operation"] == "Binance Convert"]["id"])
-    parsed_convert_utcs = set(solved_binance_convert["id"])
-    not_parsed_binance_convert = all_convert_utcs - parsed_convert_utcs
-    return df.query(
-        "Operation == 'Binance Convert' and id.isin(@not_parsed_binance_convert)"
-    )
+    is_convert = (df["Operation"] == "Binance Convert").to_numpy()
+    parsed = np.unique(_get_id_keys(solved_binance_convert))
+    return df[is_convert & ~_isin_sorted(_get_id_keys(df), parsed)]
 
 
 def get_remaining_records(df: pd.DataFrame, **kwargs: pd.DataFrame) -> pd.DataFrame:
     """Return the remaining records."""
-    remaining_utcs = set(df["id"])
-    for _, table in kwargs.items():
-        remaining_utcs -= set(table["id"])
-    return df[df["id"].isin(remaining_utcs)].reset_index(drop=True)
+    parsed = _get_parsed_id_keys(kwargs.values())
+    return df[~_isin_sorted(_get_id_keys(df), parsed)].reset_index(drop=True)
+
+
+def encode_ids(ids: pd.Series) -> np.ndarray:
+    """Encode `UTC_Time` ids as int64 epoch seconds.
+
+    Raises ValueError if any id is not a timestamp in `ID_FORMAT`, as all of them would share
+    the same key.
+    """
+    timestamps = pd.to_datetime(ids, format=ID_FORMAT, errors="coerce")
+    unparseable = timestamps.isna()
+    if unparseable.any():
+        raise ValueError(f"Ids not in the {ID_FORMAT} format: {set(ids[unparseable])}")
+    return timestamps.to_numpy(dtype="datetime64[s]").astype(np.int64)
+
+
+def decode_ids(keys: np.ndarray) -> np.ndarray:
+    """Decode int64 keys from `encode_ids` back to their `UTC_Time` string form."""
+    return pd.to_datetime(keys, unit="s").strftime(ID_FORMAT).to_numpy()
+
+
+def _get_id_keys(table: pd.DataFrame) -> np.ndarray:
+    """Return the int64 keys of a table, encoding its ids if it did not keep the key column."""
+    if ID_KEY in table.columns:
+        return table[ID_KEY].to_numpy(dtype=np.int64)
+    return encode_ids(table["id"])
+
+
+def _get_parsed_id_keys(tables) -> np.ndarray:
+    """Return the sorted unique keys found in any of the tables."""
+    keys = [_get_id_keys(table) for table in tables]
+    return np.unique(np.concatenate(keys)) if keys else np.array([], dtype=np.int64)
+
+
+def _isin_sorted(keys: np.ndarray, sorted_keys: np.ndarray) -> np.ndarray:
+    """Vectorized membership test of `keys` in the sorted unique array `sorted_keys`."""
+    if len(sorted_keys) == 0:
+        return np.zeros(len(keys), dtype=bool)
+    positions = np.searchsorted(sorted_keys, keys).clip(max=len(sorted_keys) - 1)
+    return sorted_keys[positions] == keys
+
+
+def parse_binance_report(df: pd.DataFrame, engine: str = "pandas") -> dict[str, pd.DataFrame]:
+    """Parse the Binance report and return a dictionary with the relevant data.
+
+    The report goes through the exchange statements engine with `BINANCE_STATEMENT`. Ids are
+    encoded once by `encode_ids` into the `id_key` column, which the bookkeeping steps use for
+    their membership and coverage checks. Each account is parsed separately, and every table
+    has the `account_id` of its rows.
+
+    `engine` is "pandas", or "polars" to run the steps as one lazy polars plan (see
+    `binance_polars`), which returns the same tables.
+    """
+    if engine == "pandas":
+        return parse_statement(df, BINANCE_STATEMENT)
+    if engine != "polars":
+        raise ValueError(f"Unknown Binance parsing engine: {engine}")
+    try:
+        from .binance_polars import parse_prepared_report
+    except ImportError as e:
+        raise ImportError("The polars engine needs the polars package: pip install polars") from e
+    return parse_statement(df, BINANCE_STATEMENT._replace(parse=parse_prepared_report))
+
+
+def parse_binance_report_parallel(
+    df: pd.DataFrame, n_workers: int | None = None
+) -> dict[str, pd.DataFrame]:
+    """Parse the Binance report in a process pool, one shard per account and month.
+
+    Every step works on the legs of a single `UTC_Time` id of an account, and all legs of an id
+    share the same month, so the shards can be parsed independently. Per-key result tables are
+    concatenated back and checked for completeness against the whole report, as in
+    `parse_binance_report`.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Binance report, as returned by `read_binance_data`.
+    n_workers : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        Same tables as `parse_binance_report`.
+    """
+    df = _prepare_report(assign_account_ids(df.rename(columns=BINANCE_STATEMENT.columns)))
+    shards = [shard for _, shard in df.groupby([ACCOUNT_COLUMN, df["id"].str[:7]], sort=True)]
+    shards = shards or [df]
+    n_workers = min(n_workers or os.cpu_count() or 1, max(len(shards), 1))
+
+    if n_workers <= 1:
+        shard_results = [_run_parse_steps(shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            shard_results = list(executor.map(_run_parse_steps, shards))
+
+    results = _merge_shard_results(shard_results)
+    _check_all_keys_parsed(df, results)
+    return results
+
+
+def _prepare_report(df: pd.DataFrame) -> pd.DataFrame:
+    if DEFAULT_USER_ID is not None:
+        is_default = df[ACCOUNT_COLUMN] == str(DEFAULT_USER_ID)
+        df = df.assign(**{ACCOUNT_COLUMN: df[ACCOUNT_COLUMN].mask(is_default, DEFAULT_ACCOUNT)})
+    return df.assign(**{ID_KEY: encode_ids(df["id"])})
+
+
+def _check_default_account(accounts: list[str]) -> None:
+    """Raise if the records of the default account would be inserted again under a User_ID."""
+    if DEFAULT_USER_ID is not None or DEFAULT_ACCOUNT in accounts:
+        return
+    legacy = read_sql_query(
+        """
+        SELECT 1 FROM crypto.swaps
+        WHERE account_id = :account AND exchange_name = 'binance'
+        LIMIT 1
+        """,
+        params={"account": DEFAULT_ACCOUNT},
+    )
+    if not legacy.empty:
+        raise ValueError(
+            f"Binance records of the {DEFAULT_ACCOUNT!r} account exist: set"
+            f" FINANCES_BINANCE_DEFAULT_USER_ID to their User_ID, one of {accounts}."
+        )
 
 
-def parse_binance_report(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
-    """Parse the Binance report and return a dictionary with the relevant data."""
-    df = df.rename(columns={"UTC_Time": "id"})
+def _parse_report(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    accounts = [rows for _, rows in df.groupby(ACCOUNT_COLUMN, sort=True)] or [df]
+    results = _merge_shard_results([_run_parse_steps(rows) for rows in accounts])
+    _check_all_keys_parsed(df, results)
+    return results
+
+
+def _run_parse_steps(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Run every parsing step over the report of one account.
+
+    `UTC_Time` must already be renamed to `id` and `User_ID` to `account_id`. Every returned
+    table gets the account of the report.
+    """
     steps = [
         ("default_swaps", solve_parseable_swaps),
         ("converts", solve_parseable_binance_convert),
@@ -311,63 +577,142 @@ def parse_binance_report(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
     for key, func in steps:
         results[key] = func(df)
 
-    results["manual_input_swaps"] = get_manual_input_needed_swaps(
-        df, results["default_swaps"]
+    results["reconciled_swaps"], results["manual_input_swaps"] = reconcile_multi_fill_swaps(
+        get_manual_input_needed_swaps(df, results["default_swaps"])
     )
     results["manual_input_needed_converts"] = get_manual_input_needed_converts(
         df, results["converts"]
     )
 
     results["remaining_records"] = get_remaining_records(df, **results)
+    account = df[ACCOUNT_COLUMN].iat[0] if len(df) else DEFAULT_ACCOUNT
+    return {key: table.assign(**{ACCOUNT_COLUMN: account}) for key, table in results.items()}
+
+
+def _merge_shard_results(
+    shard_results: list[dict[str, pd.DataFrame]]
+) -> dict[str, pd.DataFrame]:
+    """Concatenate the per-key tables parsed from each shard."""
+    return {
+        key: pd.concat(
+            [results[key] for results in shard_results if not results[key].empty]
+            or [shard_results[0][key]],
+            ignore_index=True,
+        )
+        for key in shard_results[0]
+    }
 
-    all_keys = set()
-    for _, table in results.items():
-        all_keys.update(set(table.id.unique()))
-    if not (all_keys == set(df.id.unique())):
-        raise ValueError(f"Missing keys in results: {set(df.id.unique()) - all_keys}")
-    return results
+
+def _check_all_keys_parsed(df: pd.DataFrame, results: dict[str, pd.DataFrame]) -> None:
+    """Raise if some id of the report did not land in any of the result tables of its account."""
+    tables = [split_accounts(table) for table in results.values()]
+    for account, rows in df.groupby(ACCOUNT_COLUMN, sort=True):
+        parsed = _get_parsed_id_keys(
+            by_account[account] for by_account in tables if account in by_account
+        )
+        missing = np.setdiff1d(np.unique(_get_id_keys(rows)), parsed, assume_unique=True)
+        if missing.size:
+            raise ValueError(
+                f"Missing keys of account {account} in results: {set(decode_ids(missing))}"
+            )
 
 
-def _preprocess_manual_inspection(df: pd.DataFrame) -> pd.DataFrame:
+def _preprocess_manual_inspection(df: pd.DataFrame, account: str) -> pd.DataFrame:
     categories_to_ignore = [
         "Simple Earn Flexible Redemption",
         "Simple Earn Flexible Airdrop",
         "Staking Purchase",
     ]
 
-    ids = read_sql_query("SELECT DISTINCT id FROM crypto.manually_inserted_keys")
-
-    df = (
-        df.merge(ids, how='left', indicator=True)
-        .query("_merge == 'left_only' and not (Operation.isin(@categories_to_ignore))")
-        .drop(columns="_merge")
+    ids = read_sql_query(
+        "SELECT DISTINCT id FROM crypto.manually_inserted_keys WHERE account_id = :account",
+        params={"account": account},
     )
+    # Keys inserted by hand for other sources, e.g. withdraws or Biscoint swaps, are no report ids.
+    is_report_id = pd.to_datetime(ids["id"], format=ID_FORMAT, errors="coerce").notna()
+    inserted = np.unique(encode_ids(ids.loc[is_report_id, "id"]))
+
+    return df[
+        ~_isin_sorted(_get_id_keys(df), inserted)
+        & ~df["Operation"].isin(categories_to_ignore).to_numpy()
+    ]
+
 
-    return df
+def get_account_path(path: str, account: str) -> str:
+    """Return `path` with `account` appended to its file name, e.g. "inspection_<account>.csv"."""
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}_{account}{path.suffix}"))
 
 
 def persist_transactions_database(
-    results: dict[str, pd.DataFrame], manual_inspection_path: str
+    results: dict[str, pd.DataFrame],
+    manual_inspection_path: str,
+    withdraws: pd.DataFrame | None = None,
+    max_workers: int | None = None,
 ) -> None:
-    """Persist the parsed Binance transactions to the database with upsert."""
-    swaps = pd.concat(
-        [results["default_swaps"], results["converts"], results["airdrops"]]
-    )
-    earn = results["earn"]
-    brl_deposits = results["brl_deposits"]
-    manual_inspection = pd.concat(
-        [
-            results["manual_input_swaps"],
-            results["manual_input_needed_converts"],
-            results["remaining_records"],
+    """Persist the parsed Binance transactions to the database with upsert.
+
+    Accounts are persisted in parallel threads, each one holding the locks of its own rows of
+    the `crypto` tables, and write the records needing manual inspection to their own
+    `get_account_path` of `manual_inspection_path`. `withdraws`, as returned by
+    `get_binance_withdraws`, are persisted with them.
+    """
+    tables = {
+        "swaps": pd.concat(
+            [
+                results["default_swaps"],
+                results["reconciled_swaps"],
+                results["converts"],
+                results["airdrops"],
+            ]
+        ),
+        "earnings": results["earn"],
+        "brl_deposits": results["brl_deposits"],
+        "manual_inspection": pd.concat(
+            [
+                results["manual_input_swaps"],
+                results["manual_input_needed_converts"],
+                results["remaining_records"],
+            ]
+        ),
+    }
+    if withdraws is not None:
+        tables["withdraws"] = withdraws
+    by_account = {name: split_accounts(table) for name, table in tables.items()}
+    accounts = sorted({account for parts in by_account.values() for account in parts})
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(accounts), 1)) as executor:
+        futures = [
+            executor.submit(
+                _persist_account,
+                account,
+                {
+                    name: by_account[name].get(account, table.iloc[:0])
+                    for name, table in tables.items()
+                },
+                get_account_path(manual_inspection_path, account),
+            )
+            for account in accounts
         ]
-    ).pipe(_preprocess_manual_inspection)
+        for future in futures:
+            future.result()
+
 
-    persist_dataframe_to_database(swaps, "crypto", "swaps", True, upsert=True, pk_columns=["id"])
-    persist_dataframe_to_database(earn, "crypto", "earnings", True, upsert=True, pk_columns=["id"])
-    persist_dataframe_to_database(brl_deposits, "crypto", "brl_deposits", True, upsert=True, pk_columns=["id"])
+def _persist_account(
+    account: str, tables: dict[str, pd.DataFrame], manual_inspection_path: str
+) -> None:
+    with ingestion_lock(*account_locks(account)):
+        for table in ["swaps", "earnings", "brl_deposits", "withdraws"]:
+            if table in tables:
+                persist_dataframe_to_database(
+                    tables[table], "crypto", table, True, upsert=True, pk_columns=PK_COLUMNS,
+                    diff=True,
+                )
+        manual_inspection = _preprocess_manual_inspection(
+            tables["manual_inspection"], account
+        ).drop(columns=ID_KEY, errors="ignore")
 
-    logging.info(f"Manual inspection needed for {len(manual_inspection)} records.")
+    logging.info(f"Manual inspection needed for {len(manual_inspection)} records of {account}.")
     logging.info(f"Persisting to manual inspection to {manual_inspection_path}")
     manual_inspection.to_csv(manual_inspection_path, index=False)
 
@@ -380,7 +725,8 @@ def read_binance_data(paths: list[str]) -> pd.DataFrame:
     return pd.concat(data, ignore_index=True)
 
 
-def get_binance_withdraws(paths: list[str]) -> pd.DataFrame:
+def get_binance_withdraws(paths: list[str], account: str = DEFAULT_ACCOUNT) -> pd.DataFrame:
+    """Read the Binance withdraw files of `account`."""
     data = []
     for path in paths:
         data.append(pd.read_csv(path, sep=';'))
@@ -394,17 +740,37 @@ def get_binance_withdraws(paths: list[str]) -> pd.DataFrame:
             "Coin": "currency_amount"
         })
         .assign(
+            account_id=account,
             id=lambda df: df["date"].copy(),
             source="binance",
             currency_tax=lambda df: df.currency_amount.copy(),
             date=lambda df: pd.to_datetime(df["date"], format="%y-%m-%d %H:%M:%S").dt.date
         )
-    )[["id", "date", "amount", "tax", "currency_amount", "currency_tax", "source", "destiny"]]
+    )[[
+        "account_id",
+        "id",
+        "date",
+        "amount",
+        "tax",
+        "currency_amount",
+        "currency_tax",
+        "source",
+        "destiny",
+    ]]
     return withdraws
 
 
-def run(paths: list[str] | None = None) -> None:
-    """Run the Binance order history parsing and persistence."""
+def run(
+    paths: list[str] | None = None,
+    n_workers: int | None = None,
+    withdraw_account: str | None = None,
+) -> None:
+    """Run the Binance order history parsing and persistence.
+
+    If `n_workers` is passed, the report is parsed with `parse_binance_report_parallel`. The
+    withdraw files, which don't name their account, belong to `withdraw_account`, by default
+    the only account of the report.
+    """
     paths = [
         "/home/ubuntu/finances/raw_data/binance/binance_transactions_2021.csv",
         "/home/ubuntu/finances/raw_data/binance/binance_transactions_2022.csv",
@@ -420,16 +786,35 @@ def run(paths: list[str] | None = None) -> None:
         "/home/ubuntu/finances/raw_data/binance/binance_withdraws_202507.csv"
     ]
 
-    manual_inspection_path = "/home/ubuntu/finances/binance_manual_inspection.csv"
-
     df = read_binance_data(paths)
-    results = parse_binance_report(df)
-    withdraws = get_binance_withdraws(withdraw_paths)
-
-    persist_transactions_database(results, manual_inspection_path)
-    persist_dataframe_to_database(
-        withdraws, "crypto", "withdraws", True, upsert=True, pk_columns=["id"]
-    )
+    if n_workers is None:
+        results = parse_binance_report(df)
+    else:
+        results = parse_binance_report_parallel(df, n_workers)
+    accounts = sorted({
+        account for table in results.values() for account in table[ACCOUNT_COLUMN].unique()
+    })
+    _check_default_account(accounts)
+    if withdraw_account is None:
+        if len(accounts) != 1:
+            raise ValueError(f"Pass the account of the withdraws, one of {accounts}.")
+        withdraw_account = accounts[0]
+    withdraws = get_binance_withdraws(withdraw_paths, withdraw_account)
+
+    persist_transactions_database(results, MANUAL_INSPECTION_PATH, withdraws, n_workers)
+
+
+# The Binance report is a ledger, with one row per balance change. Its legs are paired into
+# swaps and converts by `_run_parse_steps` instead of the row classifiers of the engine.
+BINANCE_STATEMENT = StatementSpec(
+    exchange="binance",
+    columns={"UTC_Time": "id", "User_ID": ACCOUNT_COLUMN},
+    prepare=_prepare_report,
+    parse=_parse_report,
+    persist=partial(
+        persist_transactions_database, manual_inspection_path=MANUAL_INSPECTION_PATH
+    ),
+)
 
 
 if __name__ == "__main__":
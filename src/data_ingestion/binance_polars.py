@@ -0,0 +1,323 @@
+"""Polars engine of the Binance report parser, see `parse_binance_report(engine="polars")`.
+
+The pandas engine runs every parsing step on its own copy of the report, one account at a time,
+through many intermediate `query`, `concat` and `merge` frames. Here each result table is a lazy
+query over one scan of the prepared report, and all of them are collected at once with
+`pl.collect_all`. Polars then computes their shared subplans (the swap legs, the clean swap ids,
+the keys of the parsed rows) once, only reads the columns each table needs and runs the plan on
+every core. Accounts are a key of every grouping and join instead of separate parses.
+
+Tables match those of the pandas engine, up to row order. The few legs of multi-fill swaps are
+still reconciled by `reconcile_multi_fill_swaps`, account by account.
+
+Usage, to benchmark both engines on a synthetic report:
+    python -m src.data_ingestion.binance_polars --ids 200000 --accounts 4
+"""
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+from .binance_order_history import (
+    ID_FORMAT,
+    ID_KEY,
+    SWAP_OPERATIONS,
+    SWAP_PIVOT_OPERATIONS,
+    SWAP_TABLE_COLS,
+    reconcile_multi_fill_swaps,
+)
+from .exchange_statements import ACCOUNT_COLUMN
+
+EARN_SOURCES = {
+    "Staking Rewards": "binance_staking",
+    "Simple Earn Flexible Interest": "binance_simple_earn",
+    "Simple Earn Locked Rewards": "binance_simple_earn",
+}
+KEYS = [ACCOUNT_COLUMN, "id", ID_KEY]
+RESULT_KEYS = [
+    "default_swaps",
+    "converts",
+    "earn",
+    "airdrops",
+    "brl_deposits",
+    "earn_subscription",
+    "withdraws",
+    "reconciled_swaps",
+    "manual_input_swaps",
+    "manual_input_needed_converts",
+    "remaining_records",
+]
+
+_date = pl.col("id").str.strptime(pl.Datetime, ID_FORMAT, strict=False).dt.date()
+
+
+def _leg(operation: str, value: str) -> pl.Expr:
+    """Column `value` of the leg of `operation` in a group, null if it has none."""
+    return pl.col(value).filter(pl.col("Operation") == operation).first()
+
+
+def _swaps(report: pl.LazyFrame, clean_ids: pl.LazyFrame) -> pl.LazyFrame:
+    legs = (
+        report.join(clean_ids, on=[ACCOUNT_COLUMN, "id"])
+        .group_by([*KEYS, "Account", "Operation", "Coin"])
+        .agg(pl.col("Change").sum())
+        .group_by([*KEYS, "Account"])
+        .agg(
+            _leg(operation, value).alias(f"{value}_{operation}")
+            for value in ["Change", "Coin"]
+            for operation in SWAP_PIVOT_OPERATIONS
+        )
+    )
+    return legs.select(
+        "id",
+        _date.alias("date"),
+        pl.coalesce("Change_Transaction Buy", "Change_Transaction Revenue")
+        .alias("received_amount"),
+        (-pl.col("Change_Transaction Fee").fill_null(0)).alias("paid_taxes_amount"),
+        (-pl.coalesce("Change_Transaction Spend", "Change_Transaction Sold")).alias("paid_amount"),
+        pl.coalesce("Coin_Transaction Buy", "Coin_Transaction Revenue")
+        .alias("received_currency"),
+        pl.col("Coin_Transaction Fee").alias("paid_taxes_currency"),
+        pl.coalesce("Coin_Transaction Spend", "Coin_Transaction Sold").alias("paid_currency"),
+        pl.lit("binance").alias("exchange_name"),
+        ACCOUNT_COLUMN,
+        ID_KEY,
+    )
+
+
+def _converts(report: pl.LazyFrame) -> pl.LazyFrame:
+    # Like the pandas engine, the first leg is the paid one if it is negative, and the received
+    # one if it is positive; the second leg is the other one.
+    first_negative = pl.col("first_change") < 0
+    first_positive = pl.col("first_change") > 0
+    return (
+        report.filter(pl.col("Operation") == "Binance Convert")
+        .group_by(KEYS)
+        .agg(
+            pl.len().alias("legs"),
+            pl.col("Change").first().alias("first_change"),
+            pl.col("Change").last().alias("last_change"),
+            pl.col("Coin").first().alias("first_coin"),
+            pl.col("Coin").last().alias("last_coin"),
+        )
+        .filter(pl.col("legs") == 2)
+        .select(
+            "id",
+            (-pl.when(first_negative).then("first_change").otherwise("last_change"))
+            .alias("paid_amount"),
+            pl.when(first_positive).then("first_change").otherwise("last_change")
+            .alias("received_amount"),
+            pl.when(first_negative).then("first_coin").otherwise("last_coin")
+            .alias("paid_currency"),
+            pl.when(first_positive).then("first_coin").otherwise("last_coin")
+            .alias("received_currency"),
+            _date.alias("date"),
+            pl.lit("binance").alias("exchange_name"),
+            pl.lit(0).alias("paid_taxes_amount"),
+            pl.lit(None, dtype=pl.String).alias("paid_taxes_currency"),
+            ACCOUNT_COLUMN,
+            ID_KEY,
+        )
+    )
+
+
+def _build_plan(report: pl.LazyFrame) -> dict[str, pl.LazyFrame]:
+    """Return the lazy tables of the prepared report, keyed like the pandas engine's results."""
+    with_date = report.with_columns(_date.alias("date"))
+    swap_legs = with_date.filter(pl.col("Operation").is_in(SWAP_OPERATIONS))
+    clean_ids = (
+        swap_legs.group_by([ACCOUNT_COLUMN, "id"])
+        .agg(pl.col("Operation").n_unique().alias("operations"), pl.len().alias("legs"))
+        .filter((pl.col("operations") == pl.col("legs")) & pl.col("legs").is_in([2, 3]))
+        .select(ACCOUNT_COLUMN, "id")
+    )
+    operation = pl.col("Operation")
+
+    plan = {
+        "default_swaps": _swaps(report, clean_ids),
+        "converts": _converts(report),
+        "earn": report.filter(operation.is_in(list(EARN_SOURCES))).select(
+            "id",
+            _date.alias("date"),
+            pl.col("Coin").alias("currency"),
+            operation.replace_strict(EARN_SOURCES).alias("source"),
+            pl.col("Change").alias("earning_amount"),
+            ACCOUNT_COLUMN,
+            ID_KEY,
+        ),
+        "airdrops": report.filter(operation == "Airdrop Assets").select(
+            "id",
+            _date.alias("date"),
+            pl.col("Change").alias("received_amount"),
+            pl.lit(0).alias("paid_taxes_amount"),
+            pl.lit(0).alias("paid_amount"),
+            pl.col("Coin").alias("received_currency"),
+            pl.lit(None, dtype=pl.String).alias("paid_taxes_currency"),
+            pl.lit(None, dtype=pl.String).alias("paid_currency"),
+            pl.lit("binance").alias("exchange_name"),
+            ACCOUNT_COLUMN,
+            ID_KEY,
+        ),
+        "brl_deposits": report.filter((operation == "Deposit") & (pl.col("Coin") == "BRL")).select(
+            "id",
+            _date.alias("date"),
+            pl.col("Change").alias("value_brl"),
+            pl.lit("binance").alias("exchange_name"),
+            ACCOUNT_COLUMN,
+            ID_KEY,
+        ),
+        "earn_subscription": report.filter(operation == "Simple Earn Flexible Subscription"),
+        "withdraws": report.filter(operation == "Withdraw"),
+        "manual_input_swaps": swap_legs.join(
+            clean_ids, on=[ACCOUNT_COLUMN, "id"], how="anti", maintain_order="left"
+        ),
+    }
+    plan["manual_input_needed_converts"] = with_date.filter(operation == "Binance Convert").join(
+        plan["converts"].select(ACCOUNT_COLUMN, ID_KEY),
+        on=[ACCOUNT_COLUMN, ID_KEY],
+        how="anti",
+        maintain_order="left",
+    )
+    parsed_keys = pl.concat(
+        [table.select(ACCOUNT_COLUMN, ID_KEY) for table in plan.values()]
+    ).unique()
+    plan["remaining_records"] = with_date.join(
+        parsed_keys, on=[ACCOUNT_COLUMN, ID_KEY], how="anti", maintain_order="left"
+    )
+    return plan
+
+
+def _to_pandas(table: pl.DataFrame) -> pd.DataFrame:
+    df = table.to_pandas()
+    for name, dtype in table.schema.items():
+        if dtype == pl.Date:
+            df[name] = df[name].dt.date
+    return df
+
+
+def _reconcile(manual_input_swaps: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    if manual_input_swaps.empty:
+        return pd.DataFrame(columns=[*SWAP_TABLE_COLS, ACCOUNT_COLUMN]), manual_input_swaps
+    reconciled, unresolved = [], []
+    for account, legs in manual_input_swaps.groupby(ACCOUNT_COLUMN, sort=True):
+        swaps, rest = reconcile_multi_fill_swaps(legs)
+        reconciled.append(swaps.assign(**{ACCOUNT_COLUMN: account}))
+        unresolved.append(rest)
+    return (
+        pd.concat(reconciled, ignore_index=True),
+        pd.concat(unresolved, ignore_index=True),
+    )
+
+
+def parse_prepared_report(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Parse a report prepared by `BINANCE_STATEMENT`, returning the pandas engine's tables."""
+    plan = _build_plan(pl.from_pandas(df).lazy())
+    # Derived tables carry the id key for the bookkeeping joins, but not in their output.
+    derived = {"default_swaps", "converts", "earn", "airdrops", "brl_deposits"}
+    frames = pl.collect_all(
+        [table.drop(ID_KEY) if key in derived else table for key, table in plan.items()]
+    )
+    results = {key: _to_pandas(frame) for key, frame in zip(plan, frames)}
+    if results["converts"].empty:
+        # Shape of the empty converts of the pandas engine.
+        results["converts"] = pd.DataFrame(columns=["id", ACCOUNT_COLUMN])
+
+    results["reconciled_swaps"], results["manual_input_swaps"] = _reconcile(
+        results["manual_input_swaps"]
+    )
+    # Rows of no other table are remaining records by construction, so unlike the pandas engine
+    # there are no missing keys to check for.
+    return {key: results[key] for key in RESULT_KEYS}
+
+
+# Legs of every kind of event of `synthetic_report`, as (operation, coin, sign).
+SYNTHETIC_EVENTS = {
+    "swap": [
+        ("Transaction Spend", "USDT", -1),
+        ("Transaction Buy", "BTC", 1),
+        ("Transaction Fee", "BNB", -1),
+    ],
+    "sale": [("Transaction Sold", "ETH", -1), ("Transaction Revenue", "USDT", 1)],
+    "multi_fill_swap": [
+        ("Transaction Spend", "USDT", -1),
+        ("Transaction Spend", "USDT", -1),
+        ("Transaction Buy", "BTC", 1),
+        ("Transaction Buy", "BTC", 1),
+        ("Transaction Fee", "BNB", -1),
+    ],
+    "ambiguous_swap": [
+        ("Transaction Spend", "USDT", -1),
+        ("Transaction Buy", "BTC", 1),
+        ("Transaction Buy", "ETH", 1),
+    ],
+    "convert": [("Binance Convert", "BRL", -1), ("Binance Convert", "USDT", 1)],
+    "interest": [("Simple Earn Flexible Interest", "USDT", 1)],
+    "staking": [("Staking Rewards", "SOL", 1)],
+    "subscription": [("Simple Earn Flexible Subscription", "USDT", -1)],
+    "deposit": [("Deposit", "BRL", 1)],
+    "airdrop": [("Airdrop Assets", "ETHW", 1)],
+    "withdraw": [("Withdraw", "BTC", -1)],
+    "other": [("Small Assets Exchange BNB", "BNB", 1)],
+}
+SYNTHETIC_WEIGHTS = [0.3, 0.1, 0.05, 0.02, 0.08, 0.25, 0.08, 0.02, 0.04, 0.02, 0.02, 0.02]
+
+
+def synthetic_report(n_ids: int, n_accounts: int = 1, seed: int = 0) -> pd.DataFrame:
+    """Return a Binance report of `n_ids` events, in the format of `read_binance_data`.
+
+    Events are spread over the accounts, which share timestamps, and drawn from
+    `SYNTHETIC_EVENTS` with `SYNTHETIC_WEIGHTS`.
+    """
+    rng = np.random.default_rng(seed)
+    events = np.arange(n_ids)
+    kinds = rng.choice(len(SYNTHETIC_EVENTS), size=n_ids, p=SYNTHETIC_WEIGHTS)
+    legs = []
+    for kind, template in enumerate(SYNTHETIC_EVENTS.values()):
+        of_kind = events[kinds == kind]
+        operations, coins, signs = zip(*template)
+        legs.append(pd.DataFrame({
+            "event": np.repeat(of_kind, len(template)),
+            "Operation": np.tile(operations, len(of_kind)),
+            "Coin": np.tile(coins, len(of_kind)),
+            "Change": np.tile(signs, len(of_kind)) * rng.random(len(of_kind) * len(template)),
+        }))
+    legs = pd.concat(legs).sort_values("event", kind="stable")
+    event = legs.pop("event").to_numpy()
+    times = pd.Timestamp("2021-01-01") + pd.to_timedelta(event // n_accounts * 37, unit="s")
+    return pd.DataFrame({
+        "User_ID": event % n_accounts + 1,
+        "UTC_Time": times.strftime(ID_FORMAT),
+        "Account": "Spot",
+        "Operation": legs["Operation"].to_numpy(),
+        "Coin": legs["Coin"].to_numpy(),
+        "Change": legs["Change"].to_numpy(),
+        "Remark": "",
+    })
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from .binance_order_history import parse_binance_report, parse_binance_report_parallel
+
+    parser = argparse.ArgumentParser(description="Benchmark the Binance report parsers.")
+    parser.add_argument("--ids", type=int, default=200_000, help="Events of the report.")
+    parser.add_argument("--accounts", type=int, default=1, help="Accounts of the report.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each parser.")
+    args = parser.parse_args()
+
+    report = synthetic_report(args.ids, args.accounts)
+    parsers = {
+        "pandas": parse_binance_report,
+        "pandas (process pool)": parse_binance_report_parallel,
+        "polars": lambda df: parse_binance_report(df, engine="polars"),
+    }
+    print(f"{len(report)} rows, {args.ids} events, {args.accounts} accounts")
+    for name, parse in parsers.items():
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            parse(report)
+            timings.append(time.perf_counter() - started)
+        print(f"{name:>22}: best {min(timings):.2f}s of {args.repeat}")
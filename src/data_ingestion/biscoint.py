@@ -0,0 +1,54 @@
+"""Biscoint statements.
+
+The exchange was only used for a few BTC purchases, first inserted by hand. The spec reads its
+orders export, with one row per order. Ids are "biscoint_<date>_<side>_<coin>_<n>", n counting
+the orders of that side and coin in the day from 1. The first BTC purchase of each day keeps
+the "biscoint_<date>" id of the rows inserted by hand, so reloading it updates its row in place.
+
+No export was kept: `process_biscoint_data.ipynb` only holds the three orders inserted by hand.
+The column names of `BISCOINT_STATEMENT` (Data, Tipo, Moeda, Quantidade, Valor (R$), Taxa) and
+the dd/mm/yyyy dates are assumed from the Portuguese interface of the exchange, not checked
+against a real export. Check them before loading one.
+
+Usage:
+    python -m src.data_ingestion.exchange_statements --exchange biscoint PATH
+"""
+
+import numpy as np
+import pandas as pd
+
+from .exchange_statements import StatementSpec
+
+SIDES = {"Compra": "buy", "Venda": "sell"}
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    date = pd.to_datetime(df["date"], format="%d/%m/%Y")
+    side = df["side"].map(SIDES)
+    day_id = "biscoint_" + date.dt.strftime("%Y-%m-%d")
+    ordinal = df.groupby([day_id, side, df["base"]], dropna=False).cumcount() + 1
+    order_id = day_id + "_" + side + "_" + df["base"] + "_" + ordinal.astype(str)
+    is_legacy = (side == "buy") & (df["base"] == "BTC") & (ordinal == 1)
+    return df.assign(
+        id=day_id.where(is_legacy, order_id),
+        date=date.dt.date,
+        side=side,
+        quote="BRL",
+        fee_currency=np.where(side == "buy", df["base"], "BRL"),
+    )
+
+
+BISCOINT_STATEMENT = StatementSpec(
+    exchange="biscoint",
+    # Assumed export columns, see the module docstring.
+    columns={
+        "Data": "date",
+        "Tipo": "side",
+        "Moeda": "base",
+        "Quantidade": "base_amount",
+        "Valor (R$)": "quote_amount",
+        "Taxa": "fee_amount",
+    },
+    classifiers={"swap": lambda df: df["side"].notna()},
+    prepare=_prepare,
+)
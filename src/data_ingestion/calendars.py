@@ -0,0 +1,67 @@
+"""Trading calendars of the quotation series.
+
+Holidays follow the exchanges' regular rules; one-off closures are not listed. A missing
+closure only makes the gap scanner request a day the provider has no data for.
+"""
+
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar,
+    GoodFriday,
+    Holiday,
+    USLaborDay,
+    USMartinLutherKingJr,
+    USMemorialDay,
+    USPresidentsDay,
+    USThanksgivingDay,
+    nearest_workday,
+)
+from pandas.tseries.offsets import CustomBusinessDay, Day, Easter
+
+
+class B3HolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        Holiday("Confraternizacao Universal", month=1, day=1),
+        Holiday("Carnaval Segunda", month=1, day=1, offset=[Easter(), Day(-48)]),
+        Holiday("Carnaval Terca", month=1, day=1, offset=[Easter(), Day(-47)]),
+        GoodFriday,
+        Holiday("Tiradentes", month=4, day=21),
+        Holiday("Dia do Trabalho", month=5, day=1),
+        Holiday("Corpus Christi", month=1, day=1, offset=[Easter(), Day(60)]),
+        Holiday("Independencia", month=9, day=7),
+        Holiday("Nossa Senhora Aparecida", month=10, day=12),
+        Holiday("Finados", month=11, day=2),
+        Holiday("Proclamacao da Republica", month=11, day=15),
+        Holiday("Consciencia Negra", month=11, day=20, start_date="2024-01-01"),
+        Holiday("Vespera de Natal", month=12, day=24),
+        Holiday("Natal", month=12, day=25),
+        Holiday("Ultimo Dia do Ano", month=12, day=31),
+    ]
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    rules = [
+        Holiday("New Year's Day", month=1, day=1, observance=nearest_workday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday("Juneteenth", month=6, day=19, start_date="2022-01-01", observance=nearest_workday),
+        Holiday("Independence Day", month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday("Christmas", month=12, day=25, observance=nearest_workday),
+    ]
+
+
+CALENDARS = {
+    "b3": CustomBusinessDay(calendar=B3HolidayCalendar()),
+    "nyse": CustomBusinessDay(calendar=NYSEHolidayCalendar()),
+    "weekdays": CustomBusinessDay(),
+    "crypto": Day(),
+}
+
+
+def get_trading_days(calendar: str, start: str, end: str) -> pd.DatetimeIndex:
+    """Return the trading days of `calendar` between `start` and `end`, inclusive."""
+    return pd.date_range(start, end, freq=CALENDARS[calendar])
@@ -0,0 +1,52 @@
+"""Coinext statements.
+
+Two exports are supported: the order report ("Ordens incluídas"), with one row per fill, and
+the deposits report. Instruments such as "DOGEBRL" are split into base and quote by their known
+quote suffix; the notebooks used to take the first 3 letters, which needed fixes like DOG ->
+DOGE and EBRL -> BRL.
+
+Usage:
+    python -m src.data_ingestion.exchange_statements --exchange coinext PATH [PATH ...]
+"""
+
+import numpy as np
+import pandas as pd
+
+from .exchange_statements import StatementSpec, column
+
+QUOTE_CURRENCIES = ["BRL"]
+
+
+def _prepare(df: pd.DataFrame) -> pd.DataFrame:
+    instrument = column(df, "Instrument").astype("string")
+    pair = instrument.str.extract(rf"^(?P<base>[A-Z0-9]+?)(?P<quote>{'|'.join(QUOTE_CURRENCIES)})$")
+    side = column(df, "side").astype("string").str.lower()
+    # Orders are identified by their TransReportDatetime, deposits by their PostingDatetime.
+    ids = column(df, "id").fillna(column(df, "PostingDatetime"))
+    return df.assign(
+        id=ids,
+        side=side,
+        base=pair["base"],
+        quote=pair["quote"],
+        # Coinext charges buys in the received coin and sells in BRL.
+        fee_currency=np.where((side == "buy").fillna(False), pair["base"], pair["quote"]),
+        date=pd.to_datetime(ids, format="ISO8601").dt.date,
+    )
+
+
+COINEXT_STATEMENT = StatementSpec(
+    exchange="coinext",
+    columns={
+        "TransReportDatetime": "id",
+        "Side": "side",
+        "BaseSettlementAmount": "base_amount",
+        "Notional": "quote_amount",
+        "Fee": "fee_amount",
+        "CR": "value_brl",
+    },
+    classifiers={
+        "swap": lambda df: df["side"].isin(["buy", "sell"]) & df["base"].notna(),
+        "deposit": lambda df: column(df, "value_brl").notna(),
+    },
+    prepare=_prepare,
+)
@@ -2,6 +2,7 @@
 
 import logging
 from datetime import datetime
+from functools import partial
 from typing import Any
 
 import pandas as pd
@@ -10,11 +11,16 @@ import requests
 from dateutil.relativedelta import relativedelta
 from psycopg2 import OperationalError
 
+from src.locks import ingestion_lock
+from src.tracing import trace_run
 from src.utils import persist_dataframe_to_database, read_sql_query
 
 from .awesome_api import get_awesome_close_prices
+from .backfill import backfill_series
 from .binance_api import get_binance_close_prices
+from .intraday import ingest_intraday_candles
 from .ipea_api import get_ipea_close_prices
+from .pipeline import run_pipeline
 from .yfinance_api import get_yfinance_close_prices
 
 PROVIDERS = {
@@ -24,6 +30,25 @@ PROVIDERS = {
     "ipea": get_ipea_close_prices,
 }
 
+# Series refreshed by the nightly `quotations` job of src.scheduler, with the trading calendar of
+# each one (see calendars.CALENDARS). The wallet's brazilian stocks are added by get_wallet_series.
+QUOTATION_SERIES = [
+    {"provider": "awesome", "symbol": "USD-BRL", "asset": "USD", "currency": "BRL",
+     "calendar": "weekdays"},
+    {"provider": "awesome", "symbol": "JPY-BRL", "asset": "JPY", "currency": "BRL",
+     "calendar": "weekdays"},
+    {"provider": "binance", "symbol": "BTCUSDT", "asset": "BTC", "currency": "USDT",
+     "calendar": "crypto"},
+    {"provider": "binance", "symbol": "ETHUSDT", "asset": "ETH", "currency": "USDT",
+     "calendar": "crypto"},
+    {"provider": "binance", "symbol": "SOLUSDT", "asset": "SOL", "currency": "USDT",
+     "calendar": "crypto"},
+    {"provider": "yfinance", "symbol": "^GSPC", "asset": "S&P500", "currency": "USD",
+     "calendar": "nyse"},
+    {"provider": "yfinance", "symbol": "^BVSP", "asset": "IBOV", "currency": "BRL",
+     "calendar": "b3"},
+]
+
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 
 
@@ -137,38 +162,88 @@ def ingest_currency_data(data: pd.DataFrame, table_schema: str, table_name: str)
         logging.warning("No data to persist. Skipping persistence.")
 
 
-def ingest_brl_stocks_in_wallet(
-    table_schema: str,
-    table_name: str,
-    start_date: str | None = None,
-):
-    """Ingest historical data from all the stocks currently in wallet using yfinance API."""
-    tickers = read_sql_query(
+def get_wallet_tickers() -> list[str]:
+    """Return the brazilian stock tickers currently in wallet."""
+    return read_sql_query(
         """
         SELECT DISTINCT ticker
         FROM stocks.transactions
         GROUP BY ticker
         HAVING SUM(quantity) > 0
-        """
+        """,
+        cache=True,
     ).ticker.tolist()
 
-    currency = "BRL"
-    data = []
-    for ticker in tickers:
-        ticker_data = get_currencies_data_from_last_record(
-            get_yfinance_close_prices,
-            ticker + ".SA",
-            ticker,
-            currency,
+
+def get_wallet_series() -> list[dict[str, str]]:
+    """Return the quotation series of the stocks in wallet, in the format of QUOTATION_SERIES."""
+    return [
+        {"provider": "yfinance", "symbol": ticker + ".SA", "asset": ticker, "currency": "BRL",
+         "calendar": "b3"}
+        for ticker in get_wallet_tickers()
+    ]
+
+
+def ingest_quotation_series(
+    series: list[dict[str, str]] | None = None,
+    table_schema: str = "currencies",
+    table_name: str = "quotations",
+    start_date: str | None = None,
+    n_fetchers: int = 4,
+) -> dict[str, Exception]:
+    """Ingest many quotation series at once through the write-behind pipeline.
+
+    Parameters
+    ----------
+    series : list[dict[str, str]], optional
+        Series to ingest, in the format of `QUOTATION_SERIES`. Defaults to `QUOTATION_SERIES`.
+    table_schema : str
+        Schema name of the target database table.
+    table_name : str
+        Name of the target database table.
+    start_date : str, optional
+        Date from which to start fetching data. Defaults to the day after the last record of
+        each series.
+    n_fetchers : int
+        Number of series fetched at once.
+
+    Returns
+    -------
+    dict[str, Exception]
+        Error of each failed series, by symbol.
+    """
+    series = series if series is not None else QUOTATION_SERIES
+    jobs = {
+        entry["symbol"]: partial(
+            get_currencies_data_from_last_record,
+            PROVIDERS[entry["provider"]],
+            entry["symbol"],
+            entry["asset"],
+            entry["currency"],
             table_schema,
             table_name,
             start_date,
         )
+        for entry in series
+    }
+    # Concurrent runs sharing series wait for each other, instead of fetching the same days.
+    locks = [(f"{table_schema}.{table_name}", f"{e['asset']}/{e['currency']}") for e in series]
+    with ingestion_lock(*locks):
+        errors = run_pipeline(
+            jobs, table_schema, table_name, ["date", "asset", "currency"], n_fetchers
+        )
+    for symbol, error in errors.items():
+        logging.error(f"Could not ingest {symbol}: {error}")
+    return errors
 
-        if ticker_data is not None and not ticker_data.empty:
-            data.append(ticker_data)
 
-    ingest_currency_data(pd.concat(data), table_schema, table_name)
+def ingest_brl_stocks_in_wallet(
+    table_schema: str,
+    table_name: str,
+    start_date: str | None = None,
+):
+    """Ingest historical data from all the stocks currently in wallet using yfinance API."""
+    return ingest_quotation_series(get_wallet_series(), table_schema, table_name, start_date)
 
 
 if __name__ == "__main__":
@@ -182,7 +257,10 @@ if __name__ == "__main__":
         default="individual",
         help=(
             "If individual, run one stock according to passed parameters. If brazil,"
-            " run brazilian stocks currently in wallet."
+            " run brazilian stocks currently in wallet. If all, run every series of"
+            " QUOTATION_SERIES and the stocks in wallet. If intraday, store Binance candles"
+            " of the passed interval. If backfill, resumably load the passed series (or every"
+            " series of QUOTATION_SERIES) from start_date in windows."
         )
     )
     parser.add_argument(
@@ -208,24 +286,78 @@ if __name__ == "__main__":
         default=None,
         help="Date to start parsing the time series."
     )
+    parser.add_argument(
+        "--interval",
+        default="1h",
+        help="Candle interval of the intraday mode, e.g. 15m, 1h.",
+    )
+    parser.add_argument(
+        "--end_date",
+        default=None,
+        help="Last day of the backfill mode. Defaults to today.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Windows fetched at once by the backfill mode.",
+    )
+    parser.add_argument(
+        "--trace-sql",
+        action="store_true",
+        help="Log the latency of every SQL statement of the run, slowest first.",
+    )
     args = parser.parse_args()
 
     table_schema = "currencies"
     table_name = "quotations"
 
-    if args.mode == "individual":
-        fetch_fn = PROVIDERS[args.provider]
-        data = get_currencies_data_from_last_record(
-            fetch_fn,
-            args.symbol,
-            args.asset,
-            args.currency,
-            table_schema,
-            table_name,
-            args.start_date,
-        )
-        ingest_currency_data(data, table_schema, table_name)
-    elif args.mode == "brazil":
-        ingest_brl_stocks_in_wallet(table_schema, table_name, args.start_date)
-    else:
-        raise ValueError(f"Invalid passed mode: {args.mode}")
+    with trace_run(f"data_ingestion --mode {args.mode}", enabled=args.trace_sql):
+        if args.mode == "individual":
+            fetch_fn = PROVIDERS[args.provider]
+            series_lock = (f"{table_schema}.{table_name}", f"{args.asset}/{args.currency}")
+            with ingestion_lock(series_lock):
+                data = get_currencies_data_from_last_record(
+                    fetch_fn,
+                    args.symbol,
+                    args.asset,
+                    args.currency,
+                    table_schema,
+                    table_name,
+                    args.start_date,
+                )
+                ingest_currency_data(data, table_schema, table_name)
+        elif args.mode == "brazil":
+            ingest_brl_stocks_in_wallet(table_schema, table_name, args.start_date)
+        elif args.mode == "all":
+            ingest_quotation_series(
+                QUOTATION_SERIES + get_wallet_series(), table_schema, table_name, args.start_date
+            )
+        elif args.mode == "intraday":
+            ingest_intraday_candles(
+                args.symbol, args.asset, args.currency, args.interval, args.start_date
+            )
+        elif args.mode == "backfill":
+            if not args.start_date:
+                raise ValueError("The backfill mode needs a start_date.")
+            series = QUOTATION_SERIES if args.symbol is None else [{
+                "provider": args.provider,
+                "symbol": args.symbol,
+                "asset": args.asset,
+                "currency": args.currency,
+            }]
+            for entry in series:
+                backfill_series(
+                    PROVIDERS[entry["provider"]],
+                    entry["provider"],
+                    entry["symbol"],
+                    entry["asset"],
+                    entry["currency"],
+                    args.start_date,
+                    args.end_date,
+                    args.workers,
+                    table_schema,
+                    table_name,
+                )
+        else:
+            raise ValueError(f"Invalid passed mode: {args.mode}")
@@ -0,0 +1,294 @@
+"""Shared engine to load the statements exported by crypto exchanges.
+
+Each exchange declares a `StatementSpec`: how its columns map to the canonical ones, an optional
+vectorized `prepare` step deriving the remaining canonical columns, and row classifiers. The
+engine classifies every row, builds the `crypto.swaps`, `crypto.brl_deposits` and
+`crypto.withdraws` tables from them and bulk upserts the result. Rows no classifier matches are
+returned as `remaining_records`.
+
+Canonical columns, by row kind:
+
+* swap: id, date, side ("buy" or "sell"), base, quote, base_amount, quote_amount, fee_amount
+  and fee_currency. Rows sharing an id are fills of the same order and are summed.
+* deposit: id, date and value_brl.
+* withdraw: id, date, amount, tax, currency_amount, currency_tax and destiny.
+
+Every row also belongs to an account, the owner of the exchange account, in the canonical
+`account_id` column. Statements without one belong to the account passed to `parse_statement`.
+The `crypto` tables are keyed by (account_id, id), so the statements of several owners can share
+them, and each account is persisted under its own locks.
+
+Ledger statements, where each row is one balance change rather than one trade (e.g. Binance),
+set `parse` to their own parser instead.
+
+Usage:
+    python -m src.data_ingestion.exchange_statements --exchange coinext [--account NAME] PATH ...
+"""
+
+import logging
+from collections.abc import Callable
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.locks import ingestion_lock
+from src.utils import copy_dataframe_to_database
+
+UNCLASSIFIED = "unclassified"
+ACCOUNT_COLUMN = "account_id"
+# Account of the statements that don't name their owner.
+DEFAULT_ACCOUNT = "default"
+PK_COLUMNS = [ACCOUNT_COLUMN, "id"]
+SWAP_COLUMNS = [
+    "account_id",
+    "id",
+    "date",
+    "received_amount",
+    "paid_taxes_amount",
+    "paid_amount",
+    "received_currency",
+    "paid_taxes_currency",
+    "paid_currency",
+    "exchange_name",
+]
+BRL_DEPOSIT_COLUMNS = ["account_id", "id", "date", "value_brl", "exchange_name"]
+WITHDRAW_COLUMNS = [
+    "account_id",
+    "id",
+    "date",
+    "amount",
+    "tax",
+    "currency_amount",
+    "currency_tax",
+    "source",
+    "destiny",
+]
+# Tables a statement may write, locked together for each account while it is persisted.
+STATEMENT_TABLES = ["crypto.swaps", "crypto.earnings", "crypto.brl_deposits", "crypto.withdraws"]
+
+
+class StatementSpec(NamedTuple):
+    """Declaration of an exchange statement format.
+
+    Attributes
+    ----------
+    exchange : str
+        Name stored in `exchange_name` and `source`.
+    columns : dict[str, str]
+        Renames from the statement columns to the canonical ones.
+    classifiers : dict[str, Callable]
+        Boolean mask of the rows of each kind ("swap", "deposit" or "withdraw"), computed on the
+        prepared frame. The first matching kind wins.
+    prepare : Callable, optional
+        Vectorized step run after the renames, deriving the remaining canonical columns.
+    parse : Callable, optional
+        Parser of ledger statements, replacing the classifiers and table builders.
+    persist : Callable, optional
+        Persistence of the parsed tables, if not `persist_statement`.
+    read_csv_kwargs : dict, optional
+        Options passed to `pd.read_csv` for the statement files.
+    """
+    exchange: str
+    columns: dict[str, str]
+    classifiers: dict[str, Callable[[pd.DataFrame], pd.Series]] | None = None
+    prepare: Callable[[pd.DataFrame], pd.DataFrame] | None = None
+    parse: Callable[[pd.DataFrame], dict[str, pd.DataFrame]] | None = None
+    persist: Callable[[dict[str, pd.DataFrame]], None] | None = None
+    read_csv_kwargs: dict | None = None
+
+
+def column(df: pd.DataFrame, name: str) -> pd.Series:
+    """Return column `name` of `df`, or an all-missing column if the statement lacks it."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(np.nan, index=df.index, dtype=object)
+
+
+def assign_account_ids(df: pd.DataFrame, account: str = DEFAULT_ACCOUNT) -> pd.DataFrame:
+    """Return `df` with its `account_id` column as strings, `account` where it has none."""
+    if ACCOUNT_COLUMN not in df.columns:
+        return df.assign(**{ACCOUNT_COLUMN: account})
+    return df.assign(**{ACCOUNT_COLUMN: df[ACCOUNT_COLUMN].fillna(account).astype(str)})
+
+
+def split_accounts(table: pd.DataFrame) -> dict[str, pd.DataFrame]:
+    """Split a parsed table by account."""
+    return {account: rows for account, rows in table.groupby(ACCOUNT_COLUMN, sort=True)}
+
+
+def classify_rows(df: pd.DataFrame, spec: StatementSpec) -> np.ndarray:
+    """Return the kind of every row of the prepared frame `df`."""
+    classifiers = spec.classifiers or {}
+    return np.select(
+        [classifier(df).fillna(False).to_numpy(dtype=bool) for classifier in classifiers.values()],
+        list(classifiers),
+        default=UNCLASSIFIED,
+    )
+
+
+def build_swaps(trades: pd.DataFrame, exchange: str) -> pd.DataFrame:
+    """Build `crypto.swaps` rows from canonical trades, summing the fills of each order."""
+    is_buy = (trades["side"] == "buy").to_numpy()
+    base_amount = trades["base_amount"].astype(float).abs().to_numpy()
+    quote_amount = trades["quote_amount"].astype(float).abs().to_numpy()
+    swaps = pd.DataFrame({
+        "account_id": trades["account_id"].to_numpy(),
+        "id": trades["id"].to_numpy(),
+        "date": trades["date"].to_numpy(),
+        "received_amount": np.where(is_buy, base_amount, quote_amount),
+        "paid_taxes_amount": trades["fee_amount"].astype(float).abs().fillna(0).to_numpy(),
+        "paid_amount": np.where(is_buy, quote_amount, base_amount),
+        "received_currency": np.where(is_buy, trades["base"], trades["quote"]),
+        "paid_taxes_currency": trades["fee_currency"].to_numpy(),
+        "paid_currency": np.where(is_buy, trades["quote"], trades["base"]),
+    })
+    return (
+        swaps.groupby(
+            [
+                "account_id",
+                "id",
+                "date",
+                "received_currency",
+                "paid_taxes_currency",
+                "paid_currency",
+            ],
+            as_index=False,
+            dropna=False,
+            sort=True,
+        )[["received_amount", "paid_taxes_amount", "paid_amount"]]
+        .sum()
+        .assign(exchange_name=exchange)
+    )[SWAP_COLUMNS]
+
+
+def build_brl_deposits(deposits: pd.DataFrame, exchange: str) -> pd.DataFrame:
+    """Build `crypto.brl_deposits` rows from canonical deposits."""
+    return deposits.assign(
+        value_brl=lambda df: df["value_brl"].astype(float), exchange_name=exchange
+    )[BRL_DEPOSIT_COLUMNS]
+
+
+def build_withdraws(withdraws: pd.DataFrame, exchange: str) -> pd.DataFrame:
+    """Build `crypto.withdraws` rows from canonical withdraws."""
+    return withdraws.assign(source=exchange)[WITHDRAW_COLUMNS]
+
+
+BUILDERS = {
+    "swap": ("swaps", build_swaps, SWAP_COLUMNS),
+    "deposit": ("brl_deposits", build_brl_deposits, BRL_DEPOSIT_COLUMNS),
+    "withdraw": ("withdraws", build_withdraws, WITHDRAW_COLUMNS),
+}
+
+
+def parse_statement(
+    raw: pd.DataFrame, spec: StatementSpec, account: str = DEFAULT_ACCOUNT
+) -> dict[str, pd.DataFrame]:
+    """Parse a statement into the tables of the `crypto` schema.
+
+    Rows are assigned to their `account_id` column, once renamed, or else to `account`.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        The `swaps`, `brl_deposits` and `withdraws` tables, plus the `remaining_records` no
+        classifier matched. Ledger statements return the tables of their `parse` function.
+    """
+    df = assign_account_ids(raw.rename(columns=spec.columns), account)
+    if spec.prepare is not None:
+        df = spec.prepare(df)
+    if spec.parse is not None:
+        return spec.parse(df)
+
+    kinds = classify_rows(df, spec)
+    results = {}
+    for kind, (table, builder, columns) in BUILDERS.items():
+        is_kind = kinds == kind
+        results[table] = (
+            builder(df[is_kind], spec.exchange) if is_kind.any() else pd.DataFrame(columns=columns)
+        )
+    results["remaining_records"] = raw[kinds == UNCLASSIFIED].reset_index(drop=True)
+    return results
+
+
+def read_statements(
+    paths: list[str], spec: StatementSpec, account: str = DEFAULT_ACCOUNT
+) -> dict[str, pd.DataFrame]:
+    """Read and parse statement files, concatenating the tables parsed from each one.
+
+    Files are parsed one at a time, so one exchange can export different layouts, e.g. trades
+    and deposits.
+    """
+    parsed = [
+        parse_statement(pd.read_csv(path, **(spec.read_csv_kwargs or {})), spec, account)
+        for path in paths
+    ]
+    return {
+        key: pd.concat([results[key] for results in parsed], ignore_index=True)
+        for key in parsed[0]
+    }
+
+
+def persist_statement(results: dict[str, pd.DataFrame]) -> None:
+    """Bulk upsert the tables returned by `parse_statement`, locking each account meanwhile."""
+    tables = {
+        table: split_accounts(results[table])
+        for table in ["swaps", "brl_deposits", "withdraws"]
+        if table in results
+    }
+    accounts = sorted({account for by_account in tables.values() for account in by_account})
+    for account in accounts:
+        with ingestion_lock(*account_locks(account)):
+            for table, by_account in tables.items():
+                rows = by_account.get(account)
+                if rows is None or rows.empty:
+                    continue
+                copy_dataframe_to_database(
+                    rows, "crypto", table, pk_columns=PK_COLUMNS, assign_processed_at_column=True
+                )
+                logging.info(f"Persisted {len(rows)} rows of {account} to crypto.{table}.")
+    remaining = results.get("remaining_records")
+    if remaining is not None and not remaining.empty:
+        logging.warning(f"{len(remaining)} records were not recognized and need manual input.")
+
+
+def account_locks(account: str) -> list[tuple[str, str]]:
+    """Return the locks of the `crypto` tables of `account`."""
+    return [(table, account) for table in STATEMENT_TABLES]
+
+
+def get_statement_spec(exchange: str) -> StatementSpec:
+    """Return the statement spec of `exchange`."""
+    from .binance_order_history import BINANCE_STATEMENT
+    from .biscoint import BISCOINT_STATEMENT
+    from .coinext import COINEXT_STATEMENT
+
+    specs = {
+        spec.exchange: spec for spec in [BINANCE_STATEMENT, BISCOINT_STATEMENT, COINEXT_STATEMENT]
+    }
+    if exchange not in specs:
+        raise ValueError(f"Unknown exchange statement: {exchange}")
+    return specs[exchange]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Load exchange statements into the database.")
+    parser.add_argument("--exchange", required=True, help="Exchange of the statements.")
+    parser.add_argument("paths", nargs="+", help="Statement CSV files.")
+    parser.add_argument(
+        "--account",
+        default=DEFAULT_ACCOUNT,
+        help="Owner of the statements, if they don't have an account column.",
+    )
+    parser.add_argument(
+        "--remaining_path", default=None, help="CSV file to save the unrecognized records to."
+    )
+    args = parser.parse_args()
+
+    spec = get_statement_spec(args.exchange)
+    results = read_statements(args.paths, spec, args.account)
+    (spec.persist or persist_statement)(results)
+    if args.remaining_path and "remaining_records" in results:
+        results["remaining_records"].to_csv(args.remaining_path, index=False)
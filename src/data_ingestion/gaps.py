@@ -0,0 +1,201 @@
+"""Find and repair holes in the quotation series.
+
+`get_currencies_data_from_last_record` only fetches after the last stored date, so days lost
+by failed runs or provider outages stay missing. This module compares every stored series with
+the trading calendar of its market, merges the missing days into a few date windows and
+refetches only those windows through the `PROVIDERS` registry.
+
+Usage:
+    python -m src.data_ingestion.gaps [--dry_run] [--merge_within 5]
+"""
+
+import logging
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.locks import ingestion_lock
+from src.utils import read_sql_query
+
+from .calendars import get_trading_days
+from .data_ingestion import (
+    PROVIDERS,
+    QUOTATION_SERIES,
+    get_wallet_series,
+    ingest_currency_data,
+)
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+
+def merge_missing_days(
+    trading_days: pd.DatetimeIndex,
+    missing_days: pd.DatetimeIndex,
+    merge_within: int = 5,
+) -> list[tuple[pd.Timestamp, pd.Timestamp]]:
+    """Merge missing days into the minimal list of (start, end) windows covering them.
+
+    Missing days at most `merge_within` trading days apart are fetched in the same window,
+    since one slightly larger request is cheaper than two.
+    """
+    if missing_days.empty:
+        return []
+    positions = trading_days.get_indexer(missing_days)
+    breaks = np.flatnonzero(np.diff(positions) > merge_within)
+    starts = np.concatenate([[0], breaks + 1])
+    ends = np.concatenate([breaks, [len(positions) - 1]])
+    return list(zip(missing_days[starts], missing_days[ends]))
+
+
+def find_gaps(
+    stored_dates: pd.DataFrame,
+    series: list[dict[str, str]],
+    merge_within: int = 5,
+) -> pd.DataFrame:
+    """Find the windows of missing trading days inside each stored series.
+
+    Parameters
+    ----------
+    stored_dates : pd.DataFrame
+        Columns asset, currency and date of the stored quotations.
+    series : list[dict[str, str]]
+        Series to scan, in the format of `QUOTATION_SERIES`.
+    merge_within : int
+        See `merge_missing_days`.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per window, with the series fields, start, end and the number of missing days.
+    """
+    stored_dates = stored_dates.assign(date=lambda df: pd.to_datetime(df["date"]))
+    dates_by_series = {
+        key: pd.DatetimeIndex(group["date"]).unique()
+        for key, group in stored_dates.groupby(["asset", "currency"])
+    }
+
+    windows = []
+    for entry in series:
+        stored = dates_by_series.get((entry["asset"], entry["currency"]))
+        if stored is None or stored.empty:
+            continue
+        trading_days = get_trading_days(entry["calendar"], stored.min(), stored.max())
+        missing = trading_days.difference(stored)
+        for start, end in merge_missing_days(trading_days, missing, merge_within):
+            windows.append({
+                **entry,
+                "start": start,
+                "end": end,
+                "missing_days": int(((missing >= start) & (missing <= end)).sum()),
+            })
+    return pd.DataFrame(
+        windows,
+        columns=["provider", "symbol", "asset", "currency", "calendar", "start", "end",
+                 "missing_days"],
+    )
+
+
+def get_gaps(
+    series: list[dict[str, str]],
+    table_schema: str = "currencies",
+    table_name: str = "quotations",
+    merge_within: int = 5,
+) -> pd.DataFrame:
+    """Read the stored dates of `series` and return their gaps, as returned by `find_gaps`."""
+    if not series:
+        return find_gaps(pd.DataFrame(columns=["asset", "currency", "date"]), series)
+    keys = ", ".join(f"(:asset_{i}, :currency_{i})" for i in range(len(series)))
+    params = {}
+    for i, entry in enumerate(series):
+        params[f"asset_{i}"], params[f"currency_{i}"] = entry["asset"], entry["currency"]
+    stored_dates = read_sql_query(
+        f"""
+        SELECT asset, currency, date
+        FROM {table_schema}.{table_name}
+        WHERE (asset, currency) IN ({keys})
+        """,
+        params=params,
+    )
+    gaps = find_gaps(stored_dates, series, merge_within)
+    logging.info(
+        f"Found {gaps['missing_days'].sum()} missing days in {len(gaps)} windows"
+        f" of {gaps[['asset', 'currency']].drop_duplicates().shape[0]} series."
+    )
+    return gaps
+
+
+def repair_gaps(
+    series: list[dict[str, str]] | None = None,
+    table_schema: str = "currencies",
+    table_name: str = "quotations",
+    merge_within: int = 5,
+) -> dict[tuple[str, date, date], Exception]:
+    """Refetch and persist the missing windows of every series.
+
+    Each window is refetched while holding the ingestion lock of its series, so it never races
+    the regular ingestion of the same series. A failed window does not stop the others.
+
+    Parameters
+    ----------
+    series : list[dict[str, str]], optional
+        Series to repair. Defaults to `QUOTATION_SERIES` plus the stocks in wallet.
+    table_schema : str
+        Schema name of the quotations table.
+    table_name : str
+        Name of the quotations table.
+    merge_within : int
+        See `merge_missing_days`.
+
+    Returns
+    -------
+    dict[tuple[str, date, date], Exception]
+        Error of each failed (symbol, start, end) window. Failed windows are found again by the
+        next run.
+    """
+    series = series if series is not None else QUOTATION_SERIES + get_wallet_series()
+    gaps = get_gaps(series, table_schema, table_name, merge_within)
+
+    errors = {}
+    for window in gaps.itertuples(index=False):
+        series_lock = (f"{table_schema}.{table_name}", f"{window.asset}/{window.currency}")
+        try:
+            with ingestion_lock(series_lock):
+                data = PROVIDERS[window.provider](
+                    symbol=window.symbol,
+                    start_date=window.start.strftime("%Y-%m-%d"),
+                    # Some providers treat the end date as exclusive.
+                    end_date=(window.end + timedelta(days=1)).strftime("%Y-%m-%d"),
+                )
+                if data is not None and not data.empty:
+                    data = data.assign(asset=window.asset, currency=window.currency)
+                ingest_currency_data(data, table_schema, table_name)
+        except Exception as error:
+            logging.error(
+                f"Could not repair {window.symbol} from {window.start:%Y-%m-%d}"
+                f" to {window.end:%Y-%m-%d}: {error}"
+            )
+            errors[(window.symbol, window.start.date(), window.end.date())] = error
+    return errors
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Refetch missing days of the quotation series.")
+    parser.add_argument(
+        "--dry_run", action="store_true", help="Only report the gaps, do not refetch them."
+    )
+    parser.add_argument(
+        "--merge_within",
+        type=int,
+        default=5,
+        help="Merge gaps at most this number of trading days apart.",
+    )
+    args = parser.parse_args()
+
+    if args.dry_run:
+        with pd.option_context("display.max_rows", None):
+            print(get_gaps(QUOTATION_SERIES + get_wallet_series(), merge_within=args.merge_within))
+    else:
+        repair_gaps(merge_within=args.merge_within)
@@ -0,0 +1,152 @@
+"""Ingest intraday OHLCV candles and derive lower-frequency series from them.
+
+Candles are stored in `currencies.candles`, keyed by timestamp and interval, so the daily
+`currencies.quotations` table is not touched. Loads go through Postgres COPY.
+
+Usage:
+    python -m src.data_ingestion.data_ingestion --mode intraday --symbol BTCUSDT \\
+        --asset BTC --currency USDT --interval 15m
+"""
+
+import logging
+from datetime import datetime
+
+import pandas as pd
+
+from src.locks import ingestion_lock
+from src.utils import copy_dataframe_to_database, read_sql_query
+
+from .binance_api import INTERVAL_MINUTES, get_binance_klines
+
+CANDLES_SCHEMA = "currencies"
+CANDLES_TABLE = "candles"
+CANDLES_PK = ["asset", "currency", "interval_minutes", "ts"]
+OHLCV_AGGREGATIONS = {
+    "open": "first",
+    "high": "max",
+    "low": "min",
+    "close": "last",
+    "volume": "sum",
+}
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+
+def get_last_candle_ts(
+    asset: str, currency: str, interval: str, default=datetime(2020, 1, 1)
+) -> datetime:
+    """Return the timestamp of the most recent stored candle, or `default` if there is none."""
+    last = read_sql_query(f"""
+        SELECT MAX(ts) AS max_ts
+        FROM {CANDLES_SCHEMA}.{CANDLES_TABLE}
+        WHERE asset = '{asset}'
+        AND currency = '{currency}'
+        AND interval_minutes = {INTERVAL_MINUTES[interval]}
+    """)
+    if last.empty or pd.isna(last["max_ts"].iloc[0]):
+        logging.info(f"No {interval} candles found for {asset}-{currency}, using {default}.")
+        return default
+    return last["max_ts"].iloc[0]
+
+
+def ingest_intraday_candles(
+    symbol: str,
+    asset: str,
+    currency: str,
+    interval: str,
+    start_date: str | None = None,
+    end_date: str | None = None,
+) -> int:
+    """Fetch Binance candles of `interval` and bulk upsert them into `currencies.candles`.
+
+    Parameters
+    ----------
+    symbol : str
+        Binance symbol, e.g. "BTCUSDT".
+    asset : str
+        Asset code stored in the database.
+    currency : str
+        Quote currency stored in the database.
+    interval : str
+        Candle interval, e.g. "15m" or "1h".
+    start_date : str, optional
+        First day to fetch, in format "%Y-%m-%d". Defaults to the day of the last stored candle.
+    end_date : str, optional
+        Last day to fetch, in format "%Y-%m-%d". Defaults to today.
+
+    Returns
+    -------
+    int
+        Number of candles persisted.
+    """
+    series_lock = (f"{CANDLES_SCHEMA}.{CANDLES_TABLE}", f"{asset}/{currency}/{interval}")
+    with ingestion_lock(series_lock):
+        start_date = (
+            start_date or get_last_candle_ts(asset, currency, interval).strftime("%Y-%m-%d")
+        )
+        end_date = end_date or datetime.now().strftime("%Y-%m-%d")
+
+        candles = get_binance_klines(symbol, start_date, end_date, interval)
+        if candles is None or candles.empty:
+            logging.warning(f"No {interval} candles for {symbol}. Skipping persistence.")
+            return 0
+
+        candles = candles.assign(
+            asset=asset, currency=currency, interval_minutes=INTERVAL_MINUTES[interval]
+        )
+        copy_dataframe_to_database(
+            candles,
+            CANDLES_SCHEMA,
+            CANDLES_TABLE,
+            pk_columns=CANDLES_PK,
+            assign_processed_at_column=True,
+        )
+        logging.info(f"Persisted {len(candles)} {interval} candles of {asset}-{currency}.")
+        return len(candles)
+
+
+def read_candles(
+    assets: list[str],
+    currency: str,
+    interval: str,
+    start: str,
+    end: str | None = None,
+) -> pd.DataFrame:
+    """Read stored candles of several assets between `start` and `end` (inclusive)."""
+    asset_list = ", ".join(f"'{asset}'" for asset in assets)
+    end_filter = f"AND ts < DATE '{end}' + 1" if end else ""
+    return read_sql_query(f"""
+        SELECT ts, asset, currency, open, high, low, close, volume
+        FROM {CANDLES_SCHEMA}.{CANDLES_TABLE}
+        WHERE asset IN ({asset_list})
+        AND currency = '{currency}'
+        AND interval_minutes = {INTERVAL_MINUTES[interval]}
+        AND ts >= DATE '{start}'
+        {end_filter}
+        ORDER BY asset, ts
+    """)
+
+
+def downsample_candles(candles: pd.DataFrame, rule: str = "1D") -> pd.DataFrame:
+    """Aggregate candles of one or more assets into a coarser OHLCV series.
+
+    Parameters
+    ----------
+    candles : pd.DataFrame
+        Candles with columns ts, asset, currency, open, high, low, close and volume.
+    rule : str
+        Pandas offset alias of the target frequency, e.g. "1D" for daily or "W-SUN" for weekly.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per asset, currency and period. Bins are labeled as in pandas resampling, e.g.
+        weekly bins by their last day.
+    """
+    return (
+        candles.sort_values("ts")
+        .groupby(["asset", "currency", pd.Grouper(key="ts", freq=rule)])
+        .agg(OHLCV_AGGREGATIONS)
+        .dropna(subset=["open"])
+        .reset_index()
+    )
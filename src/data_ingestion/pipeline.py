@@ -0,0 +1,186 @@
+"""Pipelined fetch and persist of many ingestion jobs.
+
+Fetchers run in a thread pool and push their frames onto a bounded queue. A single writer
+thread drains it, concatenating frames into batches that are bulk upserted with
+`copy_dataframe_to_database`. Network and database I/O overlap, and memory is bounded by the
+queue size plus one batch, however many jobs run:
+
+* Backpressure: fetchers block while the queue is full.
+* Flush on size or time: a batch is written once it holds `batch_rows` rows or `flush_interval`
+  seconds passed since the last write.
+* Error isolation: a failing job is logged and reported, the others go on. A failing batch is
+  written again job by job, so only the jobs whose own rows fail are reported.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from src.utils import CONN_STR, copy_dataframe_to_database
+
+_STOP = object()
+
+
+class WriteBehindWriter:
+    """Single writer thread batching the frames put on a bounded queue into bulk upserts.
+
+    Use as a context manager: leaving it flushes the pending rows and waits for the writer.
+
+    Parameters
+    ----------
+    schema : str
+        Schema of the target table.
+    table : str
+        Name of the target table.
+    pk_columns : list[str]
+        Primary key columns of the target table.
+    max_queue : int
+        Number of frames the queue holds before `put` blocks.
+    batch_rows : int
+        Number of rows that triggers a write.
+    flush_interval : float
+        Maximum time, in seconds, pending rows wait before being written.
+    conn_str : str
+        The connection string of the database.
+    """
+
+    def __init__(
+        self,
+        schema: str,
+        table: str,
+        pk_columns: list[str],
+        max_queue: int = 16,
+        batch_rows: int = 50_000,
+        flush_interval: float = 5.0,
+        conn_str: str = CONN_STR,
+    ):
+        self.schema = schema
+        self.table = table
+        self.pk_columns = pk_columns
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.conn_str = conn_str
+        self.rows_written = 0
+        self.errors: dict[str, Exception] = {}
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name=f"writer-{table}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def put(self, name: str, frame: pd.DataFrame) -> None:
+        """Queue the rows fetched by job `name`, blocking while the queue is full."""
+        if frame is not None and not frame.empty:
+            self._queue.put((name, frame))
+
+    def _run(self) -> None:
+        pending, names, n_rows = [], [], 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(self.flush_interval - (time.monotonic() - last_flush), 0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is not None and item is not _STOP:
+                name, frame = item
+                pending.append(frame)
+                names.append(name)
+                n_rows += len(frame)
+
+            due = n_rows >= self.batch_rows or time.monotonic() - last_flush >= self.flush_interval
+            if pending and (due or item is _STOP):
+                self._flush(pending, names)
+                pending, names, n_rows = [], [], 0
+            if due or not pending:
+                last_flush = time.monotonic()
+            if item is _STOP:
+                return
+
+    def _flush(self, frames: list[pd.DataFrame], names: list[str]) -> None:
+        try:
+            self._write(pd.concat(frames, ignore_index=True))
+        except Exception:
+            logging.exception(f"Failed to write a batch of jobs {names}. Writing them one by one.")
+            # One bad frame must not fail the healthy jobs sharing its batch.
+            for name, frame in zip(names, frames):
+                try:
+                    self._write(frame)
+                except Exception as e:
+                    logging.exception(f"Failed to write the {len(frame)} rows of job {name}.")
+                    self.errors[name] = e
+
+    def _write(self, batch: pd.DataFrame) -> None:
+        copy_dataframe_to_database(
+            batch,
+            self.schema,
+            self.table,
+            self.pk_columns,
+            assign_processed_at_column=True,
+            conn_str=self.conn_str,
+        )
+        self.rows_written += len(batch)
+        logging.info(f"Wrote {len(batch)} rows to {self.schema}.{self.table}.")
+
+
+def run_pipeline(
+    jobs: dict[str, Callable[[], pd.DataFrame | None]],
+    schema: str,
+    table: str,
+    pk_columns: list[str],
+    n_fetchers: int = 4,
+    conn_str: str = CONN_STR,
+    **writer_kwargs,
+) -> dict[str, Exception]:
+    """Run fetch jobs concurrently and persist their frames through a `WriteBehindWriter`.
+
+    Parameters
+    ----------
+    jobs : dict[str, Callable[[], pd.DataFrame | None]]
+        Fetch function of each job, by job name. Empty or None results are skipped.
+    schema, table, pk_columns
+        Target table, see `WriteBehindWriter`.
+    n_fetchers : int
+        Number of jobs fetched at once.
+    conn_str : str
+        The connection string of the database.
+    **writer_kwargs
+        Batching options of `WriteBehindWriter`.
+
+    Returns
+    -------
+    dict[str, Exception]
+        Error of each failed job, by job name. Empty if every job was persisted.
+    """
+    errors = {}
+
+    with WriteBehindWriter(schema, table, pk_columns, conn_str=conn_str, **writer_kwargs) as writer:
+        def fetch(name: str) -> None:
+            try:
+                frame = jobs[name]()
+            except Exception as e:
+                logging.exception(f"Job {name} failed.")
+                errors[name] = e
+                return
+            writer.put(name, frame)
+
+        with ThreadPoolExecutor(max_workers=n_fetchers) as executor:
+            list(executor.map(fetch, jobs))
+
+    errors.update(writer.errors)
+    logging.info(
+        f"Pipeline finished: {len(jobs) - len(errors)} of {len(jobs)} jobs persisted,"
+        f" {writer.rows_written} rows written."
+    )
+    return errors
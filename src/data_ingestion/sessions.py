@@ -0,0 +1,20 @@
+"""Shared HTTP sessions of the API clients.
+
+Reusing a `requests.Session` keeps the connections to each provider alive between calls, which
+saves the TCP and TLS handshakes of every request, e.g. in the scheduler daemon. Sessions are
+not thread-safe, so each thread gets its own.
+"""
+
+import threading
+
+import requests
+
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """Return the HTTP session of the current thread."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
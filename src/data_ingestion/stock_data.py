@@ -4,11 +4,22 @@ import pandas as pd
 
 from src.data_ingestion.google_sheets_automation import get_google_sheet_data
 from src.finances_utils import process_new_trades
+from src.locks import ingestion_lock
+from src.tracing import trace_run
 from src.utils import persist_dataframe_to_database, read_sql_query
 
 
 def run_stocks() -> None:
-    """Read and insert new stocks data into the database."""
+    """Read and insert new stocks data into the database.
+
+    The average prices the new trades start from are read under the transactions lock, so
+    concurrent runs cannot both extend the same history.
+    """
+    with ingestion_lock("stocks.transactions"):
+        _run_stocks()
+
+
+def _run_stocks() -> None:
     new_rows = get_google_sheet_data(worksheet_name="stocks", sheet_name="input_finantial_data")
     df_new = _format_stocks_data(pd.DataFrame(new_rows))
     current_avg_prices = _get_current_avg_prices()
@@ -78,7 +89,8 @@ def _get_current_avg_prices() -> pd.DataFrame:
             FROM stocks.transactions
         ) sub
         WHERE rn = 1
-        """
+        """,
+        cache=True,
     )
 
 
@@ -94,10 +106,37 @@ def run_dividends() -> None:
         "dividends_incomes",
         True,
         pk_columns=["date", "ticker", "type", "source"],
+        diff=True,
+    )
+
+
+def run_allocations() -> None:
+    """Insert the monthly value of each macroallocation into the database."""
+    allocations = pd.DataFrame(
+        get_google_sheet_data(worksheet_name="allocations", sheet_name="input_finantial_data")
+    )
+    persist_dataframe_to_database(
+        allocations.assign(value=lambda df: df["value"].apply(_parse_brl_number)),
+        "stocks",
+        "allocations",
+        True,
+        pk_columns=["year_month", "macroallocation"],
+        diff=True,
     )
 
 
 if __name__ == "__main__":
-    run_stocks()
-    # run_dividends()
-    # run_allocations()
\ No newline at end of file
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Insert new stocks data into the database.")
+    parser.add_argument(
+        "--trace-sql",
+        action="store_true",
+        help="Log the latency of every SQL statement of the run, slowest first.",
+    )
+    args = parser.parse_args()
+
+    with trace_run("stock_data", enabled=args.trace_sql):
+        run_stocks()
+        # run_dividends()
+        # run_allocations()
\ No newline at end of file
@@ -0,0 +1,232 @@
+"""Dividend and income analytics over `stocks.dividends_incomes` and `stocks.transactions`.
+
+Metrics are computed on month x ticker matrices, so every rolling window runs once over the
+whole history instead of once per ticker:
+
+- monthly income per ticker and for the whole portfolio;
+- cost basis per ticker, from the average-cost history of the transactions;
+- trailing-12-month income and yield-on-cost;
+- payout cadence per ticker.
+
+Results are cached until the source tables change, and `run` persists them to
+`stocks.income_metrics` and `stocks.payout_cadence` for the dashboards.
+
+Usage:
+    python -m src.dividends
+"""
+
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.utils import (
+    CONN_STR,
+    cache_on_tables_watermark,
+    copy_dataframe_to_database,
+    get_tables_watermark,
+    read_sql_query,
+)
+
+SOURCE_TABLES = ["stocks.dividends_incomes", "stocks.transactions"]
+TOTAL_TICKER = "TOTAL"
+TRAILING_MONTHS = 12
+# Upper bound, in days, of the median interval between payments of each cadence.
+CADENCE_BINS = [0, 45, 75, 135, 270, np.inf]
+CADENCE_LABELS = ["monthly", "bimonthly", "quarterly", "semiannual", "annual"]
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+
+def get_monthly_income(dividends: pd.DataFrame) -> pd.DataFrame:
+    """Return a month x ticker matrix with the income received in each month.
+
+    Months without any income are filled with zeros, so the index is a complete monthly range.
+    """
+    if dividends.empty:
+        return pd.DataFrame(index=pd.DatetimeIndex([], name="year_month"), dtype=float)
+
+    income = (
+        dividends.assign(year_month=lambda df: _to_month(df["date"]))
+        .pivot_table(index="year_month", columns="ticker", values="value", aggfunc="sum")
+        .fillna(0.0)
+    )
+    return income.reindex(_month_range(income.index), fill_value=0.0)
+
+
+def get_monthly_cost_basis(transactions: pd.DataFrame, months: pd.DatetimeIndex) -> pd.DataFrame:
+    """Return a month x ticker matrix with the cost basis held at the end of each month.
+
+    The cost basis is `avg_price * current_quantity` of the last transaction of each ticker up
+    to that month.
+    """
+    if months.empty:
+        return pd.DataFrame(index=months, dtype=float)
+
+    cost_basis = (
+        transactions.sort_values("date", kind="stable")
+        .assign(
+            year_month=lambda df: _to_month(df["date"]),
+            cost_basis=lambda df: df["avg_price"] * df["current_quantity"],
+        )
+        .groupby(["year_month", "ticker"])["cost_basis"]
+        .last()
+        .unstack("ticker")
+    )
+    full_range = _month_range(cost_basis.index.union(months))
+    return cost_basis.reindex(full_range).ffill().reindex(months)
+
+
+def get_trailing_yield_on_cost(
+    income: pd.DataFrame,
+    cost_basis: pd.DataFrame,
+    window: int = TRAILING_MONTHS,
+) -> pd.DataFrame:
+    """Compute trailing income and yield-on-cost for every ticker and the whole portfolio.
+
+    Parameters
+    ----------
+    income : pd.DataFrame
+        Month x ticker income matrix, as returned by `get_monthly_income`.
+    cost_basis : pd.DataFrame
+        Month x ticker cost basis matrix, as returned by `get_monthly_cost_basis`.
+    window : int
+        Number of trailing months summed into the trailing income.
+
+    Returns
+    -------
+    pd.DataFrame
+        Long table with columns year_month, ticker, income, ttm_income, cost_basis and
+        yield_on_cost. The portfolio is reported under the `TOTAL_TICKER` ticker, with the cost
+        basis of every holding, including the ones that never paid.
+    """
+    cost_basis = cost_basis.reindex(index=income.index)
+    total_cost_basis = cost_basis.sum(axis=1, min_count=1)
+    cost_basis = cost_basis.reindex(columns=income.columns)
+    income = income.assign(**{TOTAL_TICKER: income.sum(axis=1)})
+    cost_basis = cost_basis.assign(**{TOTAL_TICKER: total_cost_basis})
+
+    ttm_income = income.rolling(window, min_periods=1).sum()
+    yield_on_cost = ttm_income / cost_basis.where(cost_basis > 0)
+
+    metrics = pd.concat(
+        {
+            "income": income,
+            "ttm_income": ttm_income,
+            "cost_basis": cost_basis,
+            "yield_on_cost": yield_on_cost,
+        },
+        axis=1,
+    )
+    metrics.index.name = "year_month"
+    return (
+        metrics.stack("ticker", future_stack=True)
+        .reset_index()
+        .query("income != 0 or ttm_income != 0")
+        .reset_index(drop=True)
+    )
+
+
+def get_payout_cadence(dividends: pd.DataFrame, as_of: datetime | None = None) -> pd.DataFrame:
+    """Summarize how often each ticker pays.
+
+    Returns one row per ticker with the number of payment dates in the trailing 12 months, the
+    median number of days between payment dates, the last payment date and a cadence label.
+    """
+    as_of = pd.Timestamp(as_of or datetime.now())
+    payments = (
+        dividends.assign(date=lambda df: pd.to_datetime(df["date"]))[["ticker", "date"]]
+        .drop_duplicates()
+        .sort_values(["ticker", "date"])
+        .assign(days_between=lambda df: df.groupby("ticker")["date"].diff().dt.days)
+    )
+    cadence = payments.groupby("ticker").agg(
+        median_days_between=("days_between", "median"),
+        last_payment=("date", "max"),
+    )
+    cadence["payments_ttm"] = (
+        payments[payments["date"] > as_of - pd.DateOffset(months=TRAILING_MONTHS)]
+        .groupby("ticker")
+        .size()
+        .reindex(cadence.index, fill_value=0)
+    )
+    cadence["cadence"] = pd.cut(
+        cadence["median_days_between"], bins=CADENCE_BINS, labels=CADENCE_LABELS
+    ).astype(object)
+    return cadence.reset_index()[
+        ["ticker", "payments_ttm", "median_days_between", "last_payment", "cadence"]
+    ]
+
+
+@cache_on_tables_watermark(SOURCE_TABLES)
+def compute_income_metrics(*, conn_str: str = CONN_STR) -> dict[str, pd.DataFrame]:
+    """Compute every income metric from the database.
+
+    Results are cached until `stocks.dividends_incomes` or `stocks.transactions` change.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        "income_metrics", as returned by `get_trailing_yield_on_cost`, and "payout_cadence",
+        as returned by `get_payout_cadence`.
+    """
+    dividends = read_sql_query(
+        "SELECT date, ticker, value FROM stocks.dividends_incomes", conn_str
+    )
+    transactions = read_sql_query(
+        "SELECT date, ticker, avg_price, current_quantity FROM stocks.transactions", conn_str
+    )
+    income = get_monthly_income(dividends)
+    cost_basis = get_monthly_cost_basis(transactions, income.index)
+    return {
+        "income_metrics": get_trailing_yield_on_cost(income, cost_basis),
+        "payout_cadence": get_payout_cadence(dividends),
+    }
+
+
+def run(conn_str: str = CONN_STR) -> None:
+    """Persist the income metrics, unless they are newer than their source tables."""
+    source_processed_at = max(
+        (processed_at for _, processed_at, _ in get_tables_watermark(SOURCE_TABLES, conn_str)
+         if pd.notna(processed_at)),
+        default=None,
+    )
+    metrics_processed_at = read_sql_query(
+        "SELECT MAX(_processed_at) AS max_processed_at FROM stocks.income_metrics", conn_str
+    )["max_processed_at"].iloc[0]
+    if pd.notna(metrics_processed_at) and (
+        source_processed_at is None or metrics_processed_at >= source_processed_at
+    ):
+        logging.info("Income metrics are up to date. Skipping.")
+        return
+
+    metrics = compute_income_metrics(conn_str=conn_str)
+    copy_dataframe_to_database(
+        metrics["income_metrics"],
+        "stocks",
+        "income_metrics",
+        pk_columns=["year_month", "ticker"],
+        assign_processed_at_column=True,
+        conn_str=conn_str,
+    )
+    copy_dataframe_to_database(
+        metrics["payout_cadence"],
+        "stocks",
+        "payout_cadence",
+        pk_columns=["ticker"],
+        assign_processed_at_column=True,
+        conn_str=conn_str,
+    )
+
+
+def _to_month(dates: pd.Series) -> pd.Series:
+    return pd.to_datetime(dates).dt.to_period("M").dt.to_timestamp()
+
+
+def _month_range(months: pd.Index) -> pd.DatetimeIndex:
+    return pd.date_range(months.min(), months.max(), freq="MS", name="year_month")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,137 @@
+"""Daily BRL exchange rates of every quoted currency, as a dense NumPy matrix.
+
+`FXMatrix` pivots `currencies.quotations` once into a (day x currency) matrix of BRL rates:
+
+* days without a quotation (weekends, holidays) carry the last known rate forward;
+* currencies quoted in another currency are converted through it, chaining as deep as needed,
+  e.g. SOL -> USDT -> USD -> BRL;
+* currencies without quotations of their own follow a pivot currency, e.g. USDT follows USD.
+
+Lookups are array indexing: `rate` is O(1) and `convert` values whole ledgers at once.
+`load_fx_matrix` caches the matrix until the quotations table changes.
+"""
+
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from src.utils import CONN_STR, cache_on_tables_watermark, read_sql_query
+
+BASE_CURRENCY = "BRL"
+# Currency -> currency it is assumed equal to when it has no rate of its own.
+PIVOTS = {"USDT": "USD"}
+
+
+class FXMatrix:
+    """Daily BRL rates of a set of currencies.
+
+    Parameters
+    ----------
+    start : date
+        First day of the matrix.
+    currencies : list[str]
+        Currency of each column.
+    rates : np.ndarray
+        (days, currencies) matrix with the BRL value of one unit of each currency, NaN where
+        unknown.
+    """
+
+    def __init__(self, start: date, currencies: list[str], rates: np.ndarray):
+        self.start = np.datetime64(pd.Timestamp(start).date(), "D")
+        self.currencies = pd.Index(currencies)
+        self.rates = rates
+        self._columns = {currency: i for i, currency in enumerate(currencies)}
+
+    @classmethod
+    def from_quotations(
+        cls,
+        quotations: pd.DataFrame,
+        end: date | None = None,
+        pivots: dict[str, str] = PIVOTS,
+    ) -> "FXMatrix":
+        """Build the matrix from quotations with columns date, asset, currency and value.
+
+        The matrix spans from the first quotation to `end`, defaulting to the last quotation.
+        """
+        quotations = quotations.assign(date=lambda df: pd.to_datetime(df["date"]))
+        wide = quotations.pivot_table(
+            index="date", columns=["asset", "currency"], values="value", aggfunc="last"
+        ).sort_index()
+        days = pd.date_range(wide.index.min(), pd.Timestamp(end or wide.index.max()), freq="D")
+        wide = wide.reindex(days).ffill()
+
+        rates = {BASE_CURRENCY: np.ones(len(days))}
+        pending = set(wide.columns)
+        while True:
+            # Convert the quotes whose currency already has a rate, direct BRL quotes first.
+            resolved = sorted(
+                (pair for pair in pending if pair[1] in rates),
+                key=lambda pair: pair[1] != BASE_CURRENCY,
+            )
+            if resolved:
+                for asset, currency in resolved:
+                    if asset not in rates:
+                        rates[asset] = wide[(asset, currency)].to_numpy() * rates[currency]
+                pending -= set(resolved)
+                continue
+            # Only then fall back to pivots, which may unlock further quotes.
+            pivoted = {
+                currency: target for currency, target in pivots.items()
+                if currency not in rates and target in rates
+            }
+            if not pivoted:
+                break
+            for currency, target in pivoted.items():
+                rates[currency] = rates[target]
+
+        currencies = sorted(rates)
+        matrix = np.column_stack([rates[currency] for currency in currencies])
+        return cls(days[0], currencies, matrix)
+
+    @property
+    def dates(self) -> pd.DatetimeIndex:
+        return pd.date_range(pd.Timestamp(self.start), periods=len(self.rates), freq="D")
+
+    def _day_index(self, days: np.ndarray) -> np.ndarray:
+        # Days after the matrix keep its last rates; days before it have none (-1).
+        index = (days - self.start).astype(np.int64)
+        return np.where(index < 0, -1, np.minimum(index, len(self.rates) - 1))
+
+    def rate(self, day: date | datetime | str, currency: str) -> float:
+        """Return the BRL value of one unit of `currency` on `day`, NaN if unknown."""
+        if currency == BASE_CURRENCY:
+            return 1.0
+        column = self._columns.get(currency)
+        index = int(self._day_index(np.datetime64(pd.Timestamp(day).date(), "D")))
+        if column is None or index < 0:
+            return np.nan
+        return float(self.rates[index, column])
+
+    def convert(self, amounts, dates, currencies) -> np.ndarray:
+        """Convert `amounts` of `currencies` on `dates` to BRL, element-wise.
+
+        Unknown currencies and days before the first quotation convert to NaN, except the base
+        currency, always worth 1.0 as in `rate`.
+        """
+        amounts = np.asarray(amounts, dtype=float)
+        index = self._day_index(np.asarray(dates, dtype="datetime64[D]"))
+        columns = self.currencies.get_indexer(np.asarray(currencies, dtype=object))
+        known = (index >= 0) & (columns >= 0)
+        rates = np.full(len(amounts), np.nan)
+        rates[known] = self.rates[index[known], columns[known]]
+        rates[np.asarray(currencies, dtype=object) == BASE_CURRENCY] = 1.0
+        return amounts * rates
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the matrix as a DataFrame, one row per day and one column per currency."""
+        return pd.DataFrame(self.rates, index=self.dates, columns=self.currencies)
+
+
+@cache_on_tables_watermark(["currencies.quotations"])
+def load_fx_matrix(*, conn_str: str = CONN_STR) -> FXMatrix:
+    """Build the `FXMatrix` of the quotations table, up to today."""
+    quotations = read_sql_query(
+        "SELECT date, asset, currency, value FROM currencies.quotations", conn_str
+    )
+    return FXMatrix.from_quotations(quotations, end=datetime.now().date())
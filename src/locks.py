@@ -0,0 +1,80 @@
+"""Locks that let ingestion jobs run concurrently, across processes and hosts.
+
+A job takes `ingestion_lock` on the (table, key) resources it writes, e.g.
+("currencies.quotations", "USD/BRL"), around its whole read-watermark, fetch and persist cycle.
+Two jobs on the same series then run one after the other instead of both fetching the same
+window, while jobs on other series run in parallel. On Postgres these are advisory locks;
+embedded DuckDB databases use process-local locks.
+
+Every job takes its locks in one deterministic order, sorted by lock id, so jobs writing
+several tables cannot deadlock each other. Upserts also write their rows in key order (see
+`src.backends`). Time spent waiting for locks is logged and kept in `LOCK_WAITS`.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from src.backends import get_backend
+from src.utils import CONN_STR
+
+# Waits longer than this, in seconds, are logged as warnings.
+LOCK_WAIT_WARNING = 5.0
+
+
+def lock_id(resource: str | tuple[str, str]) -> int:
+    """Return the signed 64-bit advisory lock id of a table or a (table, key) pair."""
+    name = resource if isinstance(resource, str) else "/".join(resource)
+    return int.from_bytes(hashlib.sha1(name.lower().encode()).digest()[:8], "big", signed=True)
+
+
+class LockWaits:
+    """Number of acquisitions and time waited for the locks of each resource."""
+
+    def __init__(self):
+        self.stats: dict[str, dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, resources: list[str], waited: float) -> None:
+        with self._lock:
+            for resource in resources:
+                stats = self.stats.setdefault(
+                    resource, {"acquisitions": 0, "total_wait": 0.0, "max_wait": 0.0}
+                )
+                stats["acquisitions"] += 1
+                stats["total_wait"] += waited
+                stats["max_wait"] = max(stats["max_wait"], waited)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Return the stats of every resource, longest total wait first, in seconds."""
+        with self._lock:
+            stats = pd.DataFrame.from_dict(
+                self.stats, orient="index", columns=["acquisitions", "total_wait", "max_wait"]
+            )
+        stats.index.name = "resource"
+        return stats.sort_values("total_wait", ascending=False)
+
+
+LOCK_WAITS = LockWaits()
+
+
+@contextmanager
+def ingestion_lock(*resources: str | tuple[str, str], conn_str: str = CONN_STR):
+    """Hold the locks of `resources`, tables or (table, key) pairs, during the block.
+
+    Locks are acquired in lock id order whatever the order of `resources`, and are not
+    reentrant: don't nest blocks locking the same resource.
+    """
+    names = sorted({r if isinstance(r, str) else "/".join(r) for r in resources})
+    lock_ids = sorted({lock_id(name) for name in names})
+    started = time.perf_counter()
+    with get_backend(conn_str).lock(lock_ids):
+        waited = time.perf_counter() - started
+        LOCK_WAITS.record(names, waited)
+        if waited >= LOCK_WAIT_WARNING:
+            logging.warning(f"Waited {waited:.1f}s for the locks of {', '.join(names)}.")
+        yield
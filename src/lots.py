@@ -0,0 +1,329 @@
+"""Lot engine: realized gains and open lots by FIFO, specific-lot or average cost.
+
+`match_lots` consumes a ledger of trades in one chronological pass. Each asset keeps its open
+lots in a `LotBook`, a deque of `__slots__` records, and every sale is matched against them:
+
+- "fifo" sells the oldest lots first;
+- "specific" sells the lot named in the sale's `lot_id` column, the index label of the purchase,
+  and falls back to FIFO for the rest and for sales without one;
+- "average" keeps no lots, only the Brazilian weighted average cost, with the same arithmetic as
+  `finances_utils.calculate_avg_price`.
+
+Trades have columns date, ticker, quantity (negative for sales), price and taxes, like
+`stocks.transactions`. Purchase taxes are part of the lot cost and sale taxes reduce proceeds.
+Ledgers with an `account_id` column keep one book per account and ticker, so the lots of
+different owners are never matched against each other. `swaps_to_trades` turns `crypto.swaps`
+into such a ledger, valued in BRL by the `FXMatrix`.
+
+Usage:
+    python -m src.lots --source stocks --method fifo
+"""
+
+import gc
+from collections import deque
+from contextlib import contextmanager
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from src.data_ingestion.exchange_statements import ACCOUNT_COLUMN, assign_account_ids
+from src.fx import BASE_CURRENCY, FXMatrix, load_fx_matrix
+from src.utils import CONN_STR, read_sql_query
+
+METHODS = ("fifo", "specific", "average")
+# Lots with less than this quantity left are considered closed, absorbing float residuals.
+QUANTITY_TOLERANCE = 1e-9
+
+
+class Lot:
+    """What is left of one purchase, the trade at position `trade` of the ledger."""
+
+    __slots__ = ("trade", "quantity", "unit_cost")
+
+    def __init__(self, trade: int, quantity: float, unit_cost: float):
+        self.trade = trade
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+
+
+class LotBook:
+    """Open lots and position of one asset.
+
+    Lots are also indexed by trade if `by_trade` is set, for specific-lot sales.
+    """
+
+    __slots__ = ("lots", "by_trade", "quantity", "cost", "avg_price")
+
+    def __init__(self, by_trade: bool = False):
+        self.lots: deque[Lot] = deque()
+        self.by_trade: dict[int, Lot] | None = {} if by_trade else None
+        self.quantity = 0.0
+        self.cost = 0.0
+        self.avg_price = 0.0
+
+    def buy(self, trade: int, quantity: float, cost: float) -> None:
+        lot = Lot(trade, quantity, cost / quantity)
+        self.lots.append(lot)
+        if self.by_trade is not None:
+            self.by_trade[trade] = lot
+        self.quantity += quantity
+        self.cost += cost
+
+    def sell(self, quantity: float, lot_trade: int | None = None) -> tuple[float, float]:
+        """Remove `quantity` from the open lots, returning its cost and the unmatched part."""
+        cost = 0.0
+        if lot_trade is not None and lot_trade in self.by_trade:
+            quantity, cost = self._take(self.by_trade[lot_trade], quantity, cost)
+        lots = self.lots
+        while quantity > QUANTITY_TOLERANCE and lots:
+            quantity, cost = self._take(lots[0], quantity, cost)
+        # Lots emptied by specific sales leave the deque once they reach its head.
+        while lots and lots[0].quantity <= QUANTITY_TOLERANCE:
+            lots.popleft()
+        self.cost -= cost
+        return cost, max(quantity, 0.0)
+
+    def _take(self, lot: Lot, quantity: float, cost: float) -> tuple[float, float]:
+        taken = min(quantity, lot.quantity)
+        lot.quantity -= taken
+        self.quantity -= taken
+        if lot.quantity <= QUANTITY_TOLERANCE:
+            self.quantity -= lot.quantity
+            lot.quantity = 0.0
+            if self.by_trade is not None:
+                self.by_trade.pop(lot.trade, None)
+            if self.lots and self.lots[0] is lot:
+                self.lots.popleft()
+        return quantity - taken, cost + taken * lot.unit_cost
+
+
+class LotResult(NamedTuple):
+    """Output of `match_lots`.
+
+    Attributes
+    ----------
+    sales : pd.DataFrame
+        One row per sale, indexed by its trade label, with columns date, ticker, quantity,
+        proceeds, cost, realized_gain and unmatched_quantity (sold beyond the open lots).
+    lots : pd.DataFrame
+        Open lots, with columns ticker, lot (label of the purchase), date, quantity and
+        unit_cost. In average mode, one lot per ticker at the average price.
+
+    Both have an account_id column first if the trades have one.
+    positions : pd.DataFrame
+        Indexed like the trades, with the avg_price and current_quantity after each trade.
+    """
+    sales: pd.DataFrame
+    lots: pd.DataFrame
+    positions: pd.DataFrame
+
+
+def match_lots(trades: pd.DataFrame, method: str = "fifo") -> LotResult:
+    """Match the sales of `trades` against their open lots with `method`.
+
+    Trades are processed by date, keeping the ledger order within a day. Lots are kept per
+    ticker, and per account too if `trades` has an `account_id` column.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown lot method {method}, expected one of {METHODS}.")
+    trades = trades.sort_values("date", kind="stable")
+    tickers = trades["ticker"].tolist()
+    by_account = ACCOUNT_COLUMN in trades
+    book_keys = list(zip(trades[ACCOUNT_COLUMN].tolist(), tickers)) if by_account else tickers
+    quantities = trades["quantity"].to_numpy(dtype=float).tolist()
+    prices = trades["price"].to_numpy(dtype=float).tolist()
+    taxes = trades["taxes"].to_numpy(dtype=float).tolist()
+    specific = method == "specific" and "lot_id" in trades
+    if specific:
+        # Position of the purchase each sale names, None if it names none (or an unknown one).
+        lot_positions = trades.index.get_indexer(trades["lot_id"])
+        lot_trades = [None if position < 0 else position for position in lot_positions.tolist()]
+    average = method == "average"
+
+    # The loop works on positions in the sorted ledger and plain floats, the labels and dates
+    # are only looked up for the output. The garbage collector is paused meanwhile: lots hold
+    # no reference cycles, and its passes over millions of them would dominate the run.
+    books: dict[str | tuple[str, str], LotBook] = {}
+    avg_prices = [0.0] * len(trades)
+    current_quantities = [0.0] * len(trades)
+    sale_rows, sold_quantities, sale_proceeds, sale_costs, unmatched_quantities = [], [], [], [], []
+    with _paused_gc():
+        for i, (key, q, p, t) in enumerate(zip(book_keys, quantities, prices, taxes)):
+            book = books.get(key)
+            if book is None:
+                book = books[key] = LotBook(by_trade=specific)
+            if q > 0:
+                if average:
+                    total_cost = book.avg_price * book.quantity + p * q + t
+                    book.quantity += q
+                    book.avg_price = total_cost / book.quantity if book.quantity > 0 else 0
+                else:
+                    book.buy(i, q, p * q + t)
+            elif q < 0:
+                sold = -q
+                if average:
+                    cost, unmatched = book.avg_price * sold, 0.0
+                    book.quantity -= sold
+                else:
+                    cost, unmatched = book.sell(sold, lot_trades[i] if specific else None)
+                sale_rows.append(i)
+                sold_quantities.append(sold)
+                sale_proceeds.append(sold * p - t)
+                sale_costs.append(cost)
+                unmatched_quantities.append(unmatched)
+            if not average:
+                held = book.quantity > QUANTITY_TOLERANCE
+                book.avg_price = book.cost / book.quantity if held else 0.0
+            avg_prices[i] = book.avg_price
+            current_quantities[i] = book.quantity
+        lots = _open_lots(trades, books, average, by_account)
+
+    sale_rows = np.array(sale_rows, dtype=int)
+    proceeds, costs = np.array(sale_proceeds, dtype=float), np.array(sale_costs, dtype=float)
+    sales = pd.DataFrame({
+        "date": trades["date"].to_numpy()[sale_rows],
+        "ticker": trades["ticker"].to_numpy()[sale_rows],
+        "quantity": np.array(sold_quantities, dtype=float),
+        "proceeds": proceeds,
+        "cost": costs,
+        "realized_gain": proceeds - costs,
+        "unmatched_quantity": np.array(unmatched_quantities, dtype=float),
+    }, index=trades.index[sale_rows])
+    if by_account:
+        sales.insert(0, ACCOUNT_COLUMN, trades[ACCOUNT_COLUMN].to_numpy()[sale_rows])
+    positions = pd.DataFrame(
+        {"avg_price": avg_prices, "current_quantity": current_quantities}, index=trades.index
+    )
+    return LotResult(sales, lots, positions)
+
+
+@contextmanager
+def _paused_gc():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _open_lots(
+    trades: pd.DataFrame, books: dict, average: bool, by_account: bool
+) -> pd.DataFrame:
+    if average:
+        held = [(key, book) for key, book in books.items() if book.quantity != 0]
+        lots = pd.DataFrame({
+            "lot": None,
+            "date": None,
+            "quantity": [book.quantity for _, book in held],
+            "unit_cost": [book.avg_price for _, book in held],
+        })
+    else:
+        held = [
+            (key, lot) for key, book in books.items()
+            for lot in book.lots if lot.quantity > QUANTITY_TOLERANCE
+        ]
+        rows = np.array([lot.trade for _, lot in held], dtype=int)
+        lots = pd.DataFrame({
+            "lot": trades.index[rows],
+            "date": trades["date"].to_numpy()[rows],
+            "quantity": [lot.quantity for _, lot in held],
+            "unit_cost": [lot.unit_cost for _, lot in held],
+        })
+    keys = [key for key, _ in held]
+    if by_account:
+        lots.insert(0, "ticker", [ticker for _, ticker in keys])
+        lots.insert(0, ACCOUNT_COLUMN, [account for account, _ in keys])
+    else:
+        lots.insert(0, "ticker", keys)
+    return lots
+
+
+def swaps_to_trades(swaps: pd.DataFrame, fx: FXMatrix) -> pd.DataFrame:
+    """Turn `crypto.swaps` into a ledger of trades valued in BRL.
+
+    Each swap sells its paid currency and buys its received one at the BRL value of the paid
+    amount (or of the received one, if the paid currency has no rate that day). The fee is a
+    tax of the purchase. BRL legs are dropped, BRL being the currency of account. Trades keep
+    the `account_id` of their swap, and are labeled "<account>/<swap id>/buy" and
+    "<account>/<swap id>/sell", as swap ids are only unique within an account.
+
+    Trades are ordered by the time of their swap, its id for the exchanges identifying swaps by
+    timestamp (Binance, Coinext), else the start of its date. The two legs of a swap stay
+    together, the purchase first.
+    """
+    swaps = assign_account_ids(swaps)
+    accounts = swaps[ACCOUNT_COLUMN].to_numpy()
+    labels = swaps[ACCOUNT_COLUMN] + "/" + swaps["id"].astype(str)
+    dates = pd.to_datetime(swaps["date"]).to_numpy(dtype="datetime64[D]")
+    value = fx.convert(swaps["paid_amount"], dates, swaps["paid_currency"])
+    value = np.where(
+        np.isnan(value), fx.convert(swaps["received_amount"], dates, swaps["received_currency"]),
+        value,
+    )
+    fees = np.nan_to_num(fx.convert(
+        swaps["paid_taxes_amount"], dates, swaps["paid_taxes_currency"].fillna(BASE_CURRENCY)
+    ))
+    buys = pd.DataFrame({
+        ACCOUNT_COLUMN: accounts,
+        "date": swaps["date"].to_numpy(),
+        "ticker": swaps["received_currency"].to_numpy(),
+        "quantity": swaps["received_amount"].to_numpy(dtype=float),
+        "price": value / swaps["received_amount"].to_numpy(dtype=float),
+        "taxes": fees,
+    }, index=labels + "/buy")
+    sells = pd.DataFrame({
+        ACCOUNT_COLUMN: accounts,
+        "date": swaps["date"].to_numpy(),
+        "ticker": swaps["paid_currency"].to_numpy(),
+        "quantity": -swaps["paid_amount"].to_numpy(dtype=float),
+        "price": value / swaps["paid_amount"].to_numpy(dtype=float),
+        "taxes": 0.0,
+    }, index=labels + "/sell")
+    trades = pd.concat([buys, sells])
+    trades = trades.iloc[np.lexsort((
+        np.repeat([0, 1], len(swaps)), np.tile(_get_swap_times(swaps), 2)
+    ))]
+    return trades[trades["ticker"] != BASE_CURRENCY]
+
+
+def _get_swap_times(swaps: pd.DataFrame) -> np.ndarray:
+    times = pd.to_datetime(swaps["id"], format="ISO8601", errors="coerce", utc=True)
+    return (
+        times.dt.tz_localize(None)
+        .fillna(pd.to_datetime(swaps["date"]))
+        .to_numpy(dtype="datetime64[s]")
+    )
+
+
+def load_trades(source: str, conn_str: str = CONN_STR) -> pd.DataFrame:
+    """Read the ledger of `source`, "stocks" (`stocks.transactions`) or "crypto" (swaps)."""
+    if source == "stocks":
+        return read_sql_query(
+            "SELECT date, ticker, quantity, price, taxes FROM stocks.transactions", conn_str
+        )
+    if source == "crypto":
+        swaps = read_sql_query("SELECT * FROM crypto.swaps", conn_str)
+        return swaps_to_trades(swaps, load_fx_matrix(conn_str=conn_str))
+    raise ValueError(f"Unknown trades source: {source}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Match sales against open lots.")
+    parser.add_argument("--source", default="stocks", help="Ledger to read, stocks or crypto.")
+    parser.add_argument("--method", default="fifo", help=f"One of {', '.join(METHODS)}.")
+    args = parser.parse_args()
+
+    result = match_lots(load_trades(args.source), args.method)
+    keys = [*result.sales.columns.intersection([ACCOUNT_COLUMN]), "year", "ticker"]
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(result.lots)
+        print(
+            result.sales.assign(year=lambda df: pd.to_datetime(df["date"]).dt.year)
+            .groupby(keys)[["proceeds", "cost", "realized_gain"]]
+            .sum()
+        )
@@ -0,0 +1,436 @@
+"""Portfolio return metrics: time-weighted return (TWR) and money-weighted return (XIRR).
+
+Every asset is laid out as a column of two daily matrices, its market value and its net
+contributions (purchases minus sales and income). Per-class and whole-portfolio series are
+extra columns summing the asset columns, so every metric is computed for every series at once:
+
+- TWR chains daily growth factors, whose cumulative log-sum gives the TWR of any trailing
+  window with a single subtraction;
+- XIRR of every (window, series) pair is solved together by `xirr_batch`, a vectorized
+  Newton solver with a bisection fallback.
+
+Stocks are measured per ticker, from `stocks.transactions` and `stocks.dividends_incomes`.
+Crypto coins are swapped within the same exchange balance, so crypto is measured as a single
+asset, `CRYPTO_BALANCE`, funded by `crypto.brl_deposits` and drained by `crypto.withdraws`.
+
+`run` persists the metrics of the day to `stocks.return_metrics`, one snapshot per `as_of`.
+
+Usage:
+    python -m src.metrics
+"""
+
+import logging
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.fx import FXMatrix, load_fx_matrix
+from src.utils import CONN_STR, copy_dataframe_to_database, read_sql_query
+
+WINDOWS = {
+    "1m": pd.DateOffset(months=1),
+    "3m": pd.DateOffset(months=3),
+    "6m": pd.DateOffset(months=6),
+    "ytd": None,
+    "1y": pd.DateOffset(years=1),
+    "3y": pd.DateOffset(years=3),
+    "5y": pd.DateOffset(years=5),
+    "inception": None,
+}
+PORTFOLIO = "portfolio"
+CRYPTO_BALANCE = "crypto_balance"
+DAYS_PER_YEAR = 365.25
+METRICS_COLUMNS = ["series", "level", "window", "start", "twr", "xirr"]
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+
+def xirr_batch(
+    cash_flows: np.ndarray,
+    years: np.ndarray,
+    tol: float = 1e-9,
+    max_iter: int = 50,
+) -> np.ndarray:
+    """Solve the internal rate of return of many cash flow series at once.
+
+    Finds, for every row, the annual rate `r` such that `sum(cf * (1 + r) ** -t) == 0`. All rows
+    take Newton steps together; rows that do not converge are then solved by bisection.
+
+    Parameters
+    ----------
+    cash_flows : np.ndarray
+        (n_series, n_dates) matrix of cash flows, from the investor's perspective: negative
+        when money is invested, positive when it is received.
+    years : np.ndarray
+        Time of each cash flow in years, either (n_dates,) or (n_series, n_dates).
+    tol : float
+        Convergence tolerance on the rate.
+    max_iter : int
+        Maximum number of Newton iterations.
+
+    Returns
+    -------
+    np.ndarray
+        (n_series,) rates. NaN where the series has no sign change, i.e. no solution.
+    """
+    cash_flows = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    years = np.broadcast_to(np.asarray(years, dtype=float), cash_flows.shape)
+    n_series = len(cash_flows)
+
+    # Work on the non-zero cash flows only: most series have few flows on the shared dates.
+    rows, cols = np.nonzero(cash_flows)
+    cf, t = cash_flows[rows, cols], years[rows, cols]
+
+    solvable = (cash_flows > 0).any(axis=1) & (cash_flows < 0).any(axis=1)
+    rates = np.full(n_series, 0.1)
+    converged = ~solvable
+
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        for _ in range(max_iter):
+            if converged.all():
+                break
+            discount = (1 + rates[rows]) ** -t
+            npv = np.bincount(rows, weights=cf * discount, minlength=n_series)
+            d_npv = np.bincount(
+                rows, weights=-t * cf * discount / (1 + rates[rows]), minlength=n_series
+            )
+            new_rates = np.where(converged, rates, np.clip(rates - npv / d_npv, -0.9999, None))
+            converged |= np.isfinite(new_rates) & (np.abs(new_rates - rates) < tol)
+            rates = new_rates
+
+        failed = ~converged | ~np.isfinite(rates)
+        if failed.any():
+            keep = failed[rows]
+            failed_ids = np.flatnonzero(failed)
+            rates[failed] = _bisect_irr(
+                np.searchsorted(failed_ids, rows[keep]), cf[keep], t[keep], len(failed_ids)
+            )
+    rates[~solvable] = np.nan
+    return rates
+
+
+def _bisect_irr(
+    rows: np.ndarray,
+    cf: np.ndarray,
+    t: np.ndarray,
+    n_series: int,
+    low: float = -0.9999,
+    high: float = 100.0,
+    n_iter: int = 100,
+) -> np.ndarray:
+    def npv(rates):
+        return np.bincount(rows, weights=cf * (1 + rates[rows]) ** -t, minlength=n_series)
+
+    lows = np.full(n_series, low)
+    highs = np.full(n_series, high)
+    npv_low = npv(lows)
+    bracketed = np.sign(npv_low) != np.sign(npv(highs))
+    for _ in range(n_iter):
+        mids = (lows + highs) / 2
+        npv_mid = npv(mids)
+        same_sign = np.sign(npv_mid) == np.sign(npv_low)
+        lows = np.where(same_sign, mids, lows)
+        npv_low = np.where(same_sign, npv_mid, npv_low)
+        highs = np.where(same_sign, highs, mids)
+    return np.where(bracketed, (lows + highs) / 2, np.nan)
+
+
+def get_log_growth(values: pd.DataFrame, flows: pd.DataFrame) -> pd.DataFrame:
+    """Return the daily log growth of every series, net of contributions.
+
+    Contributions (positive flows) are assumed at the start of the day and withdrawals or
+    income (negative flows) at its end, so the growth of day `t` is
+    `(V_t - outflow_t) / (V_{t-1} + inflow_t)`. Days without any invested value grow by 1.
+    """
+    inflows = flows.clip(lower=0)
+    outflows = flows.clip(upper=0)
+    start_value = values.shift(1, fill_value=0.0) + inflows
+    end_value = values - outflows
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.log(end_value / start_value.where(start_value > 0))
+    return growth.where(np.isfinite(growth), 0.0)
+
+
+def compute_return_metrics(
+    values: pd.DataFrame,
+    flows: pd.DataFrame,
+    asset_classes: dict[str, str] | None = None,
+    as_of: datetime | None = None,
+    windows: dict[str, pd.DateOffset | None] | None = None,
+) -> pd.DataFrame:
+    """Compute TWR and XIRR of every asset, asset class and the portfolio over trailing windows.
+
+    Parameters
+    ----------
+    values : pd.DataFrame
+        Daily market value of each asset, indexed by a complete daily DatetimeIndex.
+    flows : pd.DataFrame
+        Daily net contributions to each asset (purchases positive, sales and income negative),
+        aligned with `values`.
+    asset_classes : dict[str, str], optional
+        Class of each asset column. Assets without a class only count towards the portfolio.
+    as_of : datetime, optional
+        Day ending every window, its time of day ignored. Defaults to the last date of `values`.
+    windows : dict, optional
+        Trailing windows by name, see `WINDOWS`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Columns series, level ("asset", "class" or "portfolio"), window, start, twr and xirr.
+    """
+    asset_classes = asset_classes or {}
+    windows = windows or WINDOWS
+    as_of = pd.Timestamp(as_of or values.index[-1]).normalize()
+    values, flows = values.loc[:as_of], flows.loc[:as_of]
+
+    levels = {asset: "asset" for asset in values.columns}
+    class_map = pd.Series(asset_classes).reindex(values.columns)
+    class_values = values.T.groupby(class_map).sum().T
+    class_flows = flows.T.groupby(class_map).sum().T
+    levels.update({name: "class" for name in class_values.columns})
+    levels[PORTFOLIO] = "portfolio"
+    values = pd.concat(
+        [values, class_values, values.sum(axis=1).rename(PORTFOLIO)], axis=1
+    )
+    flows = pd.concat([flows, class_flows, flows.sum(axis=1).rename(PORTFOLIO)], axis=1)
+
+    cumulative_growth = get_log_growth(values, flows).cumsum()
+    starts = {
+        name: _window_start(name, offset, as_of, values.index)
+        for name, offset in windows.items()
+    }
+
+    # Only days with a cash flow, plus the window boundaries, matter to the XIRR.
+    event_days = np.flatnonzero((flows.to_numpy() != 0).any(axis=1))
+    boundary_days = [values.index.get_loc(start) for start in starts.values()]
+    event_days = np.union1d(event_days, boundary_days + [len(values) - 1])
+    event_dates = values.index[event_days]
+    event_flows = flows.to_numpy()[event_days].T
+    n_series = values.shape[1]
+    end_values = values.iloc[-1].to_numpy()
+
+    cash_flows, years, rows = [], [], []
+    for name, start in starts.items():
+        in_window = (event_dates > start)[None, :]
+        cf = np.where(in_window, -event_flows, 0.0)
+        cf[:, event_dates == start] -= values.loc[start].to_numpy()[:, None]
+        cf[:, -1] += end_values
+        cash_flows.append(cf)
+        event_years = (event_dates - start).days.to_numpy() / DAYS_PER_YEAR
+        years.append(np.tile(event_years, (n_series, 1)))
+        twr = np.exp(cumulative_growth.iloc[-1] - cumulative_growth.loc[start]) - 1
+        rows.append(pd.DataFrame({
+            "series": values.columns,
+            "level": [levels[col] for col in values.columns],
+            "window": name,
+            "start": start,
+            "twr": twr.to_numpy(),
+        }))
+
+    metrics = pd.concat(rows, ignore_index=True)
+    metrics["xirr"] = xirr_batch(np.vstack(cash_flows), np.vstack(years))
+    return metrics
+
+
+def _window_start(
+    name: str, offset: pd.DateOffset | None, as_of: pd.Timestamp, index: pd.DatetimeIndex
+) -> pd.Timestamp:
+    """Return the last day before the window, whose closing value is its starting value."""
+    if name == "inception":
+        return index[0]
+    if name == "ytd":
+        start = pd.Timestamp(as_of.year, 1, 1) - pd.Timedelta(days=1)
+    else:
+        start = as_of - offset
+    return max(start, index[0])
+
+
+def get_stock_positions(
+    transactions: pd.DataFrame,
+    dividends: pd.DataFrame,
+    prices: pd.DataFrame,
+    dates: pd.DatetimeIndex,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the daily values and contributions of each stock ticker.
+
+    Prices missing from `prices` fall back to the last transaction price of the ticker.
+    """
+    transactions = transactions.assign(
+        date=lambda df: pd.to_datetime(df["date"]),
+        contribution=lambda df: df["price"] * df["quantity"] + df["taxes"].fillna(0),
+    )
+    quantities = (
+        transactions.pivot_table(index="date", columns="ticker", values="quantity", aggfunc="sum")
+        .reindex(dates, fill_value=0.0)
+        .fillna(0.0)
+        .cumsum()
+    )
+    traded_prices = (
+        transactions[transactions["price"] > 0]
+        .pivot_table(index="date", columns="ticker", values="price", aggfunc="last")
+    )
+    prices = (
+        prices.reindex(columns=quantities.columns)
+        .combine_first(traded_prices)
+        .reindex(dates.union(traded_prices.index).union(prices.index))
+        .ffill()
+        .reindex(dates)
+    )
+    values = (quantities * prices).fillna(0.0)
+
+    contributions = transactions.pivot_table(
+        index="date", columns="ticker", values="contribution", aggfunc="sum"
+    )
+    income = (
+        dividends.assign(date=lambda df: pd.to_datetime(df["date"]))
+        .pivot_table(index="date", columns="ticker", values="value", aggfunc="sum")
+    )
+    flows = (
+        contributions.sub(income, fill_value=0.0)
+        .reindex(index=dates, columns=values.columns)
+        .fillna(0.0)
+    )
+    return values, flows
+
+
+def get_crypto_positions(
+    swaps: pd.DataFrame,
+    earnings: pd.DataFrame,
+    deposits: pd.DataFrame,
+    withdraws: pd.DataFrame,
+    brl_prices: pd.DataFrame,
+    dates: pd.DatetimeIndex,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the daily value and contributions of the whole crypto balance, in BRL.
+
+    Parameters
+    ----------
+    brl_prices : pd.DataFrame
+        Daily BRL price of each coin, one column per coin. BRL itself is priced at 1.
+    """
+    movements = pd.concat([
+        swaps[["date", "received_currency", "received_amount"]]
+        .set_axis(["date", "coin", "amount"], axis=1),
+        swaps[["date", "paid_currency", "paid_amount"]]
+        .set_axis(["date", "coin", "amount"], axis=1)
+        .assign(amount=lambda df: -df["amount"]),
+        swaps[["date", "paid_taxes_currency", "paid_taxes_amount"]]
+        .set_axis(["date", "coin", "amount"], axis=1)
+        .assign(amount=lambda df: -df["amount"]),
+        earnings[["date", "currency", "earning_amount"]]
+        .set_axis(["date", "coin", "amount"], axis=1),
+        deposits[["date", "value_brl"]].assign(coin="BRL").rename(columns={"value_brl": "amount"}),
+        withdraws.assign(amount=lambda df: -(df["amount"] + df["tax"]))[
+            ["date", "currency_amount", "amount"]
+        ].rename(columns={"currency_amount": "coin"}),
+    ]).dropna(subset=["coin"]).assign(date=lambda df: pd.to_datetime(df["date"]))
+
+    holdings = (
+        movements.pivot_table(index="date", columns="coin", values="amount", aggfunc="sum")
+        .reindex(dates, fill_value=0.0)
+        .fillna(0.0)
+        .cumsum()
+    )
+    prices = brl_prices.reindex(index=dates, columns=holdings.columns).ffill()
+    prices["BRL"] = 1.0
+    value = (holdings * prices).fillna(0.0).sum(axis=1)
+
+    withdrawn = withdraws.assign(date=lambda df: pd.to_datetime(df["date"]))
+    withdrawn_value = (
+        withdrawn["amount"]
+        * prices.stack().reindex(pd.MultiIndex.from_frame(withdrawn[["date", "currency_amount"]]))
+        .to_numpy()
+    )
+    flows = (
+        pd.concat([
+            deposits.assign(date=lambda df: pd.to_datetime(df["date"]))
+            .groupby("date")["value_brl"].sum(),
+            -withdrawn_value.fillna(0.0).groupby(withdrawn["date"]).sum(),
+        ])
+        .groupby(level=0)
+        .sum()
+        .reindex(dates, fill_value=0.0)
+    )
+    return value.to_frame(CRYPTO_BALANCE), flows.to_frame(CRYPTO_BALANCE)
+
+
+def get_brl_prices(quotations: pd.DataFrame) -> pd.DataFrame:
+    """Return the daily BRL price of every quoted asset, triangulated by `FXMatrix`."""
+    return FXMatrix.from_quotations(quotations).to_frame()
+
+
+def compute_portfolio_metrics(
+    conn_str: str = CONN_STR, as_of: datetime | None = None
+) -> pd.DataFrame:
+    """Compute every return metric from the database, as returned by `compute_return_metrics`.
+
+    The frame is empty if there are no transactions, swaps or deposits yet.
+    """
+    transactions = read_sql_query(
+        "SELECT date, ticker, quantity, price, taxes FROM stocks.transactions", conn_str
+    )
+    dividends = read_sql_query(
+        "SELECT date, ticker, value FROM stocks.dividends_incomes", conn_str
+    )
+    swaps = read_sql_query("SELECT * FROM crypto.swaps", conn_str)
+    earnings = read_sql_query(
+        "SELECT date, currency, earning_amount FROM crypto.earnings", conn_str
+    )
+    deposits = read_sql_query("SELECT date, value_brl FROM crypto.brl_deposits", conn_str)
+    withdraws = read_sql_query(
+        "SELECT date, amount, tax, currency_amount FROM crypto.withdraws", conn_str
+    )
+
+    first_date = min(
+        (
+            pd.to_datetime(table["date"]).min()
+            for table in [transactions, swaps, deposits]
+            if not table.empty
+        ),
+        default=None,
+    )
+    if first_date is None:
+        return pd.DataFrame(columns=METRICS_COLUMNS)
+    dates = pd.date_range(first_date, pd.Timestamp(as_of or datetime.now()).normalize(), freq="D")
+    brl_prices = load_fx_matrix(conn_str=conn_str).to_frame()
+
+    stock_values, stock_flows = get_stock_positions(transactions, dividends, brl_prices, dates)
+    crypto_values, crypto_flows = get_crypto_positions(
+        swaps, earnings, deposits, withdraws, brl_prices, dates
+    )
+    asset_classes = {ticker: "stocks" for ticker in stock_values.columns}
+    asset_classes[CRYPTO_BALANCE] = "crypto"
+    return compute_return_metrics(
+        pd.concat([stock_values, crypto_values], axis=1),
+        pd.concat([stock_flows, crypto_flows], axis=1),
+        asset_classes,
+        as_of,
+    )
+
+
+def run(conn_str: str = CONN_STR, as_of: datetime | None = None) -> pd.DataFrame:
+    """Persist the return metrics of `as_of`, by default today, and return them."""
+    as_of = pd.Timestamp(as_of or datetime.now()).normalize()
+    metrics = compute_portfolio_metrics(conn_str, as_of)
+    if metrics.empty:
+        logging.info("No transactions, swaps or deposits yet. Skipping return metrics.")
+        return metrics
+    copy_dataframe_to_database(
+        metrics.rename(columns={"window": "window_name"}).assign(
+            as_of=as_of.date(), start=lambda df: pd.to_datetime(df["start"]).dt.date
+        ),
+        "stocks",
+        "return_metrics",
+        pk_columns=["as_of", "series", "window_name"],
+        assign_processed_at_column=True,
+        conn_str=conn_str,
+        diff=True,
+    )
+    return metrics
+
+
+if __name__ == "__main__":
+    with pd.option_context("display.max_rows", None):
+        print(compute_portfolio_metrics())
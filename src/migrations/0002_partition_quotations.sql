@@ -0,0 +1,42 @@
+-- Range-partition currencies.quotations by year.
+-- Yearly partitions cover 1990-2040; anything outside lands in the default partition.
+DO $$
+DECLARE
+    y INT;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'currencies' AND c.relname = 'quotations'
+    ) THEN
+        ALTER TABLE currencies.quotations RENAME TO quotations_unpartitioned;
+        ALTER TABLE currencies.quotations_unpartitioned
+            RENAME CONSTRAINT quotations_pkey TO quotations_unpartitioned_pkey;
+
+        CREATE TABLE currencies.quotations (
+            date DATE NOT NULL,
+            asset TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            value FLOAT,
+            _processed_at TIMESTAMP,
+            PRIMARY KEY (date, asset, currency)
+        ) PARTITION BY RANGE (date);
+
+        FOR y IN 1990..2040 LOOP
+            EXECUTE 'CREATE TABLE currencies.quotations_' || y
+                || ' PARTITION OF currencies.quotations FOR VALUES FROM ('
+                || quote_literal(make_date(y, 1, 1)) || ') TO ('
+                || quote_literal(make_date(y + 1, 1, 1)) || ')';
+        END LOOP;
+        CREATE TABLE currencies.quotations_default
+            PARTITION OF currencies.quotations DEFAULT;
+
+        INSERT INTO currencies.quotations (date, asset, currency, value, _processed_at)
+        SELECT date, asset, currency, value, _processed_at
+        FROM currencies.quotations_unpartitioned;
+
+        DROP TABLE currencies.quotations_unpartitioned;
+    END IF;
+END $$;
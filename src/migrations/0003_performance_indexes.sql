@@ -0,0 +1,31 @@
+-- Covering indexes for the watermark queries of the ingestion jobs and the dashboards.
+
+-- get_last_persisted_data: MAX(date) per (asset, currency).
+CREATE INDEX IF NOT EXISTS quotations_asset_currency_date_idx
+    ON currencies.quotations (asset, currency, date DESC) INCLUDE (value);
+
+-- _get_current_avg_prices and the wallet tickers of ingest_brl_stocks_in_wallet.
+CREATE INDEX IF NOT EXISTS transactions_ticker_date_idx
+    ON stocks.transactions (ticker, date DESC) INCLUDE (quantity, avg_price, current_quantity);
+
+CREATE INDEX IF NOT EXISTS dividends_incomes_ticker_date_idx
+    ON stocks.dividends_incomes (ticker, date) INCLUDE (value);
+
+CREATE INDEX IF NOT EXISTS swaps_date_received_currency_idx
+    ON crypto.swaps (date, received_currency);
+
+CREATE INDEX IF NOT EXISTS swaps_paid_currency_date_idx
+    ON crypto.swaps (paid_currency, date);
+
+CREATE INDEX IF NOT EXISTS earnings_currency_date_idx
+    ON crypto.earnings (currency, date) INCLUDE (earning_amount);
+
+CREATE INDEX IF NOT EXISTS brl_deposits_date_idx
+    ON crypto.brl_deposits (date) INCLUDE (value_brl);
+
+CREATE INDEX IF NOT EXISTS withdraws_date_idx
+    ON crypto.withdraws (date);
+
+-- _preprocess_manual_inspection anti-join.
+CREATE INDEX IF NOT EXISTS manually_inserted_keys_id_idx
+    ON crypto.manually_inserted_keys (id);
@@ -0,0 +1,14 @@
+-- Intraday OHLCV candles, kept apart from the daily currencies.quotations.
+CREATE TABLE IF NOT EXISTS currencies.candles (
+    ts TIMESTAMP NOT NULL,
+    asset TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    interval_minutes SMALLINT NOT NULL,
+    open DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL,
+    low DOUBLE PRECISION NOT NULL,
+    close DOUBLE PRECISION NOT NULL,
+    volume DOUBLE PRECISION NOT NULL,
+    _processed_at TIMESTAMP,
+    PRIMARY KEY (asset, currency, interval_minutes, ts)
+);
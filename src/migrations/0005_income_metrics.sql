@@ -0,0 +1,20 @@
+-- Ready-made income metrics computed by src.dividends.
+CREATE TABLE IF NOT EXISTS stocks.income_metrics (
+    year_month DATE NOT NULL,
+    ticker TEXT NOT NULL,
+    income DOUBLE PRECISION,
+    ttm_income DOUBLE PRECISION,
+    cost_basis DOUBLE PRECISION,
+    yield_on_cost DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    PRIMARY KEY (year_month, ticker)
+);
+
+CREATE TABLE IF NOT EXISTS stocks.payout_cadence (
+    ticker TEXT NOT NULL PRIMARY KEY,
+    payments_ttm INT,
+    median_days_between DOUBLE PRECISION,
+    last_payment DATE,
+    cadence TEXT,
+    _processed_at TIMESTAMP
+);
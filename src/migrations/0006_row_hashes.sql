@@ -0,0 +1,13 @@
+-- Content hash of the non-key columns of every upserted row, written by src.utils. Upserts in
+-- diff mode compare it with the incoming rows and only write the new or changed ones.
+ALTER TABLE currencies.quotations ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE currencies.candles ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE crypto.brl_deposits ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE crypto.swaps ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE crypto.earnings ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE crypto.withdraws ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE stocks.transactions ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE stocks.dividends_incomes ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE stocks.allocations ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE stocks.income_metrics ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
+ALTER TABLE stocks.payout_cadence ADD COLUMN IF NOT EXISTS _row_hash BIGINT;
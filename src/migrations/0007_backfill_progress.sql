@@ -0,0 +1,13 @@
+-- Windows completed by the resumable backfills of src.data_ingestion.backfill.
+CREATE TABLE IF NOT EXISTS currencies.backfill_progress (
+    asset TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    window_start DATE NOT NULL,
+    window_end DATE NOT NULL,
+    provider TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    n_rows INT NOT NULL,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (asset, currency, window_start, window_end)
+);
@@ -0,0 +1,31 @@
+-- Owner of every crypto record, see src.data_ingestion.exchange_statements. Records are keyed by
+-- (account_id, id), so the statements of several accounts can share the tables. Existing records
+-- and manually inserted keys belong to the 'default' account. Binance reports tag their rows with
+-- their User_ID, except the one set in FINANCES_BINANCE_DEFAULT_USER_ID, the owner of these
+-- records, whose rows keep the 'default' account (see src.data_ingestion.binance_order_history).
+ALTER TABLE crypto.brl_deposits
+    ADD COLUMN IF NOT EXISTS account_id TEXT NOT NULL DEFAULT 'default';
+ALTER TABLE crypto.brl_deposits DROP CONSTRAINT IF EXISTS brl_deposits_pkey;
+ALTER TABLE crypto.brl_deposits ADD PRIMARY KEY (account_id, id);
+
+ALTER TABLE crypto.swaps
+    ADD COLUMN IF NOT EXISTS account_id TEXT NOT NULL DEFAULT 'default';
+ALTER TABLE crypto.swaps DROP CONSTRAINT IF EXISTS swaps_pkey;
+ALTER TABLE crypto.swaps ADD PRIMARY KEY (account_id, id);
+
+ALTER TABLE crypto.earnings
+    ADD COLUMN IF NOT EXISTS account_id TEXT NOT NULL DEFAULT 'default';
+ALTER TABLE crypto.earnings DROP CONSTRAINT IF EXISTS earnings_pkey;
+ALTER TABLE crypto.earnings ADD PRIMARY KEY (account_id, id);
+
+ALTER TABLE crypto.withdraws
+    ADD COLUMN IF NOT EXISTS account_id TEXT NOT NULL DEFAULT 'default';
+ALTER TABLE crypto.withdraws DROP CONSTRAINT IF EXISTS withdraws_pkey;
+ALTER TABLE crypto.withdraws ADD PRIMARY KEY (account_id, id);
+
+-- _preprocess_manual_inspection anti-join, now per account.
+ALTER TABLE crypto.manually_inserted_keys
+    ADD COLUMN IF NOT EXISTS account_id TEXT NOT NULL DEFAULT 'default';
+DROP INDEX IF EXISTS crypto.manually_inserted_keys_id_idx;
+CREATE INDEX IF NOT EXISTS manually_inserted_keys_account_id_idx
+    ON crypto.manually_inserted_keys (account_id, id);
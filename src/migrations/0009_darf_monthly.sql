@@ -0,0 +1,20 @@
+-- Monthly swing-trade capital gains tax computed by src.darf.
+CREATE TABLE IF NOT EXISTS stocks.darf_monthly (
+    year_month DATE NOT NULL PRIMARY KEY,
+    stock_sales DOUBLE PRECISION,
+    sales DOUBLE PRECISION,
+    stock_result DOUBLE PRECISION,
+    other_result DOUBLE PRECISION,
+    fii_result DOUBLE PRECISION,
+    exempt BOOLEAN,
+    exempt_gains DOUBLE PRECISION,
+    common_taxable DOUBLE PRECISION,
+    common_loss_carried DOUBLE PRECISION,
+    fii_taxable DOUBLE PRECISION,
+    fii_loss_carried DOUBLE PRECISION,
+    tax DOUBLE PRECISION,
+    darf_due DOUBLE PRECISION,
+    tax_carried DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT
+);
@@ -0,0 +1,13 @@
+-- Daily snapshot of the trailing returns computed by src.metrics, crypto included.
+CREATE TABLE IF NOT EXISTS stocks.return_metrics (
+    as_of DATE NOT NULL,
+    series TEXT NOT NULL,
+    window_name TEXT NOT NULL,
+    level TEXT,
+    start DATE,
+    twr DOUBLE PRECISION,
+    xirr DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (as_of, series, window_name)
+);
@@ -0,0 +1,123 @@
+"""Versioned schema migrations for the finances database.
+
+Migrations are the numbered `NNNN_description.sql` files of this directory. Each one runs in its
+own transaction together with its bookkeeping row in `public.schema_migrations`, so applying the
+migrations again only runs the ones that were not applied yet.
+
+Usage:
+    python -m src.migrations [--conn_str CONN_STR] [--target VERSION]
+"""
+
+import logging
+import re
+from pathlib import Path
+from typing import NamedTuple
+
+from sqlalchemy import create_engine, text
+
+from src.utils import CONN_STR
+
+MIGRATIONS_DIR = Path(__file__).parent
+MIGRATIONS_TABLE = "public.schema_migrations"
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Arbitrary key of the advisory lock that serializes concurrent migration runs.
+MIGRATIONS_LOCK_KEY = 20250419
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+
+
+def list_migrations(directory: Path = MIGRATIONS_DIR) -> list[Migration]:
+    """Return the migrations found in `directory`, ordered by version."""
+    migrations = []
+    for path in directory.iterdir():
+        match = MIGRATION_FILE_PATTERN.match(path.name)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), path))
+
+    migrations.sort()
+    versions = [migration.version for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicated migration versions in {directory}: {versions}")
+    return migrations
+
+
+def get_applied_versions(conn_str: str = CONN_STR) -> set[int]:
+    """Return the versions already applied to the database."""
+    engine = create_engine(conn_str)
+    with engine.begin() as conn:
+        _create_migrations_table(conn)
+        return set(conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}")).scalars())
+
+
+def apply_migrations(
+    conn_str: str = CONN_STR,
+    target: int | None = None,
+    directory: Path = MIGRATIONS_DIR,
+) -> list[int]:
+    """Apply every pending migration up to `target` (all of them by default).
+
+    Parameters
+    ----------
+    conn_str : str
+        The connection string for the PostgreSQL database.
+    target : int, optional
+        Last version to apply.
+    directory : Path
+        Directory holding the migration files.
+
+    Returns
+    -------
+    list[int]
+        Versions applied by this call.
+    """
+    engine = create_engine(conn_str)
+    applied = []
+    for migration in list_migrations(directory):
+        if target is not None and migration.version > target:
+            break
+
+        with engine.begin() as conn:
+            _create_migrations_table(conn)
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+            already_applied = conn.execute(
+                text(f"SELECT 1 FROM {MIGRATIONS_TABLE} WHERE version = :version"),
+                {"version": migration.version},
+            ).first()
+            if already_applied:
+                continue
+
+            logging.info(f"Applying migration {migration.path.name}")
+            conn.exec_driver_sql(migration.path.read_text())
+            conn.execute(
+                text(
+                    f"INSERT INTO {MIGRATIONS_TABLE} (version, name, applied_at)"
+                    " VALUES (:version, :name, now())"
+                ),
+                {"version": migration.version, "name": migration.name},
+            )
+        applied.append(migration.version)
+
+    if not applied:
+        logging.info("Database schema is up to date.")
+    return applied
+
+
+def _create_migrations_table(conn) -> None:
+    conn.execute(
+        text(
+            f"""
+            CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+                version INT NOT NULL PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP NOT NULL
+            )
+            """
+        )
+    )
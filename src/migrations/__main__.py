@@ -0,0 +1,15 @@
+import argparse
+
+from src.migrations import apply_migrations
+from src.utils import CONN_STR
+
+parser = argparse.ArgumentParser(description="Apply pending schema migrations.")
+parser.add_argument(
+    "--conn_str", default=CONN_STR, help="Connection string of the target database."
+)
+parser.add_argument(
+    "--target", type=int, default=None, help="Last migration version to apply."
+)
+args = parser.parse_args()
+
+apply_migrations(args.conn_str, args.target)
@@ -0,0 +1,244 @@
+"""Monte Carlo projections of the portfolio value.
+
+The current allocation (`stocks.allocations`) is simulated with monthly contributions,
+rebalancing to its weights every month. Each macroallocation follows a proxy series from
+`currencies.quotations` (e.g. IBOV, S&P500, BTC or the CDI ingested from IPEA). Since weights are
+constant, the portfolio monthly return is drawn directly, either by bootstrapping historical
+months of all proxies together (which keeps their correlation) or from a fitted normal.
+
+Paths are simulated in chunks of NumPy arrays, optionally spread over a process pool. Each
+chunk draws from its own child of a seeded `np.random.SeedSequence`, so results only depend on
+the seed and the chunk size, not on the number of workers.
+
+Usage:
+    python -m src.projections --years 30 --paths 100000 --contribution 2000 --seed 42
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.utils import CONN_STR, read_sql_query
+
+# (asset, currency) of the quotations series followed by each macroallocation.
+ALLOCATION_PROXIES = {
+    "renda_fixa": ("CDI", "prc"),
+    "acoes_brasil": ("IBOV", "BRL"),
+    "acoes_exterior": ("S&P500", "USD"),
+    "cripto": ("BTC", "USDT"),
+}
+# Series whose `value` is already a monthly rate, in percent.
+RATE_SERIES = {("CDI", "prc")}
+USD_QUOTES = {"USD", "USDT"}
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def get_monthly_returns(
+    quotations: pd.DataFrame,
+    proxies: dict[str, tuple[str, str]] = ALLOCATION_PROXIES,
+) -> pd.DataFrame:
+    """Return the monthly BRL returns of each allocation proxy.
+
+    Price series are sampled at month end; USD quoted series are converted with USD-BRL. Only
+    months where every proxy has a return are kept.
+    """
+    quotations = quotations.assign(date=lambda df: pd.to_datetime(df["date"]))
+    month_end = (
+        quotations.pivot_table(
+            index="date", columns=["asset", "currency"], values="value", aggfunc="last"
+        )
+        .sort_index()
+        .resample("ME")
+        .last()
+    )
+    usd_brl = month_end.get(("USD", "BRL"))
+
+    returns = {}
+    for allocation, proxy in proxies.items():
+        if proxy not in month_end.columns:
+            raise ValueError(f"No quotations of {proxy}, the proxy of {allocation}.")
+        series = month_end[proxy]
+        if proxy in RATE_SERIES:
+            returns[allocation] = series / 100
+            continue
+        if proxy[1] in USD_QUOTES:
+            if usd_brl is None:
+                raise ValueError("USD-BRL quotations are needed to convert USD proxies.")
+            series = series * usd_brl
+        returns[allocation] = series.pct_change(fill_method=None)
+    return pd.DataFrame(returns).dropna()
+
+
+def get_current_allocation(allocations: pd.DataFrame) -> tuple[pd.Series, float]:
+    """Return the weights of the latest allocation and its total value."""
+    latest = allocations[allocations["year_month"] == allocations["year_month"].max()]
+    values = latest.groupby("macroallocation")["value"].sum()
+    total = float(values.sum())
+    return values / total, total
+
+
+def simulate_wealth_paths(
+    portfolio_returns: np.ndarray,
+    initial_value: float,
+    monthly_contribution: float,
+    months: int,
+    n_paths: int,
+    method: str = "bootstrap",
+    seed: int | None = None,
+    chunk_size: int = 5_000,
+    n_workers: int = 1,
+    report_every: int = 12,
+) -> np.ndarray:
+    """Simulate the portfolio value of many paths.
+
+    Parameters
+    ----------
+    portfolio_returns : np.ndarray
+        Historical monthly returns of the portfolio.
+    initial_value : float
+        Portfolio value today.
+    monthly_contribution : float
+        Amount added at the start of every month.
+    months : int
+        Number of months to simulate.
+    n_paths : int
+        Number of simulated paths.
+    method : str
+        "bootstrap" to resample historical months, "normal" to draw log returns from a normal
+        fitted to them.
+    seed : int, optional
+        Seed of the random generators, for reproducible runs.
+    chunk_size : int
+        Number of paths simulated at once, which bounds memory use.
+    n_workers : int
+        Number of worker processes. Chunks run in the current process if 1.
+    report_every : int
+        Interval, in months, between the values kept from each path.
+
+    Returns
+    -------
+    np.ndarray
+        (n_paths, months // report_every) matrix with the value of each path at the end of every
+        reported month.
+    """
+    if method not in ("bootstrap", "normal"):
+        raise ValueError(f"Invalid simulation method: {method}")
+
+    chunk_sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    chunks = [
+        (np.asarray(portfolio_returns, dtype=float), initial_value, monthly_contribution, months,
+         size, method, chunk_seed, report_every)
+        for size, chunk_seed in zip(chunk_sizes, seeds)
+    ]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            results = list(executor.map(_simulate_chunk, chunks))
+    else:
+        results = [_simulate_chunk(chunk) for chunk in chunks]
+    return np.vstack(results)
+
+
+def _simulate_chunk(args: tuple) -> np.ndarray:
+    (portfolio_returns, initial_value, monthly_contribution, months, n_paths, method, seed,
+     report_every) = args
+    rng = np.random.default_rng(seed)
+
+    if method == "bootstrap":
+        log_growth = np.log1p(portfolio_returns)[
+            rng.integers(0, len(portfolio_returns), size=(n_paths, months))
+        ]
+    else:
+        log_returns = np.log1p(portfolio_returns)
+        log_growth = rng.normal(log_returns.mean(), log_returns.std(ddof=1), size=(n_paths, months))
+
+    # With G_t the growth up to month t, W_t = G_t * (W_0 + c * sum_{k<=t} 1 / G_{k-1}).
+    cumulative = np.cumsum(log_growth, axis=1)
+    growth = np.exp(cumulative)
+    previous_growth = np.exp(cumulative - log_growth)
+    contributions = monthly_contribution * np.cumsum(1 / previous_growth, axis=1)
+    wealth = growth * (initial_value + contributions)
+    return wealth[:, report_every - 1::report_every].astype(np.float32)
+
+
+def get_percentile_bands(
+    paths: np.ndarray,
+    start: datetime,
+    report_every: int = 12,
+    percentiles: list[int] = PERCENTILES,
+) -> pd.DataFrame:
+    """Summarize simulated paths into percentile bands, one row per reported month."""
+    dates = pd.date_range(
+        pd.Timestamp(start) + pd.offsets.MonthEnd(report_every),
+        periods=paths.shape[1],
+        freq=f"{report_every}ME",
+    )
+    bands = np.percentile(paths, percentiles, axis=0).T
+    return pd.DataFrame(bands, index=dates, columns=[f"p{p}" for p in percentiles]).assign(
+        mean=paths.mean(axis=0, dtype=np.float64)
+    )
+
+
+def run(
+    years: int = 30,
+    n_paths: int = 100_000,
+    monthly_contribution: float = 0.0,
+    method: str = "bootstrap",
+    seed: int | None = None,
+    n_workers: int = 1,
+    report_every: int = 12,
+    proxies: dict[str, tuple[str, str]] = ALLOCATION_PROXIES,
+    conn_str: str = CONN_STR,
+) -> pd.DataFrame:
+    """Project the current allocation from the database and return its percentile bands."""
+    allocations = read_sql_query(
+        "SELECT year_month, macroallocation, value FROM stocks.allocations", conn_str
+    )
+    weights, total = get_current_allocation(allocations)
+    missing = set(weights.index) - set(proxies)
+    if missing:
+        raise ValueError(f"No proxy series configured for allocations: {missing}")
+
+    assets = ", ".join(f"'{asset}'" for asset, _ in list(proxies.values()) + [("USD", "BRL")])
+    quotations = read_sql_query(
+        f"SELECT date, asset, currency, value FROM currencies.quotations WHERE asset IN ({assets})",
+        conn_str,
+    )
+    returns = get_monthly_returns(quotations, {name: proxies[name] for name in weights.index})
+    portfolio_returns = returns[weights.index].to_numpy() @ weights.to_numpy()
+
+    paths = simulate_wealth_paths(
+        portfolio_returns,
+        total,
+        monthly_contribution,
+        years * 12,
+        n_paths,
+        method,
+        seed,
+        n_workers=n_workers,
+        report_every=report_every,
+    )
+    return get_percentile_bands(paths, datetime.now(), report_every)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Project the portfolio value with Monte Carlo.")
+    parser.add_argument("--years", type=int, default=30, help="Projection horizon, in years.")
+    parser.add_argument("--paths", type=int, default=100_000, help="Number of simulated paths.")
+    parser.add_argument(
+        "--contribution", type=float, default=0.0, help="Monthly contribution, in BRL."
+    )
+    parser.add_argument(
+        "--method", default="bootstrap", help="Return model: bootstrap or normal."
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible runs.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    args = parser.parse_args()
+
+    with pd.option_context("display.max_rows", None, "display.float_format", "{:,.0f}".format):
+        print(run(args.years, args.paths, args.contribution, args.method, args.seed, args.workers))
@@ -0,0 +1,179 @@
+"""Result cache of `read_sql_query(..., cache=True)`.
+
+Results are keyed on the normalized SQL, its parameters and connection string, and are valid
+while the freshness token of the tables the query reads (see `utils.get_tables_watermark`) is
+unchanged. Persisting to a table through `src.utils` also drops the results that read it, so the
+cache never serves stale rows written by this process, even without a `_processed_at` stamp.
+
+Results live in a size-bounded in-memory LRU. If `FINANCES_QUERY_CACHE_DIR` is set (or a
+`parquet_dir` is passed), they are also written as Parquet files there, which survive restarts
+and hold results evicted from memory, which move back to memory when read again. The Parquet
+tier needs the optional `pyarrow` package.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import pandas as pd
+
+_NAME = r"[A-Za-z_][\w.]*"
+# Tables after JOIN, and every item of the FROM lists, comma joins included.
+_JOIN_PATTERN = re.compile(rf"\bJOIN\s+({_NAME})", re.IGNORECASE)
+_FROM_PATTERN = re.compile(
+    rf"\bFROM\s+((?:{_NAME}(?:\s+(?:AS\s+)?[A-Za-z_]\w*)?\s*,\s*)*{_NAME})", re.IGNORECASE
+)
+_QUALIFIED_TABLE = re.compile(r"^[A-Za-z_]\w*\.[A-Za-z_]\w*$")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse the whitespace of `query` and drop its trailing semicolon."""
+    return " ".join(query.split()).rstrip(";").strip()
+
+
+def get_referenced_tables(query: str) -> list[str]:
+    """Return the schema-qualified tables read by `query`, e.g. ["stocks.transactions"]."""
+    names = _JOIN_PATTERN.findall(query)
+    for from_list in _FROM_PATTERN.findall(query):
+        names.extend(item.split()[0] for item in from_list.split(","))
+    return sorted({name.lower() for name in names if _QUALIFIED_TABLE.match(name)})
+
+
+class QueryCache:
+    """LRU of query results bounded by entries and memory, with an optional Parquet tier.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of results held in memory.
+    max_bytes : int
+        Maximum memory used by the results held in memory.
+    parquet_dir : str or Path, optional
+        Directory of the on-disk tier. Disabled if not passed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_bytes: int = 256 * 2**20,
+        parquet_dir: str | Path | None = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.parquet_dir = Path(parquet_dir) if parquet_dir else None
+        self.hits = 0
+        self.misses = 0
+        # base key -> (token, result, tables, size)
+        self._entries: OrderedDict[str, tuple[str, pd.DataFrame, list[str], int]] = OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, params: dict | None, conn_str: str) -> str:
+        payload = json.dumps([normalize_sql(query), params, conn_str], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    @staticmethod
+    def make_token(watermark: tuple) -> str:
+        return hashlib.sha1(repr(watermark).encode()).hexdigest()[:16]
+
+    def get(self, key: str, token: str) -> pd.DataFrame | None:
+        """Return the result cached under `key` if its freshness token is `token`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == token:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        result, tables = self._read_parquet(key, token)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, token, result, tables)
+        return result
+
+    def put(self, key: str, token: str, result: pd.DataFrame, tables: list[str]) -> None:
+        """Cache `result` under `key`, replacing any older version of it."""
+        with self._lock:
+            self._remember(key, token, result, tables)
+        self._write_parquet(key, token, result, tables)
+
+    def invalidate(self, table: str) -> None:
+        """Drop every result reading `table`, given with its schema."""
+        table = table.lower()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if table in entry[2]]:
+                self._pop(key)
+        if self.parquet_dir is not None:
+            for path in self.parquet_dir.glob("*.json"):
+                if table in json.loads(path.read_text()):
+                    self._remove_files(path.stem)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+        if self.parquet_dir is not None:
+            for path in self.parquet_dir.glob("*.json"):
+                self._remove_files(path.stem)
+
+    def _remember(
+        self, key: str, token: str, result: pd.DataFrame, tables: list[str]
+    ) -> None:
+        # Called with the lock held.
+        size = int(result.memory_usage(index=True, deep=True).sum())
+        self._pop(key)
+        if size <= self.max_bytes:
+            self._entries[key] = (token, result, tables, size)
+            self._n_bytes += size
+            while len(self._entries) > self.max_entries or self._n_bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._n_bytes -= entry[3]
+
+    def _read_parquet(
+        self, key: str, token: str
+    ) -> tuple[pd.DataFrame | None, list[str] | None]:
+        if self.parquet_dir is None:
+            return None, None
+        path = self.parquet_dir / f"{key}-{token}.parquet"
+        if not path.exists():
+            return None, None
+        try:
+            tables = json.loads((self.parquet_dir / f"{key}.json").read_text())
+            return pd.read_parquet(path), tables
+        except Exception:
+            logging.warning(f"Could not read cached query result {path}.", exc_info=True)
+            return None, None
+
+    def _write_parquet(
+        self, key: str, token: str, result: pd.DataFrame, tables: list[str]
+    ) -> None:
+        if self.parquet_dir is None:
+            return
+        self.parquet_dir.mkdir(parents=True, exist_ok=True)
+        self._remove_files(key)
+        try:
+            result.to_parquet(self.parquet_dir / f"{key}-{token}.parquet")
+        except ImportError:
+            logging.warning("pyarrow is not installed, disabling the Parquet query cache.")
+            self.parquet_dir = None
+            return
+        (self.parquet_dir / f"{key}.json").write_text(json.dumps(tables))
+
+    def _remove_files(self, key: str) -> None:
+        for path in self.parquet_dir.glob(f"{key}*"):
+            path.unlink(missing_ok=True)
+
+
+QUERY_CACHE = QueryCache(parquet_dir=os.getenv("FINANCES_QUERY_CACHE_DIR"))
@@ -0,0 +1,252 @@
+"""Risk analytics of every quoted asset: rolling volatility, beta, drawdown and correlations.
+
+Every asset is a column of one aligned matrix of daily BRL prices, the `FXMatrix` of
+`currencies.quotations`, and of the log returns derived from it. Rolling statistics of every
+asset and window come from trailing sums taken as differences of cumulative sums, a few
+vectorized passes over the whole matrix:
+
+- rolling volatility, annualized;
+- rolling beta against the benchmarks, IBOV and the S&P500 (in BRL);
+- drawdown from the running peak and the maximum drawdown since the first quotation;
+- the pairwise correlation matrix of the trailing window.
+
+Prices are forward filled over days without quotations, which adds zero returns to the assets
+not traded on weekends and holidays. Annualizing by calendar days (365) keeps their volatility
+equal to the usual trading-day figure.
+
+Rolling metrics are kept between calls: a refresh only computes the days from the first one
+whose returns changed, usually just the newest.
+
+Usage:
+    python -m src.risk
+"""
+
+import threading
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from src.fx import BASE_CURRENCY, load_fx_matrix
+from src.utils import CONN_STR
+
+# Trailing windows, in days.
+WINDOWS = {"1m": 30, "3m": 91, "1y": 365}
+BENCHMARKS = ["IBOV", "S&P500"]
+PERIODS_PER_YEAR = 365
+
+
+def get_returns(prices: pd.DataFrame) -> pd.DataFrame:
+    """Return the daily log returns of a date x asset price matrix, NaN where unknown."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_prices = np.log(prices.where(prices > 0))
+    return log_prices.diff().iloc[1:]
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of the trailing `window` rows of `values`, for every row."""
+    sums = np.cumsum(values, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    return sums
+
+
+def rolling_volatility(
+    returns: pd.DataFrame,
+    window: int,
+    min_periods: int | None = None,
+    periods_per_year: int = PERIODS_PER_YEAR,
+) -> pd.DataFrame:
+    """Annualized standard deviation of the returns of the trailing `window` days.
+
+    Days with fewer than `min_periods` known returns in the window, by default `window`, are
+    NaN.
+    """
+    values = returns.to_numpy(dtype=float)
+    known = ~np.isnan(values)
+    values = np.where(known, values, 0.0)
+    n = _rolling_sum(known.astype(float), window)
+    sums = _rolling_sum(values, window)
+    squares = _rolling_sum(values * values, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        variance = (squares - sums * sums / n) / (n - 1)
+    variance = np.where((n >= (min_periods or window)) & (n > 1), variance.clip(min=0), np.nan)
+    return pd.DataFrame(
+        np.sqrt(variance * periods_per_year), index=returns.index, columns=returns.columns
+    )
+
+
+def rolling_beta(
+    returns: pd.DataFrame,
+    benchmark: pd.Series,
+    window: int,
+    min_periods: int | None = None,
+) -> pd.DataFrame:
+    """Beta of every asset against `benchmark` over the trailing `window` days.
+
+    Only days where both the asset and the benchmark returns are known count.
+    """
+    values = returns.to_numpy(dtype=float)
+    market = benchmark.reindex(returns.index).to_numpy(dtype=float)[:, None]
+    known = ~np.isnan(values) & ~np.isnan(market)
+    values = np.where(known, values, 0.0)
+    market = np.where(known, market, 0.0)
+    n = _rolling_sum(known.astype(float), window)
+    sum_values = _rolling_sum(values, window)
+    sum_market = _rolling_sum(market, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = _rolling_sum(values * market, window) - sum_values * sum_market / n
+        variance = _rolling_sum(market * market, window) - sum_market * sum_market / n
+        beta = covariance / np.where(variance > 0, variance, np.nan)
+    beta = np.where(n >= (min_periods or window), beta, np.nan)
+    return pd.DataFrame(beta, index=returns.index, columns=returns.columns)
+
+
+def get_drawdowns(prices: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Return the drawdown from the running peak and the maximum drawdown up to each day."""
+    values = prices.to_numpy(dtype=float)
+    peaks = np.fmax.accumulate(values, axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = values / peaks - 1
+    max_drawdown = np.fmin.accumulate(drawdown, axis=0)
+    return (
+        pd.DataFrame(drawdown, index=prices.index, columns=prices.columns),
+        pd.DataFrame(max_drawdown, index=prices.index, columns=prices.columns),
+    )
+
+
+def correlation_matrix(
+    returns: pd.DataFrame, window: int | None = None, min_periods: int = 2
+) -> pd.DataFrame:
+    """Pairwise correlations of the returns of the trailing `window` days, or of all of them.
+
+    Each pair uses the days where both returns are known, like `pd.DataFrame.corr`.
+    """
+    values = returns.to_numpy(dtype=float)
+    if window is not None:
+        values = values[-window:]
+    known = (~np.isnan(values)).astype(float)
+    values = np.where(known > 0, values, 0.0)
+    # Entry (i, j) of each product sums over the days where both asset i and asset j are known.
+    n = known.T @ known
+    sums = values.T @ known
+    squares = (values * values).T @ known
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = values.T @ values - sums * sums.T / n
+        variance = squares - sums * sums / n
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation = np.where(n >= min_periods, correlation, np.nan)
+    return pd.DataFrame(correlation, index=returns.columns, columns=returns.columns)
+
+
+def compute_rolling_metrics(
+    returns: pd.DataFrame,
+    windows: dict[str, int] = WINDOWS,
+    benchmarks: list[str] = BENCHMARKS,
+) -> pd.DataFrame:
+    """Compute the rolling volatility and betas of every asset over every window.
+
+    Returns
+    -------
+    pd.DataFrame
+        Indexed like `returns`, with columns (metric, window, asset). Metrics are "volatility"
+        and one "beta_<benchmark>" per benchmark, NaN if the benchmark is not quoted.
+    """
+    metrics = {}
+    for name, days in windows.items():
+        metrics[("volatility", name)] = rolling_volatility(returns, days)
+        for benchmark in benchmarks:
+            market = returns.get(benchmark, pd.Series(np.nan, index=returns.index))
+            metrics[(f"beta_{benchmark}", name)] = rolling_beta(returns, market, days)
+    return pd.concat(metrics, axis=1, names=["metric", "window", "asset"])
+
+
+class RollingMetricsCache:
+    """Rolling metrics computed so far, extended incrementally as the returns change.
+
+    `update` compares the new returns with the previous ones and only recomputes the days from
+    the first changed one, reading back one window of history to seed the rolling sums.
+    """
+
+    def __init__(self, windows: dict[str, int] = WINDOWS, benchmarks: list[str] = BENCHMARKS):
+        self.windows = windows
+        self.benchmarks = benchmarks
+        self.returns: pd.DataFrame | None = None
+        self.metrics: pd.DataFrame | None = None
+        self._lock = threading.Lock()
+
+    def update(self, returns: pd.DataFrame) -> pd.DataFrame:
+        with self._lock:
+            first_changed = self._first_changed_row(returns)
+            if first_changed == 0:
+                metrics = compute_rolling_metrics(returns, self.windows, self.benchmarks)
+            elif first_changed == len(returns):
+                metrics = self.metrics.iloc[:len(returns)]
+            else:
+                history = max(self.windows.values())
+                start = max(first_changed - history, 0)
+                new = compute_rolling_metrics(
+                    returns.iloc[start:], self.windows, self.benchmarks
+                ).iloc[first_changed - start:]
+                metrics = pd.concat([self.metrics.iloc[:first_changed], new])
+            self.returns, self.metrics = returns, metrics
+            return metrics
+
+    def _first_changed_row(self, returns: pd.DataFrame) -> int:
+        previous = self.returns
+        if (
+            previous is None
+            or not previous.columns.equals(returns.columns)
+            or previous.empty
+            or returns.empty
+            or previous.index[0] != returns.index[0]
+        ):
+            return 0
+        n = min(len(previous), len(returns))
+        old, new = previous.to_numpy()[:n], returns.to_numpy()[:n]
+        changed = ~((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1)
+        return int(np.argmax(changed)) if changed.any() else n
+
+
+_ROLLING_CACHES: dict[str, RollingMetricsCache] = defaultdict(RollingMetricsCache)
+
+
+def get_risk_summary(
+    rolling: pd.DataFrame, drawdown: pd.DataFrame, max_drawdown: pd.DataFrame
+) -> pd.DataFrame:
+    """Return the latest metrics of every asset, one row per (asset, window)."""
+    summary = rolling.iloc[-1].unstack("metric").reset_index().rename_axis(columns=None)
+    return summary.assign(
+        drawdown=lambda df: df["asset"].map(drawdown.iloc[-1]),
+        max_drawdown=lambda df: df["asset"].map(max_drawdown.iloc[-1]),
+    )
+
+
+def compute_risk_metrics(*, conn_str: str = CONN_STR) -> dict[str, pd.DataFrame]:
+    """Compute every risk metric from the quotations in the database.
+
+    The price matrix is cached until the quotations change, and the rolling metrics are only
+    computed for the days whose returns changed since the previous call.
+
+    Returns
+    -------
+    dict[str, pd.DataFrame]
+        "summary", as returned by `get_risk_summary`; "rolling", as returned by
+        `compute_rolling_metrics`; and "correlation_<window>", the correlation matrix of each
+        window.
+    """
+    prices = load_fx_matrix(conn_str=conn_str).to_frame().drop(columns=BASE_CURRENCY)
+    returns = get_returns(prices)
+    rolling = _ROLLING_CACHES[conn_str].update(returns)
+    drawdown, max_drawdown = get_drawdowns(prices)
+    results = {
+        "summary": get_risk_summary(rolling, drawdown, max_drawdown),
+        "rolling": rolling,
+    }
+    for name, days in WINDOWS.items():
+        results[f"correlation_{name}"] = correlation_matrix(returns, days)
+    return results
+
+
+if __name__ == "__main__":
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(compute_risk_metrics()["summary"])
@@ -1 +0,0 @@
-python -m src.data_ingestion.stock_data
@@ -0,0 +1,339 @@
+"""Dependency-aware scheduler of the ingestion and derivation jobs.
+
+Replaces the sequential shell scripts with a declarative DAG (`NIGHTLY_JOBS`) run by a
+long-running daemon:
+
+* Jobs start as soon as their dependencies succeed, in a pool of worker threads, so a run takes
+  about the time of its critical path. Dependents of a failed job are skipped.
+* Failed jobs are retried with exponential backoff.
+* The DAG fires on a cron expression (minute, hour, day of month, month, day of week).
+* The run state is persisted in a JSON file. If the daemon was down or a run was interrupted
+  when the DAG was due, it runs once on startup, skipping the jobs already done.
+* Jobs run in the daemon process, so database engines (see `src.backends`) and HTTP sessions
+  (see `src.data_ingestion.sessions`) stay warm between runs.
+
+Usage:
+    python -m src.scheduler [--once] [--cron "0 2 * * *"] [--workers 4] [--state PATH]
+"""
+
+import importlib
+import json
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from graphlib import TopologicalSorter
+from pathlib import Path
+from typing import Any, NamedTuple
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+DEFAULT_CRON = "0 2 * * *"
+DEFAULT_STATE_PATH = Path.home() / ".finances" / "scheduler_state.json"
+MAX_RUNS_KEPT = 50
+
+
+class Job(NamedTuple):
+    """A node of the DAG.
+
+    `target` is a callable or a "module:function" path, imported when the job runs. `check`, if
+    set, is called with what the target returned and raises to fail the attempt, for targets
+    that report errors instead of raising them.
+    """
+    name: str
+    target: str | Callable[..., Any]
+    depends_on: tuple[str, ...] = ()
+    kwargs: dict[str, Any] | None = None
+    retries: int = 2
+    backoff: float = 30.0
+    check: Callable[[Any], None] | None = None
+
+
+def raise_on_errors(errors: dict[str, Exception]) -> None:
+    """Check of the jobs returning the error of each failed series, e.g. by symbol."""
+    if errors:
+        raise RuntimeError(f"Failed series: {', '.join(f'{k} ({v})' for k, v in errors.items())}")
+
+
+QUOTATIONS_TABLE = {"table_schema": "currencies", "table_name": "quotations"}
+CDI_SERIES = {"provider": "ipea", "symbol": "BM12_TJCDI12", "asset": "CDI", "currency": "prc"}
+
+NIGHTLY_JOBS = [
+    Job("quotations", "src.data_ingestion.data_ingestion:ingest_quotation_series",
+        check=raise_on_errors),
+    Job("cdi", "src.data_ingestion.data_ingestion:ingest_quotation_series",
+        kwargs={"series": [CDI_SERIES], "start_date": "2000-01-01"}, check=raise_on_errors),
+    Job("stocks", "src.data_ingestion.stock_data:run_stocks"),
+    Job("dividends", "src.data_ingestion.stock_data:run_dividends"),
+    Job("binance", "src.data_ingestion.binance_order_history:run"),
+    Job("wallet_quotations", "src.data_ingestion.data_ingestion:ingest_brl_stocks_in_wallet",
+        depends_on=("stocks",), kwargs=QUOTATIONS_TABLE, check=raise_on_errors),
+    Job("gaps", "src.data_ingestion.gaps:repair_gaps",
+        depends_on=("quotations", "wallet_quotations"), check=raise_on_errors),
+    Job("allocations", "src.data_ingestion.stock_data:run_allocations"),
+    Job("income_metrics", "src.dividends:run", depends_on=("stocks", "dividends")),
+    Job("darf", "src.darf:run", depends_on=("stocks",)),
+    Job("return_metrics", "src.metrics:run", depends_on=("gaps", "binance", "dividends")),
+]
+
+
+class CronTrigger:
+    """Minimal cron expression: minute, hour, day of month, month and day of week (0 is Sunday).
+
+    Fields accept `*`, numbers, ranges (`1-5`), lists (`1,15`) and steps (`*/15`, `0-30/10`).
+    As in standard cron, if both the day of month and the day of week are restricted (don't
+    start with `*`), days matching either of them match.
+    """
+
+    BOUNDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != len(self.BOUNDS):
+            raise ValueError(f"Invalid cron expression: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            self._parse_field(field, low, high) for field, (low, high) in zip(fields, self.BOUNDS)
+        )
+        self.days_or_weekdays = not fields[2].startswith("*") and not fields[4].startswith("*")
+
+    @staticmethod
+    def _parse_field(field: str, low: int, high: int) -> frozenset[int]:
+        values = set()
+        for part in field.split(","):
+            part, _, step = part.partition("/")
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = map(int, part.split("-"))
+            else:
+                start = end = int(part)
+            if not low <= start <= end <= high:
+                raise ValueError(f"Invalid cron field: {field}")
+            values.update(range(start, end + 1, int(step or 1)))
+        return frozenset(values)
+
+    def _matches_day(self, dt: datetime) -> bool:
+        day, weekday = dt.day in self.days, (dt.weekday() + 1) % 7 in self.weekdays
+        return dt.month in self.months and (
+            day or weekday if self.days_or_weekdays else day and weekday
+        )
+
+    def next_after(self, dt: datetime) -> datetime:
+        """Return the first time after `dt` matched by the expression."""
+        candidate = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 5)
+        while candidate < limit:
+            if not self._matches_day(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression}")
+
+
+def run_dag(
+    jobs: list[Job],
+    max_workers: int = 4,
+    skip: set[str] | None = None,
+    on_update: Callable[[str, dict[str, Any]], None] | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Run the jobs of a DAG, each one as soon as its dependencies succeeded.
+
+    Parameters
+    ----------
+    jobs : list[Job]
+        Jobs of the DAG.
+    max_workers : int
+        Number of jobs running at once.
+    skip : set[str], optional
+        Jobs already done, e.g. by an interrupted run. They count as succeeded.
+    on_update : callable, optional
+        Called with the job name and its result whenever a job finishes.
+
+    Returns
+    -------
+    dict[str, dict[str, Any]]
+        Result of each job: its status ("success", "failed", "skipped" or "done"), number of
+        attempts, duration in seconds and error message.
+    """
+    by_name = {job.name: job for job in jobs}
+    for job in jobs:
+        unknown = set(job.depends_on) - set(by_name)
+        if unknown:
+            raise ValueError(f"Job {job.name} depends on unknown jobs: {unknown}")
+    sorter = TopologicalSorter({job.name: job.depends_on for job in jobs})
+    sorter.prepare()
+
+    skip = skip or set()
+    results = {}
+
+    def finish(name: str, result: dict[str, Any]) -> None:
+        results[name] = result
+        sorter.done(name)
+        if on_update is not None:
+            on_update(name, result)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while sorter.is_active():
+            for name in sorter.get_ready():
+                failed_deps = [
+                    dep for dep in by_name[name].depends_on
+                    if results[dep]["status"] not in ("success", "done")
+                ]
+                if name in skip:
+                    finish(name, {"status": "done", "attempts": 0})
+                elif failed_deps:
+                    logging.warning(f"Skipping {name}: dependencies {failed_deps} did not succeed.")
+                    finish(name, {"status": "skipped", "attempts": 0})
+                else:
+                    running[executor.submit(_run_with_retries, by_name[name])] = name
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                finish(running.pop(future), future.result())
+    return results
+
+
+def _run_with_retries(job: Job) -> dict[str, Any]:
+    func = _resolve_target(job.target)
+    started = time.monotonic()
+    for attempt in range(1, job.retries + 2):
+        logging.info(f"Running {job.name} (attempt {attempt}).")
+        try:
+            result = func(**(job.kwargs or {}))
+            if job.check is not None:
+                job.check(result)
+        except Exception as e:
+            logging.exception(f"Job {job.name} failed on attempt {attempt}.")
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= job.retries:
+                time.sleep(job.backoff * 2 ** (attempt - 1))
+        else:
+            return {
+                "status": "success",
+                "attempts": attempt,
+                "duration": time.monotonic() - started,
+            }
+    return {
+        "status": "failed",
+        "attempts": attempt,
+        "duration": time.monotonic() - started,
+        "error": error,
+    }
+
+
+def _resolve_target(target: str | Callable[..., Any]) -> Callable[..., Any]:
+    if callable(target):
+        return target
+    module_name, _, func_name = target.partition(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+class Scheduler:
+    """Daemon running a DAG on a cron trigger, with its state persisted in `state_path`.
+
+    The state holds the next due time and the latest runs. A run only advances the due time when
+    it completes, so a run interrupted by a crash is resumed on the next start.
+    """
+
+    def __init__(
+        self,
+        jobs: list[Job] = NIGHTLY_JOBS,
+        cron: str = DEFAULT_CRON,
+        state_path: Path = DEFAULT_STATE_PATH,
+        max_workers: int = 4,
+    ):
+        self.jobs = jobs
+        self.trigger = CronTrigger(cron)
+        self.state_path = Path(state_path)
+        self.max_workers = max_workers
+        self.state = self._load_state()
+
+    def _load_state(self) -> dict[str, Any]:
+        if self.state_path.exists():
+            return json.loads(self.state_path.read_text())
+        return {"next_run": self.trigger.next_after(datetime.now()).isoformat(), "runs": []}
+
+    def _save_state(self) -> None:
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.state, indent=2, default=str))
+        tmp_path.replace(self.state_path)
+
+    @property
+    def next_run(self) -> datetime:
+        return datetime.fromisoformat(self.state["next_run"])
+
+    def run_pending(self, now: datetime | None = None) -> dict[str, Any] | None:
+        """Run the DAG if it is due, coalescing missed runs into one. Return the run, if any."""
+        now = now or datetime.now()
+        if self.next_run > now:
+            return None
+        return self.run(scheduled_for=self.next_run, now=now)
+
+    def run(self, scheduled_for: datetime | None = None, now: datetime | None = None):
+        """Run the DAG now, resuming the latest run if it was interrupted."""
+        now = now or datetime.now()
+        scheduled_for = (scheduled_for or now).isoformat()
+        runs = self.state["runs"]
+        if runs and runs[-1]["scheduled_for"] == scheduled_for and runs[-1]["status"] == "running":
+            run = runs[-1]
+            logging.info(f"Resuming the run scheduled for {scheduled_for}.")
+        else:
+            run = {"scheduled_for": scheduled_for, "status": "running", "jobs": {}}
+            runs.append(run)
+        run["started_at"] = now.isoformat()
+        self._save_state()
+
+        def on_update(name: str, result: dict[str, Any]) -> None:
+            run["jobs"][name] = result
+            self._save_state()
+
+        done = {
+            name for name, result in run["jobs"].items() if result["status"] in ("success", "done")
+        }
+        results = run_dag(self.jobs, self.max_workers, skip=done, on_update=on_update)
+
+        statuses = {result["status"] for result in results.values()}
+        run["status"] = "failed" if statuses & {"failed", "skipped"} else "success"
+        run["finished_at"] = datetime.now().isoformat()
+        self.state["next_run"] = self.trigger.next_after(max(now, datetime.now())).isoformat()
+        self.state["runs"] = runs[-MAX_RUNS_KEPT:]
+        self._save_state()
+        logging.info(f"Run {run['status']}, next run at {self.state['next_run']}.")
+        return run
+
+    def serve(self, poll_interval: float = 60.0) -> None:
+        """Run the DAG whenever it is due, forever."""
+        logging.info(f"Scheduler started, next run at {self.state['next_run']}.")
+        while True:
+            self.run_pending()
+            time.sleep(
+                min(max((self.next_run - datetime.now()).total_seconds(), 0), poll_interval)
+            )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the nightly jobs of the finances database.")
+    parser.add_argument("--once", action="store_true", help="Run the DAG once now and exit.")
+    parser.add_argument("--cron", default=DEFAULT_CRON, help="Cron expression of the DAG.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of jobs run at once.")
+    parser.add_argument(
+        "--state", default=str(DEFAULT_STATE_PATH), help="Path of the JSON run state."
+    )
+    args = parser.parse_args()
+
+    scheduler = Scheduler(NIGHTLY_JOBS, args.cron, Path(args.state), args.workers)
+    if args.once:
+        scheduler.run()
+    else:
+        scheduler.serve()
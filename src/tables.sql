@@ -1,29 +1,69 @@
+-- Logical schema of the finances database.
+-- The Postgres database is managed by the numbered migrations in src/migrations, applied with
+-- `python -m src.migrations`, which also hold the physical layout (indexes, partitioning).
+-- Keep this file in sync when a migration adds or changes a table. It also creates embedded
+-- DuckDB databases (see src/backends.py), so stick to types and syntax both engines accept.
+-- Every upserted table has a `_row_hash` column, the content hash written by src.utils.
+
 -- CURRENCIES
 CREATE SCHEMA IF NOT EXISTS currencies;
 
-CREATE TABLE currencies.quotations (
+CREATE TABLE IF NOT EXISTS currencies.quotations (
     date DATE NOT NULL,
     asset TEXT NOT NULL,
     currency TEXT NOT NULL,
-    value FLOAT,
+    value DOUBLE PRECISION,
     _processed_at TIMESTAMP,
+    _row_hash BIGINT,
     PRIMARY KEY (date, asset, currency)
-)
+);
+
+CREATE TABLE IF NOT EXISTS currencies.candles (
+    ts TIMESTAMP NOT NULL,
+    asset TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    interval_minutes SMALLINT NOT NULL,
+    open DOUBLE PRECISION NOT NULL,
+    high DOUBLE PRECISION NOT NULL,
+    low DOUBLE PRECISION NOT NULL,
+    close DOUBLE PRECISION NOT NULL,
+    volume DOUBLE PRECISION NOT NULL,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (asset, currency, interval_minutes, ts)
+);
+
+CREATE TABLE IF NOT EXISTS currencies.backfill_progress (
+    asset TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    window_start DATE NOT NULL,
+    window_end DATE NOT NULL,
+    provider TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    n_rows INT NOT NULL,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (asset, currency, window_start, window_end)
+);
 
 
 -- CRYPTO
-CREATE SCHEMA crypto;
+CREATE SCHEMA IF NOT EXISTS crypto;
 
-CREATE TABLE crypto.brl_deposits (
-    id TEXT NOT NULL PRIMARY KEY,
+CREATE TABLE IF NOT EXISTS crypto.brl_deposits (
+    account_id TEXT NOT NULL DEFAULT 'default',
+    id TEXT NOT NULL,
     date DATE,
-    value_brl FLOAT,
+    value_brl DOUBLE PRECISION,
     exchange_name TEXT,
-    _processed_at TIMESTAMP
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (account_id, id)
 );
 
 CREATE TABLE IF NOT EXISTS crypto.swaps (
-    id TEXT NOT NULL PRIMARY KEY,
+    account_id TEXT NOT NULL DEFAULT 'default',
+    id TEXT NOT NULL,
     date DATE,
     received_amount DOUBLE PRECISION NOT NULL,
     paid_taxes_amount DOUBLE PRECISION NOT NULL,
@@ -32,20 +72,26 @@ CREATE TABLE IF NOT EXISTS crypto.swaps (
     paid_taxes_currency TEXT,
     paid_currency TEXT,
     exchange_name TEXT,
-    _processed_at TIMESTAMP
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (account_id, id)
 );
 
-CREATE TABLE crypto.earnings (
-    id TEXT NOT NULL PRIMARY KEY,
+CREATE TABLE IF NOT EXISTS crypto.earnings (
+    account_id TEXT NOT NULL DEFAULT 'default',
+    id TEXT NOT NULL,
     date DATE NOT NULL,
     currency TEXT NOT NULL,
     source TEXT NOT NULL,
     earning_amount DOUBLE PRECISION NOT NULL,
-    _processed_at TIMESTAMP
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (account_id, id)
 );
 
-CREATE TABLE crypto.withdraws (
-    id TEXT NOT NULL PRIMARY KEY,
+CREATE TABLE IF NOT EXISTS crypto.withdraws (
+    account_id TEXT NOT NULL DEFAULT 'default',
+    id TEXT NOT NULL,
     date DATE NOT NULL,
     amount DOUBLE PRECISION NOT NULL,
     tax DOUBLE PRECISION NOT NULL,
@@ -53,18 +99,21 @@ CREATE TABLE crypto.withdraws (
     currency_tax TEXT NOT NULL,
     source TEXT NOT NULL,
     destiny TEXT NOT NULL,
-    _processed_at TIMESTAMP
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (account_id, id)
 );
 
-CREATE TABLE crypto.manually_inserted_keys (
+CREATE TABLE IF NOT EXISTS crypto.manually_inserted_keys (
+    account_id TEXT NOT NULL DEFAULT 'default',
     id TEXT NOT NULL,
     _processed_at TIMESTAMP
 );
 
 -- STOCKS
-CREATE SCHEMA stocks;
+CREATE SCHEMA IF NOT EXISTS stocks;
 
-CREATE TABLE stocks.transactions (
+CREATE TABLE IF NOT EXISTS stocks.transactions (
     date DATE NOT NULL,
     ticker TEXT NOT NULL,
     quantity DOUBLE PRECISION NOT NULL,
@@ -73,23 +122,81 @@ CREATE TABLE stocks.transactions (
     avg_price DOUBLE PRECISION NOT NULL,
     current_quantity DOUBLE PRECISION NOT NULL,
     _processed_at TIMESTAMP,
+    _row_hash BIGINT,
     PRIMARY KEY (date, ticker, quantity, price)
 );
 
-create table stocks.dividends_incomes (
-	date DATE NOT NULL,
-	ticker TEXT NOT NULL,
-	type TEXT NOT NULL,
-	source TEXT NOT NULL,
-	value FLOAT,
-	_processed_at TIMESTAMP,
-	PRIMARY KEY (date, ticker, type, source)
-)
-
-create table stocks.allocations (
-    year_month date,
-    macroallocation text,
-    value float,
+CREATE TABLE IF NOT EXISTS stocks.dividends_incomes (
+    date DATE NOT NULL,
+    ticker TEXT NOT NULL,
+    type TEXT NOT NULL,
+    source TEXT NOT NULL,
+    value DOUBLE PRECISION,
     _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (date, ticker, type, source)
+);
+
+CREATE TABLE IF NOT EXISTS stocks.allocations (
+    year_month DATE,
+    macroallocation TEXT,
+    value DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
     PRIMARY KEY (year_month, macroallocation)
-)
+);
+
+CREATE TABLE IF NOT EXISTS stocks.income_metrics (
+    year_month DATE NOT NULL,
+    ticker TEXT NOT NULL,
+    income DOUBLE PRECISION,
+    ttm_income DOUBLE PRECISION,
+    cost_basis DOUBLE PRECISION,
+    yield_on_cost DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (year_month, ticker)
+);
+
+CREATE TABLE IF NOT EXISTS stocks.payout_cadence (
+    ticker TEXT NOT NULL PRIMARY KEY,
+    payments_ttm INT,
+    median_days_between DOUBLE PRECISION,
+    last_payment DATE,
+    cadence TEXT,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS stocks.darf_monthly (
+    year_month DATE NOT NULL PRIMARY KEY,
+    stock_sales DOUBLE PRECISION,
+    sales DOUBLE PRECISION,
+    stock_result DOUBLE PRECISION,
+    other_result DOUBLE PRECISION,
+    fii_result DOUBLE PRECISION,
+    exempt BOOLEAN,
+    exempt_gains DOUBLE PRECISION,
+    common_taxable DOUBLE PRECISION,
+    common_loss_carried DOUBLE PRECISION,
+    fii_taxable DOUBLE PRECISION,
+    fii_loss_carried DOUBLE PRECISION,
+    tax DOUBLE PRECISION,
+    darf_due DOUBLE PRECISION,
+    tax_carried DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT
+);
+
+CREATE TABLE IF NOT EXISTS stocks.return_metrics (
+    as_of DATE NOT NULL,
+    series TEXT NOT NULL,
+    window_name TEXT NOT NULL,
+    level TEXT,
+    start DATE,
+    twr DOUBLE PRECISION,
+    xirr DOUBLE PRECISION,
+    _processed_at TIMESTAMP,
+    _row_hash BIGINT,
+    PRIMARY KEY (as_of, series, window_name)
+);
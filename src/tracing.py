@@ -0,0 +1,220 @@
+"""Opt-in tracing of the SQL statements sent to Postgres.
+
+Once enabled, every statement executed by any SQLAlchemy engine, plus the COPY based bulk paths
+of `src.backends`, is timed and aggregated by fingerprint: the statement with its literals and
+value lists replaced by placeholders, so the 5000 executions of a per-row upsert add up to one
+line of the report. Statements slower than `explain_threshold` can be sampled: SELECTs with
+`EXPLAIN ANALYZE`, which runs them again, and WITH statements, which may modify data, with a
+plain `EXPLAIN`.
+
+Enable it for a whole process with the `FINANCES_SQL_TRACE=1` environment variable, which logs
+the report at exit, or around a pipeline run with `trace_run`, which the `--trace-sql` flag of
+`data_ingestion` and `stock_data` uses. `FINANCES_SQL_EXPLAIN_MS` sets the sampling threshold.
+"""
+
+import atexit
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TRACE_ENV_VAR = "FINANCES_SQL_TRACE"
+EXPLAIN_ENV_VAR = "FINANCES_SQL_EXPLAIN_MS"
+MAX_EXPLAIN_SAMPLES = 5
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e-?\d+)?\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|:\w+|\$\d+|\?")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*")
+
+
+def fingerprint(statement: str) -> str:
+    """Return `statement` with literals, parameters and value lists replaced by placeholders."""
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _PLACEHOLDER.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    statement = _VALUE_LIST.sub("(...)", statement)
+    return " ".join(statement.split())
+
+
+class SQLTracer:
+    """Aggregates the latency and rows of the traced statements by fingerprint.
+
+    Parameters
+    ----------
+    explain_threshold : float, optional
+        Latency, in milliseconds, above which queries are sampled with `EXPLAIN`, see
+        `explain_command`. Disabled if not passed.
+    """
+
+    def __init__(self, explain_threshold: float | None = None):
+        self.explain_threshold = explain_threshold
+        self.stats: dict[str, dict[str, float]] = {}
+        self.explains: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float, rows: int | None) -> None:
+        key = fingerprint(statement)
+        with self._lock:
+            stats = self.stats.setdefault(
+                key, {"calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0}
+            )
+            stats["calls"] += 1
+            stats["total_ms"] += elapsed * 1000
+            stats["max_ms"] = max(stats["max_ms"], elapsed * 1000)
+            stats["rows"] += max(rows or 0, 0)
+
+    def should_explain(self, statement: str, elapsed: float) -> bool:
+        if self.explain_threshold is None or elapsed * 1000 < self.explain_threshold:
+            return False
+        if explain_command(statement) is None:
+            return False
+        with self._lock:
+            return (
+                len(self.explains) < MAX_EXPLAIN_SAMPLES
+                and fingerprint(statement) not in self.explains
+            )
+
+    def add_explain(self, statement: str, plan: str) -> None:
+        with self._lock:
+            if len(self.explains) < MAX_EXPLAIN_SAMPLES:
+                self.explains.setdefault(fingerprint(statement), plan)
+
+    def report(self, top: int = 10) -> pd.DataFrame:
+        """Return the `top` statements with the largest total latency."""
+        with self._lock:
+            report = pd.DataFrame.from_dict(self.stats, orient="index")
+        if report.empty:
+            return pd.DataFrame(columns=["calls", "total_ms", "mean_ms", "max_ms", "rows"])
+        report.index.name = "fingerprint"
+        return (
+            report.assign(mean_ms=lambda df: df["total_ms"] / df["calls"])
+            [["calls", "total_ms", "mean_ms", "max_ms", "rows"]]
+            .sort_values("total_ms", ascending=False)
+            .head(top)
+        )
+
+    def log_report(self, name: str = "run", top: int = 10) -> None:
+        report = self.report(top)
+        calls = sum(stats["calls"] for stats in self.stats.values())
+        total = sum(stats["total_ms"] for stats in self.stats.values())
+        with pd.option_context("display.max_colwidth", 120, "display.width", 250):
+            logging.info(
+                f"SQL trace of {name}: {calls} statements, {len(self.stats)} distinct,"
+                f" {total:.0f} ms in total. Slowest:\n{report.to_string()}"
+            )
+        with self._lock:
+            explains = list(self.explains.items())
+        for key, plan in explains:
+            logging.info(f"Plan of {key}:\n{plan}")
+
+
+def explain_command(statement: str) -> str | None:
+    """Return the EXPLAIN prefix that samples `statement` safely, None if it must not be run.
+
+    Only plain SELECTs are analyzed, as ANALYZE executes the statement again. WITH statements
+    may hide an INSERT, UPDATE or DELETE in a CTE, so they only get their estimated plan.
+    """
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return {"SELECT": "EXPLAIN ANALYZE", "WITH": "EXPLAIN"}.get(keyword)
+
+
+_tracer: SQLTracer | None = None
+
+
+def get_tracer() -> SQLTracer | None:
+    """Return the active tracer, if tracing is enabled."""
+    return _tracer
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_trace_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["_trace_start"].pop()
+    tracer = _tracer
+    if tracer is None:
+        return
+    elapsed = time.perf_counter() - started
+    tracer.record(statement, elapsed, cursor.rowcount)
+    if tracer.should_explain(statement, elapsed) and conn.dialect.name == "postgresql":
+        try:
+            with conn.connection.dbapi_connection.cursor() as explain_cursor:
+                explain_cursor.execute(f"{explain_command(statement)} {statement}", parameters)
+                plan = "\n".join(row[0] for row in explain_cursor.fetchall())
+            tracer.add_explain(statement, plan)
+        except Exception:
+            logging.warning(f"Could not explain {fingerprint(statement)}", exc_info=True)
+
+
+def enable_tracing(explain_threshold: float | None = None) -> SQLTracer:
+    """Start tracing the statements of every engine and return the new tracer."""
+    global _tracer
+    _tracer = SQLTracer(explain_threshold)
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    return _tracer
+
+
+def disable_tracing() -> None:
+    """Stop tracing. Statements in flight are not recorded."""
+    global _tracer
+    _tracer = None
+    if event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def trace_statement(statement: str):
+    """Trace a statement run outside SQLAlchemy's cursors, e.g. on a raw psycopg2 cursor.
+
+    The block may set the `rows` key of the yielded dict.
+    """
+    result = {"rows": None}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        tracer = _tracer
+        if tracer is not None:
+            tracer.record(statement, time.perf_counter() - started, result["rows"])
+
+
+@contextmanager
+def trace_run(name: str, enabled: bool = True, top: int = 10):
+    """Trace the statements of a pipeline run and log its report at the end.
+
+    Does nothing if `enabled` is False, so CLIs can pass their `--trace-sql` flag.
+    """
+    if not enabled:
+        yield None
+        return
+    previous = _tracer
+    tracer = enable_tracing(_explain_threshold_from_env())
+    try:
+        yield tracer
+    finally:
+        tracer.log_report(name, top)
+        if previous is None:
+            disable_tracing()
+        else:
+            globals()["_tracer"] = previous
+
+
+def _explain_threshold_from_env() -> float | None:
+    value = os.getenv(EXPLAIN_ENV_VAR)
+    return float(value) if value else None
+
+
+if os.getenv(TRACE_ENV_VAR) and _tracer is None:
+    _process_tracer = enable_tracing(_explain_threshold_from_env())
+    atexit.register(_process_tracer.log_report, "process")
@@ -0,0 +1,142 @@
+import os
+from datetime import date
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from src.migrations import apply_migrations
+from src.utils import (
+    copy_dataframe_to_database,
+    get_tables_watermark,
+    persist_dataframe_to_database,
+    read_sql_query,
+)
+
+pytest.importorskip("duckdb")
+
+PK_COLUMNS = ["date", "asset", "currency"]
+
+
+@pytest.fixture
+def conn_str(tmp_path):
+    return f"duckdb:///{tmp_path / 'finances.duckdb'}"
+
+
+def _quotations(values: list[float]) -> pd.DataFrame:
+    return pd.DataFrame({
+        "date": [date(2024, 1, day) for day in range(1, len(values) + 1)],
+        "asset": "USD",
+        "currency": "BRL",
+        "value": values,
+    })
+
+
+def test_duckdb_upsert_updates_existing_keys(conn_str):
+    persist_dataframe_to_database(
+        _quotations([4.9, 5.0]), "currencies", "quotations", True, conn_str, pk_columns=PK_COLUMNS
+    )
+    persist_dataframe_to_database(
+        _quotations([4.8, 5.1, 5.2]), "currencies", "quotations", True, conn_str,
+        pk_columns=PK_COLUMNS,
+    )
+    stored = read_sql_query(
+        "SELECT date, value FROM currencies.quotations ORDER BY date", conn_str
+    )
+    assert stored["value"].tolist() == [4.8, 5.1, 5.2]
+
+
+def test_duckdb_bulk_upsert_keeps_last_repeated_key(conn_str):
+    df = pd.concat([_quotations([1.0, 2.0]), _quotations([3.0])])
+    copy_dataframe_to_database(df, "currencies", "quotations", PK_COLUMNS, True, conn_str)
+    stored = read_sql_query("SELECT value FROM currencies.quotations ORDER BY date", conn_str)
+    assert stored["value"].tolist() == [3.0, 2.0]
+
+
+@pytest.mark.skipif(
+    os.getenv("FINANCES_TEST_CONN_STR") is None, reason="FINANCES_TEST_CONN_STR is not set"
+)
+def test_postgres_bulk_upsert_keeps_last_repeated_key():
+    conn_str = os.environ["FINANCES_TEST_CONN_STR"]
+    apply_migrations(conn_str)
+    df = pd.concat([_quotations([1.0, 2.0]), _quotations([3.0])]).assign(asset="TEST_DUPLICATES")
+    copy_dataframe_to_database(df, "currencies", "quotations", PK_COLUMNS, True, conn_str)
+    stored = read_sql_query(
+        "SELECT value FROM currencies.quotations WHERE asset = 'TEST_DUPLICATES' ORDER BY date",
+        conn_str,
+    )
+    assert stored["value"].tolist() == [3.0, 2.0]
+
+
+@pytest.mark.skipif(
+    os.getenv("FINANCES_TEST_CONN_STR") is None, reason="FINANCES_TEST_CONN_STR is not set"
+)
+def test_postgres_bulk_upsert_fills_defaulted_columns():
+    conn_str = os.environ["FINANCES_TEST_CONN_STR"]
+    engine = create_engine(conn_str)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS public.test_bulk_defaults"))
+        connection.execute(text(
+            """
+            CREATE TABLE public.test_bulk_defaults (
+                id INT PRIMARY KEY,
+                kind TEXT NOT NULL DEFAULT 'default',
+                value DOUBLE PRECISION,
+                _row_hash BIGINT
+            )
+            """
+        ))
+    df = pd.DataFrame({"id": [1, 2], "value": [1.0, 2.0]})
+    copy_dataframe_to_database(df, "public", "test_bulk_defaults", ["id"], conn_str=conn_str)
+    stored = read_sql_query("SELECT kind FROM public.test_bulk_defaults", conn_str)
+    assert stored["kind"].tolist() == ["default", "default"]
+
+
+def test_duckdb_append_and_watermark(conn_str):
+    keys = pd.DataFrame({"id": ["a", "b"]})
+    persist_dataframe_to_database(
+        keys, "crypto", "manually_inserted_keys", True, conn_str, upsert=False
+    )
+    (table, processed_at, n_rows), = get_tables_watermark(
+        ["crypto.manually_inserted_keys"], conn_str
+    )
+    assert table == "crypto.manually_inserted_keys"
+    assert n_rows == 2
+    assert pd.notna(processed_at)
+
+
+def test_diff_upsert_only_writes_new_or_changed_rows(conn_str):
+    first = persist_dataframe_to_database(
+        _quotations([4.9, 5.0]), "currencies", "quotations", True, conn_str,
+        pk_columns=PK_COLUMNS, diff=True,
+    )
+    assert first == {"new": 2, "changed": 0, "unchanged": 0}
+    stamped = read_sql_query(
+        "SELECT date, _processed_at FROM currencies.quotations ORDER BY date", conn_str
+    )
+
+    second = copy_dataframe_to_database(
+        _quotations([4.9, 5.1, 5.2]), "currencies", "quotations", PK_COLUMNS, True, conn_str,
+        diff=True,
+    )
+    assert second == {"new": 1, "changed": 1, "unchanged": 1}
+    stored = read_sql_query(
+        "SELECT date, value, _processed_at FROM currencies.quotations ORDER BY date", conn_str
+    )
+    assert stored["value"].tolist() == [4.9, 5.1, 5.2]
+    # The unchanged row keeps its stamp.
+    assert stored["_processed_at"].iloc[0] == stamped["_processed_at"].iloc[0]
+    assert stored["_processed_at"].iloc[1] > stamped["_processed_at"].iloc[1]
+
+
+def test_diff_upsert_compares_the_last_row_of_repeated_keys(conn_str):
+    df = pd.concat([_quotations([1.0, 2.0]), _quotations([3.0])])
+    first = copy_dataframe_to_database(
+        df, "currencies", "quotations", PK_COLUMNS, True, conn_str, diff=True
+    )
+    assert first == {"new": 2, "changed": 0, "unchanged": 0}
+    again = copy_dataframe_to_database(
+        df, "currencies", "quotations", PK_COLUMNS, True, conn_str, diff=True
+    )
+    assert again == {"new": 0, "changed": 0, "unchanged": 2}
+    stored = read_sql_query("SELECT value FROM currencies.quotations ORDER BY date", conn_str)
+    assert stored["value"].tolist() == [3.0, 2.0]
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+from dateutil.relativedelta import relativedelta
+from src.data_ingestion.backfill import backfill_series, split_windows
+from src.utils import read_sql_query
+
+pytest.importorskip("duckdb")
+
+
+@pytest.fixture
+def conn_str(tmp_path):
+    return f"duckdb:///{tmp_path / 'finances.duckdb'}"
+
+
+def test_split_windows_covers_the_range_contiguously():
+    windows = split_windows(date(2020, 1, 1), date(2020, 12, 31), relativedelta(days=120))
+    assert windows == [
+        (date(2020, 1, 1), date(2020, 4, 30)),
+        (date(2020, 4, 30), date(2020, 8, 28)),
+        (date(2020, 8, 28), date(2020, 12, 26)),
+        (date(2020, 12, 26), date(2021, 1, 1)),
+    ]
+    assert split_windows(date(2020, 1, 1), date(2020, 12, 31), None) == [
+        (date(2020, 1, 1), date(2021, 1, 1))
+    ]
+
+
+def test_backfill_resumes_from_the_failed_windows(conn_str):
+    calls = []
+    failing = {"2020-03-31"}
+
+    def fetch(symbol, start_date, end_date):
+        calls.append(start_date)
+        if start_date in failing:
+            return None
+        days = pd.date_range(start_date, end_date, inclusive="left")
+        return pd.DataFrame({"date": days.date, "value": 1.0})
+
+    def backfill():
+        return backfill_series(
+            fetch, "awesome", "USD-BRL", "USD", "BRL", "2020-01-01", "2020-06-30",
+            max_workers=2, conn_str=conn_str,
+        )
+
+    errors = backfill()
+    assert list(errors) == [(date(2020, 3, 31), date(2020, 6, 29))]
+    assert sorted(calls) == ["2020-01-01", "2020-03-31", "2020-06-29"]
+
+    calls.clear()
+    failing.clear()
+    assert backfill() == {}
+    assert calls == ["2020-03-31"]
+    assert backfill() == {}
+    assert calls == ["2020-03-31"]
+
+    stored = read_sql_query("SELECT date FROM currencies.quotations ORDER BY date", conn_str)
+    assert pd.to_datetime(stored["date"]).dt.date.tolist() == list(
+        pd.date_range("2020-01-01", "2020-06-30").date
+    )
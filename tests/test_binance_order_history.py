@@ -0,0 +1,215 @@
+import pandas as pd
+import pytest
+from src.data_ingestion import binance_order_history
+from src.data_ingestion.binance_order_history import (
+    encode_ids,
+    get_account_path,
+    parse_binance_report,
+    parse_binance_report_parallel,
+)
+
+
+def _leg(utc_time, operation, coin, change, user_id=1):
+    return {
+        "User_ID": user_id,
+        "UTC_Time": utc_time,
+        "Account": "Spot",
+        "Operation": operation,
+        "Coin": coin,
+        "Change": change,
+        "Remark": "",
+    }
+
+
+def _make_report() -> pd.DataFrame:
+    rows = [
+        # Clean swap with fee
+        _leg("2021-10-27 16:49:05", "Transaction Spend", "BRL", -100.0),
+        _leg("2021-10-27 16:49:05", "Transaction Buy", "SHIB", 271767.0),
+        _leg("2021-10-27 16:49:05", "Transaction Fee", "SHIB", -271.77),
+        # Clean swap without fee, sold/revenue flavour
+        _leg("2021-11-03 01:17:59", "Transaction Sold", "ETH", -0.5),
+        _leg("2021-11-03 01:17:59", "Transaction Revenue", "USDT", 2000.0),
+        # Multi-fill swap: reconciled by summing the fills
+        _leg("2022-01-26 22:26:40", "Transaction Spend", "USDT", -10.0),
+        _leg("2022-01-26 22:26:40", "Transaction Spend", "USDT", -15.0),
+        _leg("2022-01-26 22:26:40", "Transaction Buy", "BTC", 0.0001),
+        _leg("2022-01-26 22:26:40", "Transaction Buy", "BTC", 0.00015),
+        _leg("2022-01-26 22:26:40", "Transaction Fee", "BNB", -0.0001),
+        # Multi-fill swap with identical fills, each one counted
+        _leg("2022-01-26 23:00:00", "Transaction Spend", "USDT", -10.0),
+        _leg("2022-01-26 23:00:00", "Transaction Spend", "USDT", -10.0),
+        _leg("2022-01-26 23:00:00", "Transaction Spend", "USDT", -15.0),
+        _leg("2022-01-26 23:00:00", "Transaction Buy", "BTC", 0.0001),
+        _leg("2022-01-26 23:00:00", "Transaction Buy", "BTC", 0.0001),
+        _leg("2022-01-26 23:00:00", "Transaction Buy", "BTC", 0.00015),
+        _leg("2022-01-26 23:00:00", "Transaction Fee", "BTC", -1e-7),
+        _leg("2022-01-26 23:00:00", "Transaction Fee", "BTC", -1e-7),
+        # Swap buying two different coins at once: ambiguous
+        _leg("2022-01-27 10:00:00", "Transaction Spend", "USDT", -20.0),
+        _leg("2022-01-27 10:00:00", "Transaction Buy", "BTC", 0.0002),
+        _leg("2022-01-27 10:00:00", "Transaction Buy", "ETH", 0.003),
+        # Binance Convert
+        _leg("2022-02-10 10:00:00", "Binance Convert", "BRL", -50.0),
+        _leg("2022-02-10 10:00:00", "Binance Convert", "USDT", 9.5),
+        # Earn
+        _leg("2022-03-01 00:00:00", "Simple Earn Flexible Interest", "USDT", 0.01),
+        _leg("2022-03-02 00:00:00", "Staking Rewards", "SOL", 0.002),
+        # Deposit, airdrop, withdraw and an unknown operation
+        _leg("2022-04-05 12:00:00", "Deposit", "BRL", 1000.0),
+        _leg("2022-05-05 12:00:00", "Airdrop Assets", "ETHW", 0.5),
+        _leg("2022-06-05 12:00:00", "Withdraw", "BTC", -0.0002),
+        _leg("2022-07-05 12:00:00", "Small Assets Exchange BNB", "BNB", 0.001),
+    ]
+    return pd.DataFrame(rows)
+
+
+def _normalize(table: pd.DataFrame) -> pd.DataFrame:
+    return (
+        table.astype({"id": str})
+        .sort_values(list(table.columns.intersection(["id", "Operation", "Coin"])))
+        .reset_index(drop=True)
+    )
+
+
+def test_parse_binance_report_tables():
+    results = parse_binance_report(_make_report())
+    swaps = results["default_swaps"].set_index("id")
+    assert set(swaps.index) == {"2021-10-27 16:49:05", "2021-11-03 01:17:59"}
+    assert swaps.loc["2021-10-27 16:49:05", "paid_amount"] == 100.0
+    assert swaps.loc["2021-10-27 16:49:05", "paid_taxes_amount"] == pytest.approx(271.77)
+    assert swaps.loc["2021-11-03 01:17:59", "received_currency"] == "USDT"
+    assert swaps.loc["2021-11-03 01:17:59", "paid_taxes_amount"] == 0
+    assert set(results["manual_input_swaps"]["id"]) == {"2022-01-27 10:00:00"}
+    reconciled = results["reconciled_swaps"].set_index("id").loc["2022-01-26 22:26:40"]
+    assert reconciled["paid_amount"] == 25.0
+    assert reconciled["received_amount"] == pytest.approx(0.00025)
+    assert reconciled["paid_taxes_amount"] == pytest.approx(0.0001)
+    assert reconciled["paid_taxes_currency"] == "BNB"
+    assert results["converts"]["received_amount"].tolist() == [9.5]
+    assert len(results["earn"]) == 2
+    assert results["remaining_records"]["Operation"].tolist() == ["Small Assets Exchange BNB"]
+
+
+@pytest.mark.parametrize("engine", ["pandas", "polars"])
+def test_identical_fills_are_summed(engine):
+    if engine == "polars":
+        pytest.importorskip("polars")
+    results = parse_binance_report(_make_report(), engine=engine)
+    reconciled = results["reconciled_swaps"].set_index("id").loc["2022-01-26 23:00:00"]
+    assert reconciled["paid_amount"] == pytest.approx(35.0)
+    assert reconciled["received_amount"] == pytest.approx(0.00035)
+    assert reconciled["paid_taxes_amount"] == pytest.approx(2e-7)
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_parse_binance_report_parallel_matches_serial(n_workers):
+    report = _make_report()
+    serial = parse_binance_report(report)
+    parallel = parse_binance_report_parallel(report, n_workers=n_workers)
+
+    assert serial.keys() == parallel.keys()
+    for key in serial:
+        pd.testing.assert_frame_equal(
+            _normalize(serial[key]),
+            _normalize(parallel[key]),
+            check_dtype=False,
+            check_index_type=False,
+        )
+
+
+def test_accounts_are_parsed_separately():
+    # Both accounts swap at the same second: mixed together, the legs would look ambiguous.
+    report = pd.DataFrame([
+        _leg("2021-10-27 16:49:05", "Transaction Spend", "BRL", -100.0, user_id=1),
+        _leg("2021-10-27 16:49:05", "Transaction Buy", "SHIB", 271767.0, user_id=1),
+        _leg("2021-10-27 16:49:05", "Transaction Spend", "BRL", -50.0, user_id=2),
+        _leg("2021-10-27 16:49:05", "Transaction Buy", "ADA", 30.0, user_id=2),
+        _leg("2022-04-05 12:00:00", "Deposit", "BRL", 1000.0, user_id=2),
+    ])
+    for results in [parse_binance_report(report), parse_binance_report_parallel(report, 2)]:
+        swaps = results["default_swaps"].set_index("account_id")
+        assert swaps.loc["1", "received_currency"] == "SHIB"
+        assert swaps.loc["2", "received_currency"] == "ADA"
+        assert swaps.loc["2", "paid_amount"] == 50.0
+        assert results["brl_deposits"]["account_id"].tolist() == ["2"]
+        assert results["manual_input_swaps"].empty
+
+
+def test_default_user_keeps_the_default_account(monkeypatch):
+    monkeypatch.setattr(binance_order_history, "DEFAULT_USER_ID", "1")
+    report = pd.DataFrame([
+        _leg("2022-04-05 12:00:00", "Deposit", "BRL", 1000.0, user_id=1),
+        _leg("2022-04-05 12:00:00", "Deposit", "BRL", 500.0, user_id=2),
+    ])
+    for results in [parse_binance_report(report), parse_binance_report_parallel(report, 1)]:
+        deposits = results["brl_deposits"].set_index("account_id")["value_brl"]
+        assert deposits.to_dict() == {"default": 1000.0, "2": 500.0}
+
+
+def test_default_records_need_their_user_id(monkeypatch):
+    queries = []
+
+    def read_sql_query(query, params=None):
+        queries.append(params)
+        return pd.DataFrame({"?column?": [1]})
+
+    monkeypatch.setattr(binance_order_history, "read_sql_query", read_sql_query)
+    with pytest.raises(ValueError, match="FINANCES_BINANCE_DEFAULT_USER_ID"):
+        binance_order_history._check_default_account(["1", "2"])
+    binance_order_history._check_default_account(["default", "2"])
+    monkeypatch.setattr(binance_order_history, "DEFAULT_USER_ID", "1")
+    binance_order_history._check_default_account(["default", "2"])
+    assert queries == [{"account": "default"}]
+
+
+def test_unparseable_report_ids_raise():
+    report = pd.DataFrame([_leg("2022-04-05 12:00", "Deposit", "BRL", 1000.0)])
+    with pytest.raises(ValueError, match="2022-04-05 12:00"):
+        parse_binance_report(report)
+    with pytest.raises(ValueError):
+        encode_ids(pd.Series(["2022-04-05 12:00:00", "biscoint_2022-04-05"]))
+
+
+def test_manually_inserted_keys_of_other_sources_are_ignored(monkeypatch):
+    inserted = ["22-06-05 12:00:00 BTC", "biscoint_2022-06-05", "2022-04-05 12:00:00"]
+    monkeypatch.setattr(
+        binance_order_history, "read_sql_query",
+        lambda query, params=None: pd.DataFrame({"id": inserted}),
+    )
+    report = pd.DataFrame([
+        _leg("2022-04-05 12:00:00", "Deposit", "BRL", 1000.0),
+        _leg("2022-07-05 12:00:00", "Small Assets Exchange BNB", "BNB", 0.001),
+    ]).rename(columns={"UTC_Time": "id"})
+    remaining = binance_order_history._preprocess_manual_inspection(report, "1")
+    assert remaining["id"].tolist() == ["2022-07-05 12:00:00"]
+
+
+def test_account_paths():
+    assert get_account_path("/data/inspection.csv", "2") == "/data/inspection_2.csv"
+
+
+def _sort_rows(table: pd.DataFrame) -> pd.DataFrame:
+    table = table.astype({"id": str})
+    return table.sort_values(list(table.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("report", ["handmade", "no_accounts", "synthetic"])
+def test_polars_engine_matches_pandas(report):
+    pytest.importorskip("polars")
+    from src.data_ingestion.binance_polars import synthetic_report
+
+    report = {
+        "handmade": _make_report,
+        "no_accounts": lambda: _make_report().drop(columns="User_ID").assign(Remark=None),
+        "synthetic": lambda: synthetic_report(2000, n_accounts=3),
+    }[report]()
+    expected = parse_binance_report(report)
+    results = parse_binance_report(report, engine="polars")
+
+    assert expected.keys() == results.keys()
+    for key in expected:
+        assert list(expected[key].columns) == list(results[key].columns), key
+        pd.testing.assert_frame_equal(
+            _sort_rows(expected[key]), _sort_rows(results[key]), check_dtype=False
+        )
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src import darf
+from src.darf import compute_darf, get_monthly_sales
+
+
+def monthly_sales(stock_sales, stock_result, fii_result=None):
+    n = len(stock_sales)
+    return pd.DataFrame({
+        "stock_sales": np.asarray(stock_sales, dtype=float),
+        "sales": np.asarray(stock_sales, dtype=float),
+        "stock_result": np.asarray(stock_result, dtype=float),
+        "other_result": 0.0,
+        "fii_result": np.zeros(n) if fii_result is None else np.asarray(fii_result, dtype=float),
+    }, index=pd.date_range("2023-01-01", periods=n, freq="MS").rename("year_month"))
+
+
+def naive_darf(monthly):
+    common_loss = fii_loss = carried = 0.0
+    rows = []
+    for _, month in monthly.iterrows():
+        exempt = month["stock_sales"] <= darf.EXEMPTION_LIMIT
+        stock = min(month["stock_result"], 0.0) if exempt else month["stock_result"]
+        common = month["other_result"] + stock
+        common_taxable = max(common - common_loss, 0.0)
+        common_loss = max(common_loss - common, 0.0)
+        fii_taxable = max(month["fii_result"] - fii_loss, 0.0)
+        fii_loss = max(fii_loss - month["fii_result"], 0.0)
+        carried += 0.15 * common_taxable + 0.20 * fii_taxable
+        due, carried = (carried, 0.0) if carried >= darf.DARF_MINIMUM else (0.0, carried)
+        rows.append((common_loss, fii_loss, due, carried))
+    return pd.DataFrame(
+        rows, columns=["common_loss_carried", "fii_loss_carried", "darf_due", "tax_carried"],
+        index=monthly.index,
+    )
+
+
+@pytest.fixture
+def random_monthly():
+    rng = np.random.default_rng(0)
+    n = 240
+    return monthly_sales(
+        rng.uniform(0, 60_000, n), rng.normal(0, 3_000, n), rng.normal(0, 500, n)
+    )
+
+
+def test_sales_up_to_the_limit_are_exempt():
+    result = compute_darf(monthly_sales([15_000, 25_000], [2_000, 2_000]))
+    assert result["exempt"].tolist() == [True, False]
+    assert result["exempt_gains"].tolist() == [2_000, 0]
+    assert result["tax"].tolist() == pytest.approx([0, 300])
+
+
+def test_losses_of_exempt_months_are_carried_forward():
+    # The exempt gain of March does not consume the loss of January.
+    result = compute_darf(monthly_sales(
+        [10_000, 30_000, 10_000, 30_000], [-1_000, 600, 5_000, 1_000]
+    ))
+    assert result["common_loss_carried"].tolist() == pytest.approx([1_000, 400, 400, 0])
+    assert result["common_taxable"].tolist() == pytest.approx([0, 0, 0, 600])
+
+
+def test_fii_losses_only_offset_fii_gains():
+    result = compute_darf(monthly_sales([0, 30_000], [0, 1_000], [-500, 800]))
+    assert result["fii_taxable"].tolist() == pytest.approx([0, 300])
+    assert result["common_taxable"].tolist() == pytest.approx([0, 1_000])
+    assert result["tax"].iloc[1] == pytest.approx(0.20 * 300 + 0.15 * 1_000)
+
+
+def test_taxes_below_the_minimum_are_paid_later():
+    result = compute_darf(monthly_sales([30_000] * 3, [40, 40, 40]))
+    assert result["darf_due"].tolist() == pytest.approx([0, 12, 0])
+    assert result["tax_carried"].tolist() == pytest.approx([6, 0, 6])
+
+
+def test_matches_a_month_by_month_loop(random_monthly):
+    expected = naive_darf(random_monthly)
+    result = compute_darf(random_monthly)
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_exact=False)
+
+
+def test_monthly_sales_use_the_average_price():
+    transactions = pd.DataFrame(
+        [
+            ("2024-01-02", "PETR4", 100, 10.0, 1.0, 10.01),
+            ("2024-01-20", "PETR4", -40, 15.0, 2.0, 10.01),
+            ("2024-02-05", "HGLG11", -10, 160.0, 0.0, 150.0),
+        ],
+        columns=["date", "ticker", "quantity", "price", "taxes", "avg_price"],
+    )
+    monthly = get_monthly_sales(transactions, {"HGLG11": "fii"})
+    assert monthly["stock_sales"].tolist() == pytest.approx([600, 0])
+    assert monthly["stock_result"].tolist() == pytest.approx([40 * (15 - 10.01) - 2, 0])
+    assert monthly["fii_result"].tolist() == pytest.approx([0, 100])
@@ -0,0 +1,88 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from src import utils
+from src.dividends import (
+    get_monthly_cost_basis,
+    get_monthly_income,
+    get_payout_cadence,
+    get_trailing_yield_on_cost,
+)
+from src.utils import cache_on_tables_watermark
+
+
+@pytest.fixture
+def dividends():
+    monthly = [("MXRF11", f"2023-{month:02d}-15", 10.0) for month in range(1, 13)]
+    quarterly = [("ITSA4", date, 30.0) for date in ["2023-03-01", "2023-06-01", "2023-09-01"]]
+    return pd.DataFrame(monthly + quarterly, columns=["ticker", "date", "value"])
+
+
+@pytest.fixture
+def transactions():
+    return pd.DataFrame(
+        [
+            ("2022-12-01", "MXRF11", 10.0, 100),
+            ("2022-12-01", "ITSA4", 10.0, 100),
+            # Held, but never paid.
+            ("2022-12-01", "PETR4", 20.0, 100),
+            ("2023-07-10", "MXRF11", 10.0, 200),
+        ],
+        columns=["date", "ticker", "avg_price", "current_quantity"],
+    )
+
+
+def test_trailing_yield_on_cost(dividends, transactions):
+    income = get_monthly_income(dividends)
+    cost_basis = get_monthly_cost_basis(transactions, income.index)
+    metrics = get_trailing_yield_on_cost(income, cost_basis).set_index(["year_month", "ticker"])
+
+    december = metrics.loc[pd.Timestamp("2023-12-01")]
+    assert december.loc["MXRF11", "ttm_income"] == 120.0
+    assert december.loc["MXRF11", "yield_on_cost"] == pytest.approx(120.0 / 2000.0)
+    assert december.loc["ITSA4", "ttm_income"] == 90.0
+    # The portfolio yield is over the cost basis of every holding, PETR4 included.
+    assert december.loc["TOTAL", "cost_basis"] == 2000.0 + 1000.0 + 2000.0
+    assert december.loc["TOTAL", "yield_on_cost"] == pytest.approx(210.0 / 5000.0)
+    assert "PETR4" not in december.index
+
+    june = metrics.loc[pd.Timestamp("2023-06-01")]
+    assert june.loc["MXRF11", "ttm_income"] == 60.0
+    assert june.loc["MXRF11", "cost_basis"] == 1000.0
+
+
+def test_trailing_income_drops_months_out_of_the_window(dividends, transactions):
+    income = get_monthly_income(dividends)
+    cost_basis = get_monthly_cost_basis(transactions, income.index)
+    metrics = get_trailing_yield_on_cost(income, cost_basis, window=3)
+    itsa = metrics[metrics["ticker"] == "ITSA4"].set_index("year_month")
+    # Paid in March, June and September: each payment counts for three months.
+    assert itsa["ttm_income"].loc["2023-05-01"] == 30.0
+    assert itsa["ttm_income"].loc["2023-06-01"] == 30.0
+
+
+def test_payout_cadence(dividends):
+    cadence = get_payout_cadence(dividends, as_of=datetime(2024, 3, 1)).set_index("ticker")
+    assert cadence.loc["MXRF11", "cadence"] == "monthly"
+    assert cadence.loc["ITSA4", "cadence"] == "quarterly"
+    assert cadence.loc["MXRF11", "payments_ttm"] == 10
+    assert cadence.loc["ITSA4", "payments_ttm"] == 2
+    assert cadence.loc["ITSA4", "last_payment"] == pd.Timestamp("2023-09-01")
+
+
+def test_cache_is_invalidated_when_the_watermark_changes(monkeypatch):
+    watermark = [("stocks.dividends_incomes", None, 1)]
+    monkeypatch.setattr(utils, "get_tables_watermark", lambda tables, conn_str: list(watermark))
+    calls = []
+
+    @cache_on_tables_watermark(["stocks.dividends_incomes"])
+    def compute(*, conn_str="db"):
+        calls.append(conn_str)
+        return len(calls)
+
+    assert compute() == compute() == 1
+    assert compute(conn_str="other") == 2
+    watermark[0] = ("stocks.dividends_incomes", datetime(2024, 1, 1), 2)
+    assert compute() == compute() == 3
+    assert calls == ["db", "other", "db"]
@@ -0,0 +1,112 @@
+import pandas as pd
+import pytest
+from src.data_ingestion.biscoint import BISCOINT_STATEMENT
+from src.data_ingestion.coinext import COINEXT_STATEMENT
+from src.data_ingestion.exchange_statements import parse_statement
+
+
+def _coinext_order(ts, instrument, side, base_amount, notional, fee):
+    return {
+        "TransReportDatetime": ts,
+        "Instrument": instrument,
+        "Side": side,
+        "BaseSettlementAmount": base_amount,
+        "Notional": notional,
+        "Fee": fee,
+        "OrderId": 1,
+    }
+
+
+def test_coinext_orders_are_split_and_fills_summed():
+    orders = pd.DataFrame([
+        _coinext_order("2021-05-01T10:00:00Z", "DOGEBRL", "Buy", 100.0, 60.0, 0.5),
+        _coinext_order("2021-05-01T10:00:00Z", "DOGEBRL", "Buy", 50.0, 30.0, 0.25),
+        _coinext_order("2021-05-02T10:00:00Z", "LINKBRL", "Buy", 2.0, 200.0, 0.01),
+        _coinext_order("2021-06-01T10:00:00Z", "DOGEBRL", "Sell", -150.0, 120.0, 0.6),
+        _coinext_order("2021-06-02T10:00:00Z", "BTCXYZ", "Buy", 1.0, 1.0, 0.0),
+    ])
+    results = parse_statement(orders, COINEXT_STATEMENT)
+    swaps = results["swaps"].set_index("id")
+
+    doge_buy = swaps.loc["2021-05-01T10:00:00Z"]
+    assert (doge_buy["received_currency"], doge_buy["paid_currency"]) == ("DOGE", "BRL")
+    assert doge_buy["received_amount"] == 150.0
+    assert doge_buy["paid_amount"] == 90.0
+    assert doge_buy["paid_taxes_amount"] == pytest.approx(0.75)
+    assert doge_buy["paid_taxes_currency"] == "DOGE"
+    assert swaps.loc["2021-05-02T10:00:00Z", "received_currency"] == "LINK"
+
+    doge_sell = swaps.loc["2021-06-01T10:00:00Z"]
+    assert (doge_sell["received_currency"], doge_sell["paid_currency"]) == ("BRL", "DOGE")
+    assert (doge_sell["received_amount"], doge_sell["paid_amount"]) == (120.0, 150.0)
+    assert doge_sell["paid_taxes_currency"] == "BRL"
+
+    assert (swaps["exchange_name"] == "coinext").all()
+    assert results["remaining_records"]["Instrument"].tolist() == ["BTCXYZ"]
+    assert results["brl_deposits"].empty
+
+
+def test_coinext_deposits():
+    deposits = pd.DataFrame({
+        "PostingDatetime": ["2021-04-30T12:00:00Z"], "CR": [1000.0], "DR": [0.0]
+    })
+    results = parse_statement(deposits, COINEXT_STATEMENT)
+    assert results["brl_deposits"].to_dict("records") == [{
+        "account_id": "default",
+        "id": "2021-04-30T12:00:00Z",
+        "date": pd.Timestamp("2021-04-30").date(),
+        "value_brl": 1000.0,
+        "exchange_name": "coinext",
+    }]
+    assert results["swaps"].empty
+
+
+def test_coinext_rows_keep_a_single_id():
+    rows = pd.DataFrame([
+        _coinext_order("2021-05-01T10:00:00Z", "DOGEBRL", "Buy", 100.0, 60.0, 0.5),
+        {"PostingDatetime": "2021-04-30T12:00:00Z", "CR": 1000.0},
+    ])
+    results = parse_statement(rows, COINEXT_STATEMENT)
+    assert results["swaps"]["id"].tolist() == ["2021-05-01T10:00:00Z"]
+    assert results["brl_deposits"]["id"].tolist() == ["2021-04-30T12:00:00Z"]
+
+
+def test_biscoint_ids_match_rows_inserted_by_hand():
+    orders = pd.DataFrame({
+        "Data": ["23/04/2021"],
+        "Tipo": ["Compra"],
+        "Moeda": ["BTC"],
+        "Quantidade": [0.0003607],
+        "Valor (R$)": [100.0],
+        "Taxa": [0.0],
+    })
+    swap = parse_statement(orders, BISCOINT_STATEMENT)["swaps"].iloc[0]
+    assert swap["id"] == "biscoint_2021-04-23"
+    assert (swap["received_currency"], swap["paid_currency"]) == ("BTC", "BRL")
+    assert (swap["received_amount"], swap["paid_amount"]) == (0.0003607, 100.0)
+
+
+def test_biscoint_orders_of_the_same_day_get_their_own_ids():
+    orders = pd.DataFrame({
+        "Data": ["23/04/2021"] * 4,
+        "Tipo": ["Compra", "Venda", "Compra", "Compra"],
+        "Moeda": ["BTC", "BTC", "BTC", "ETH"],
+        "Quantidade": [0.0003607, 0.0001, 0.0002, 0.01],
+        "Valor (R$)": [100.0, 30.0, 55.0, 120.0],
+        "Taxa": [0.0, 0.0, 0.0, 0.0],
+    })
+    swaps = parse_statement(orders, BISCOINT_STATEMENT)["swaps"].set_index("id")
+    assert swaps["paid_amount"].to_dict() == {
+        "biscoint_2021-04-23": 100.0,
+        "biscoint_2021-04-23_buy_BTC_2": 55.0,
+        "biscoint_2021-04-23_buy_ETH_1": 120.0,
+        "biscoint_2021-04-23_sell_BTC_1": 0.0001,
+    }
+
+
+def test_statement_rows_belong_to_the_passed_account():
+    orders = pd.DataFrame([
+        _coinext_order("2021-05-01T10:00:00Z", "DOGEBRL", "Buy", 100.0, 60.0, 0.5),
+    ])
+    swaps = parse_statement(orders, COINEXT_STATEMENT, account="alice")["swaps"]
+    assert swaps["account_id"].tolist() == ["alice"]
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.fx import FXMatrix
+
+
+@pytest.fixture
+def fx():
+    quotations = pd.DataFrame(
+        [
+            ("2024-01-01", "USD", "BRL", 5.0),
+            ("2024-01-03", "USD", "BRL", 5.2),
+            ("2024-01-01", "SOL", "USDT", 100.0),
+            ("2024-01-02", "SOL", "USDT", 110.0),
+            ("2024-01-01", "PETR4", "BRL", 38.0),
+        ],
+        columns=["date", "asset", "currency", "value"],
+    )
+    return FXMatrix.from_quotations(quotations, end=pd.Timestamp("2024-01-05"))
+
+
+def test_rates_are_forward_filled_and_triangulated(fx):
+    # SOL -> USDT -> USD -> BRL, with USDT following USD.
+    assert fx.rate("2024-01-01", "SOL") == 500.0
+    assert fx.rate("2024-01-03", "SOL") == pytest.approx(110.0 * 5.2)
+    assert fx.rate("2024-01-05", "USDT") == 5.2
+    assert fx.rate("2024-01-04", "PETR4") == 38.0
+    assert fx.rate("2024-01-02", "BRL") == 1.0
+    assert np.isnan(fx.rate("2023-12-31", "USD"))
+    assert np.isnan(fx.rate("2024-01-02", "XYZ"))
+
+
+def test_convert_matches_rate(fx):
+    dates = np.array(["2024-01-02", "2024-01-03", "2023-12-01", "2024-02-01", "2024-01-02"],
+                     dtype="datetime64[D]")
+    currencies = ["SOL", "USD", "USD", "USDT", "XYZ"]
+    amounts = [2.0, 10.0, 1.0, 3.0, 1.0]
+    converted = fx.convert(amounts, dates, currencies)
+    np.testing.assert_allclose(converted[:2], [2 * 550.0, 52.0])
+    assert np.isnan(converted[2])
+    # Days after the matrix keep its last rates.
+    assert converted[3] == pytest.approx(3 * 5.2)
+    assert np.isnan(converted[4])
+
+
+def test_base_currency_is_worth_one_on_every_day(fx):
+    dates = np.array(["2023-12-01", "2024-01-02", "2025-01-01"], dtype="datetime64[D]")
+    converted = fx.convert([10.0, 20.0, 30.0], dates, ["BRL"] * 3)
+    np.testing.assert_allclose(converted, [10.0, 20.0, 30.0])
+    for day in dates:
+        assert fx.rate(day, "BRL") == 1.0
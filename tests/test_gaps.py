@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+from datetime import date
+
+import pandas as pd
+from src.data_ingestion import gaps as gaps_module
+from src.data_ingestion.calendars import get_trading_days
+from src.data_ingestion.gaps import find_gaps, merge_missing_days, repair_gaps
+
+SERIES = [
+    {"provider": "yfinance", "symbol": "PETR4.SA", "asset": "PETR4", "currency": "BRL",
+     "calendar": "b3"},
+    {"provider": "yfinance", "symbol": "^GSPC", "asset": "S&P500", "currency": "USD",
+     "calendar": "nyse"},
+]
+
+
+def test_b3_calendar_skips_carnival_and_weekends():
+    days = get_trading_days("b3", "2024-02-09", "2024-02-15")
+    # Carnival Monday and Tuesday 2024 were February 12 and 13, after a weekend.
+    assert days.strftime("%Y-%m-%d").tolist() == ["2024-02-09", "2024-02-14", "2024-02-15"]
+    assert pd.Timestamp("2024-11-20") not in get_trading_days("b3", "2024-11-18", "2024-11-22")
+    assert pd.Timestamp("2023-11-20") in get_trading_days("b3", "2023-11-20", "2023-11-20")
+
+
+def test_nyse_calendar_observes_holidays_on_the_nearest_weekday():
+    days = get_trading_days("nyse", "2026-06-29", "2026-07-07")
+    # July 4 2026 is a Saturday, observed on Friday the 3rd.
+    assert days.strftime("%Y-%m-%d").tolist() == [
+        "2026-06-29", "2026-06-30", "2026-07-01", "2026-07-02", "2026-07-06", "2026-07-07"
+    ]
+    assert pd.Timestamp("2024-11-28") not in get_trading_days("nyse", "2024-11-25", "2024-11-29")
+
+
+def test_merge_missing_days_counts_trading_days_apart():
+    trading_days = get_trading_days("b3", "2024-02-01", "2024-02-29")
+    missing = pd.DatetimeIndex(["2024-02-08", "2024-02-15", "2024-02-28"])
+    # February 8 and 15 are three trading days apart, over the carnival.
+    assert merge_missing_days(trading_days, missing, merge_within=3) == [
+        (pd.Timestamp("2024-02-08"), pd.Timestamp("2024-02-15")),
+        (pd.Timestamp("2024-02-28"), pd.Timestamp("2024-02-28")),
+    ]
+    assert len(merge_missing_days(trading_days, missing, merge_within=2)) == 3
+    assert merge_missing_days(trading_days, pd.DatetimeIndex([])) == []
+
+
+def test_find_gaps_ignores_holidays_and_weekends():
+    b3_days = get_trading_days("b3", "2024-02-01", "2024-02-29")
+    nyse_days = get_trading_days("nyse", "2024-02-01", "2024-02-29")
+    stored = pd.concat([
+        pd.DataFrame({"asset": "PETR4", "currency": "BRL", "date": b3_days.drop(
+            pd.DatetimeIndex(["2024-02-08", "2024-02-09", "2024-02-22"])
+        )}),
+        # Presidents' Day, February 19, is not a gap.
+        pd.DataFrame({"asset": "S&P500", "currency": "USD", "date": nyse_days}),
+    ])
+
+    gaps = find_gaps(stored, SERIES, merge_within=1)
+    assert gaps[["asset", "start", "end", "missing_days"]].to_dict("records") == [
+        {"asset": "PETR4", "start": pd.Timestamp("2024-02-08"),
+         "end": pd.Timestamp("2024-02-09"), "missing_days": 2},
+        {"asset": "PETR4", "start": pd.Timestamp("2024-02-22"),
+         "end": pd.Timestamp("2024-02-22"), "missing_days": 1},
+    ]
+    assert gaps["provider"].eq("yfinance").all()
+    assert find_gaps(stored.iloc[:0], SERIES).empty
+
+
+def test_repair_gaps_locks_each_series_and_isolates_failures(monkeypatch):
+    b3_days = get_trading_days("b3", "2024-02-01", "2024-02-29")
+    stored = pd.DataFrame({"asset": "PETR4", "currency": "BRL", "date": b3_days.drop(
+        pd.DatetimeIndex(["2024-02-08", "2024-02-22"])
+    )})
+    queries, locks, persisted = [], [], []
+
+    def read_sql_query(query, params=None):
+        queries.append(params)
+        return stored
+
+    @contextmanager
+    def ingestion_lock(*resources):
+        locks.append(resources)
+        yield
+
+    def fetch(symbol, start_date, end_date):
+        if start_date == "2024-02-08":
+            raise ConnectionError("provider down")
+        return pd.DataFrame({"date": [start_date], "value": [1.0]})
+
+    monkeypatch.setattr(gaps_module, "read_sql_query", read_sql_query)
+    monkeypatch.setattr(gaps_module, "ingestion_lock", ingestion_lock)
+    monkeypatch.setattr(gaps_module, "PROVIDERS", {"yfinance": fetch})
+    monkeypatch.setattr(
+        gaps_module, "ingest_currency_data", lambda data, *_: persisted.append(data)
+    )
+
+    errors = repair_gaps(SERIES, merge_within=1)
+    assert queries == [
+        {"asset_0": "PETR4", "currency_0": "BRL", "asset_1": "S&P500", "currency_1": "USD"}
+    ]
+    assert list(errors) == [("PETR4.SA", date(2024, 2, 8), date(2024, 2, 8))]
+    assert isinstance(errors[("PETR4.SA", date(2024, 2, 8), date(2024, 2, 8))], ConnectionError)
+    assert locks == [(("currencies.quotations", "PETR4/BRL"),)] * 2
+    assert [df["date"].tolist() for df in persisted] == [["2024-02-22"]]
+
+
+def test_repair_gaps_without_series_reads_nothing(monkeypatch):
+    monkeypatch.setattr(gaps_module, "read_sql_query", lambda *args, **kwargs: 1 / 0)
+    assert repair_gaps([]) == {}
@@ -0,0 +1,130 @@
+from contextlib import nullcontext
+
+import pandas as pd
+import pytest
+from src.data_ingestion import binance_api, intraday
+from src.data_ingestion.binance_api import KLINES_LIMIT, format_date, get_binance_klines
+from src.data_ingestion.intraday import downsample_candles, ingest_intraday_candles
+
+
+class FakeKlinesSession:
+    """Serves one candle per `minutes` between startTime and endTime, at most `limit` of them."""
+
+    def __init__(self, minutes):
+        self.step = minutes * 60 * 1000
+        self.calls = []
+
+    def get(self, url, params, timeout):
+        self.calls.append(params)
+        start, end = params["startTime"], params["endTime"]
+        rows = [
+            [ts, "1.0", "2.0", "0.5", "1.5", "10.0"]
+            for ts in range(start, end + 1, self.step)
+        ][:params["limit"]]
+        return FakeResponse(rows)
+
+
+class FakeResponse:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.rows
+
+
+def test_klines_are_paged_across_the_limit(monkeypatch):
+    session = FakeKlinesSession(15)
+    monkeypatch.setattr(binance_api, "get_session", lambda: session)
+    candles = get_binance_klines("btcusdt", "2024-01-01", "2024-01-21", "15m", max_workers=2)
+
+    # 21 days of 96 candles, in pages of at most KLINES_LIMIT candles.
+    assert len(session.calls) == 3
+    assert all(call["limit"] == KLINES_LIMIT for call in session.calls)
+    assert all(call["symbol"] == "BTCUSDT" for call in session.calls)
+    assert len(candles) == 21 * 96
+    assert candles["ts"].is_unique and candles["ts"].is_monotonic_increasing
+    assert candles["ts"].iloc[0] == pd.to_datetime(format_date("2024-01-01"), unit="ms")
+    assert (candles["ts"].diff().dropna() == pd.Timedelta(minutes=15)).all()
+    assert candles["close"].dtype == float
+
+
+def test_klines_without_data_return_none(monkeypatch):
+    session = FakeKlinesSession(60)
+    session.get = lambda url, params, timeout: FakeResponse([])
+    monkeypatch.setattr(binance_api, "get_session", lambda: session)
+    assert get_binance_klines("BTCUSDT", "2024-01-01", "2024-01-01", "1h") is None
+
+
+def test_downsample_candles_aggregates_ohlcv():
+    ts = pd.date_range("2024-01-01", periods=8, freq="6h")
+    candles = pd.concat([
+        pd.DataFrame({
+            "ts": ts,
+            "asset": asset,
+            "currency": "USDT",
+            "open": [1.0, 2, 3, 4, 5, 6, 7, 8],
+            "high": [2.0, 9, 4, 5, 6, 7, 12, 9],
+            "low": [0.5, 1, 2, 3, 4, 1, 6, 7],
+            "close": [2.0, 3, 4, 5, 6, 7, 8, 9],
+            "volume": 1.0 if asset == "BTC" else 2.0,
+        })
+        for asset in ["ETH", "BTC"]
+    ]).sample(frac=1, random_state=0)
+
+    daily = downsample_candles(candles).set_index(["asset", "ts"])
+    btc = daily.loc["BTC"]
+    assert btc.index.tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")]
+    assert btc["open"].tolist() == [1, 5]
+    assert btc["high"].tolist() == [9, 12]
+    assert btc["low"].tolist() == [0.5, 1]
+    assert btc["close"].tolist() == [5, 9]
+    assert btc["volume"].tolist() == [4, 4]
+    assert daily.loc["ETH", "volume"].tolist() == [8, 8]
+
+
+@pytest.fixture
+def ingestion(monkeypatch):
+    fetched, persisted = [], []
+
+    def get_binance_klines(symbol, start_date, end_date, interval):
+        fetched.append((start_date, end_date))
+        return pd.DataFrame({
+            "ts": [pd.Timestamp(start_date)],
+            "open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 1.0,
+        })
+
+    monkeypatch.setattr(intraday, "ingestion_lock", lambda *_: nullcontext())
+    monkeypatch.setattr(intraday, "get_binance_klines", get_binance_klines)
+    monkeypatch.setattr(
+        intraday, "copy_dataframe_to_database", lambda df, *_, **__: persisted.append(df)
+    )
+    return fetched, persisted
+
+
+def test_ingestion_starts_on_the_day_of_the_last_candle(ingestion, monkeypatch):
+    fetched, persisted = ingestion
+    monkeypatch.setattr(
+        intraday, "read_sql_query",
+        lambda query: pd.DataFrame({"max_ts": [pd.Timestamp("2024-03-05 13:45")]}),
+    )
+    assert ingest_intraday_candles("BTCUSDT", "BTC", "USDT", "15m", end_date="2024-03-10") == 1
+    assert fetched == [("2024-03-05", "2024-03-10")]
+    assert persisted[0][["asset", "currency", "interval_minutes"]].iloc[0].tolist() == [
+        "BTC", "USDT", 15
+    ]
+
+
+def test_ingestion_without_candles_starts_on_the_default(ingestion, monkeypatch):
+    fetched, _ = ingestion
+    monkeypatch.setattr(
+        intraday, "read_sql_query", lambda query: pd.DataFrame({"max_ts": [None]})
+    )
+    ingest_intraday_candles("BTCUSDT", "BTC", "USDT", "1h", end_date="2024-03-10")
+    assert fetched == [("2020-01-01", "2024-03-10")]
+
+    fetched.clear()
+    ingest_intraday_candles("BTCUSDT", "BTC", "USDT", "1h", "2023-01-01", "2024-03-10")
+    assert fetched == [("2023-01-01", "2024-03-10")]
@@ -0,0 +1,55 @@
+import os
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+from src.locks import LOCK_WAITS, ingestion_lock, lock_id
+
+TEST_CONN_STR = os.getenv("FINANCES_TEST_CONN_STR")
+
+
+def test_lock_ids_are_stable_signed_64_bit_integers():
+    assert lock_id(("currencies.quotations", "USD/BRL")) == lock_id("currencies.quotations/USD/BRL")
+    assert lock_id("stocks.transactions") != lock_id("stocks.dividends_incomes")
+    assert -2**63 <= lock_id("stocks.transactions") < 2**63
+
+
+def test_ingestion_lock_serializes_jobs_on_the_same_resource(tmp_path):
+    pytest.importorskip("duckdb")
+    conn_str = f"duckdb:///{tmp_path / 'finances.duckdb'}"
+    events = []
+
+    def job(name, resources):
+        with ingestion_lock(*resources, conn_str=conn_str):
+            events.append(f"{name} start")
+            time.sleep(0.05)
+            events.append(f"{name} end")
+
+    # Opposite orders of the same resources must not deadlock.
+    threads = [
+        threading.Thread(target=job, args=("a", ["crypto.swaps", "crypto.withdraws"])),
+        threading.Thread(target=job, args=("b", ["crypto.withdraws", "crypto.swaps"])),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    assert len(events) == 4
+    assert events[0][0] == events[1][0] and events[2][0] == events[3][0]
+    stats = LOCK_WAITS.to_frame()
+    assert stats.loc["crypto.swaps", "acquisitions"] >= 2
+    assert stats.loc["crypto.swaps", "max_wait"] > 0.03
+
+
+@pytest.mark.skipif(TEST_CONN_STR is None, reason="FINANCES_TEST_CONN_STR is not set")
+def test_postgres_advisory_lock_is_visible_to_other_sessions():
+    resource = ("currencies.quotations", "USD/BRL")
+    engine = create_engine(TEST_CONN_STR)
+    try_lock = text("SELECT pg_try_advisory_lock(:id)")
+    with engine.connect() as other:
+        with ingestion_lock(resource, conn_str=TEST_CONN_STR):
+            assert other.execute(try_lock, {"id": lock_id(resource)}).scalar() is False
+        assert other.execute(try_lock, {"id": lock_id(resource)}).scalar() is True
+        other.execute(text("SELECT pg_advisory_unlock_all()"))
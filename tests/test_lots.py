@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.finances_utils import calculate_avg_price
+from src.fx import FXMatrix
+from src.lots import match_lots, swaps_to_trades
+
+
+@pytest.fixture
+def trades():
+    return pd.DataFrame(
+        [
+            ("2024-01-02", "PETR4", 100, 10.0, 1.0),
+            ("2024-01-03", "PETR4", 50, 12.0, 0.0),
+            ("2024-01-04", "VALE3", 10, 60.0, 0.0),
+            ("2024-01-05", "PETR4", -120, 15.0, 2.0),
+            ("2024-01-06", "PETR4", 30, 14.0, 0.0),
+            ("2024-01-07", "PETR4", -40, 13.0, 0.0),
+        ],
+        columns=["date", "ticker", "quantity", "price", "taxes"],
+        index=["a", "b", "c", "d", "e", "f"],
+    )
+
+
+def test_fifo_sells_the_oldest_lots_first(trades):
+    result = match_lots(trades, "fifo")
+    # Lot a costs 10.01 per share, lot b 12.
+    assert result.sales.loc["d", "cost"] == pytest.approx(100 * 10.01 + 20 * 12.0)
+    assert result.sales.loc["d", "realized_gain"] == pytest.approx(120 * 15.0 - 2.0 - 1241.0)
+    assert result.sales.loc["f", "cost"] == pytest.approx(30 * 12.0 + 10 * 14.0)
+    lots = result.lots.set_index("lot")
+    assert lots["quantity"].to_dict() == {"c": 10, "e": 20}
+    assert result.positions.loc["f", "current_quantity"] == 20
+    assert result.positions.loc["f", "avg_price"] == pytest.approx(14.0)
+
+
+def test_specific_lots_fall_back_to_fifo(trades):
+    trades["lot_id"] = [None, None, None, "b", None, "e"]
+    result = match_lots(trades, "specific")
+    # 50 shares of lot b, then 70 of lot a; 30 of lot e, then 10 of lot a.
+    assert result.sales.loc["d", "cost"] == pytest.approx(50 * 12.0 + 70 * 10.01)
+    assert result.sales.loc["f", "cost"] == pytest.approx(30 * 14.0 + 10 * 10.01)
+    assert result.lots.set_index("lot")["quantity"].to_dict() == {"a": 20, "c": 10}
+
+
+def test_oversold_quantity_is_reported(trades):
+    trades.loc["d", "quantity"] = -200
+    result = match_lots(trades, "fifo")
+    assert result.sales.loc["d", "unmatched_quantity"] == 50
+    assert result.positions.loc["d", "current_quantity"] == 0
+
+
+def test_average_mode_matches_calculate_avg_price():
+    rng = np.random.default_rng(0)
+    n = 2000
+    trades = pd.DataFrame({
+        "date": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 300, n), unit="D"),
+        "ticker": rng.choice(["PETR4", "VALE3", "ITUB4"], n),
+        "quantity": rng.integers(-50, 100, n).astype(float),
+        "price": rng.uniform(5, 50, n).round(2),
+        "taxes": rng.uniform(0, 1, n).round(2),
+    })
+    expected = calculate_avg_price(trades.copy()).sort_index()
+    positions = match_lots(trades, "average").positions.sort_index()
+    np.testing.assert_array_equal(positions["avg_price"], expected["avg_price"])
+    np.testing.assert_array_equal(positions["current_quantity"], expected["current_quantity"])
+
+
+def test_swaps_to_trades_values_both_legs_in_brl():
+    fx = FXMatrix.from_quotations(pd.DataFrame(
+        [("2024-01-01", "BTC", "USDT", 40000.0), ("2024-01-01", "USD", "BRL", 5.0)],
+        columns=["date", "asset", "currency", "value"],
+    ))
+    swaps = pd.DataFrame({
+        "id": ["s1", "s2"],
+        "date": ["2024-01-01", "2024-01-01"],
+        "received_amount": [0.5, 10000.0],
+        "paid_taxes_amount": [0.001, 0.0],
+        "paid_amount": [100000.0, 0.25],
+        "received_currency": ["BTC", "USDT"],
+        "paid_taxes_currency": ["BTC", None],
+        "paid_currency": ["BRL", "BTC"],
+    })
+    trades = swaps_to_trades(swaps, fx)
+    assert list(trades.index) == ["default/s1/buy", "default/s2/buy", "default/s2/sell"]
+    assert trades.loc["default/s1/buy", "price"] == 200000.0
+    assert trades.loc["default/s1/buy", "taxes"] == pytest.approx(0.001 * 200000.0)
+    assert trades.loc["default/s2/sell", "price"] == 200000.0
+    assert trades.loc["default/s2/buy", "price"] == 5.0
+    result = match_lots(trades, "fifo")
+    assert result.sales.loc["default/s2/sell", "realized_gain"] == pytest.approx(-0.25 * 400.0)
+
+
+def test_swaps_of_a_day_keep_their_time_order():
+    fx = FXMatrix.from_quotations(pd.DataFrame(
+        [("2024-01-01", "BTC", "BRL", 200000.0), ("2024-01-02", "BTC", "BRL", 300000.0)],
+        columns=["date", "asset", "currency", "value"],
+    ))
+    swaps = pd.DataFrame({
+        "id": ["2024-01-02 20:00:00", "2024-01-01 10:00:00", "2024-01-02 10:00:00"],
+        "date": ["2024-01-02", "2024-01-01", "2024-01-02"],
+        "received_amount": [1.0, 1.0, 150000.0],
+        "paid_taxes_amount": [0.0, 0.0, 0.0],
+        "paid_amount": [300000.0, 200000.0, 0.5],
+        "received_currency": ["BTC", "BTC", "BRL"],
+        "paid_taxes_currency": [None, None, None],
+        "paid_currency": ["BRL", "BRL", "BTC"],
+    })
+    trades = swaps_to_trades(swaps, fx)
+    assert list(trades.index) == [
+        "default/2024-01-01 10:00:00/buy",
+        "default/2024-01-02 10:00:00/sell",
+        "default/2024-01-02 20:00:00/buy",
+    ]
+    # The evening purchase does not change the cost of the morning sale.
+    for method in ["fifo", "average"]:
+        sale = match_lots(trades, method).sales.loc["default/2024-01-02 10:00:00/sell"]
+        assert sale["cost"] == pytest.approx(0.5 * 200000.0)
+
+
+def test_accounts_keep_their_own_lots():
+    fx = FXMatrix.from_quotations(pd.DataFrame(
+        [("2024-01-01", "BTC", "BRL", 200000.0), ("2024-01-02", "BTC", "BRL", 300000.0)],
+        columns=["date", "asset", "currency", "value"],
+    ))
+    # Both accounts swap at the same second, so their swaps share ids.
+    swaps = pd.DataFrame({
+        "account_id": ["1", "2", "1"],
+        "id": ["2024-01-01 10:00:00", "2024-01-01 10:00:00", "2024-01-02 10:00:00"],
+        "date": ["2024-01-01", "2024-01-01", "2024-01-02"],
+        "received_amount": [1.0, 1.0, 300000.0],
+        "paid_taxes_amount": [0.0, 0.0, 0.0],
+        "paid_amount": [200000.0, 200000.0, 1.5],
+        "received_currency": ["BTC", "BTC", "BRL"],
+        "paid_taxes_currency": [None, None, None],
+        "paid_currency": ["BRL", "BRL", "BTC"],
+    })
+    trades = swaps_to_trades(swaps, fx)
+    assert trades.index.is_unique
+    trades["lot_id"] = [None, None, "2/2024-01-01 10:00:00/buy"]
+    for method in ["fifo", "specific", "average"]:
+        result = match_lots(trades, method)
+        # Account 1 sells beyond its own lot, without touching the lot of account 2.
+        sale = result.sales.loc["1/2024-01-02 10:00:00/sell"]
+        assert sale["account_id"] == "1"
+        assert sale["unmatched_quantity"] == pytest.approx(0.0 if method == "average" else 0.5)
+        lots = result.lots.set_index(["account_id", "ticker"])["quantity"]
+        assert lots.loc[("2", "BTC")] == 1.0
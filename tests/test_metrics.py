@@ -0,0 +1,103 @@
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from src.metrics import METRICS_COLUMNS, compute_return_metrics, get_log_growth, run, xirr_batch
+from src.utils import persist_dataframe_to_database, read_sql_query
+
+
+def test_xirr_batch_known_rates():
+    cash_flows = np.array([
+        [-100.0, 110.0, 0.0],
+        [-100.0, 0.0, 121.0],
+        [-100.0, 55.0, 60.5],
+        [-100.0, 0.0, 0.0],
+    ])
+    years = np.array([0.0, 1.0, 2.0])
+    rates = xirr_batch(cash_flows, years)
+    assert rates[:3] == pytest.approx([0.1, 0.1, 0.1], abs=1e-8)
+    assert np.isnan(rates[3])
+
+
+def test_xirr_batch_steep_short_term_loss():
+    # A 30% loss in a month annualizes to about -98.6%.
+    cash_flows = np.array([[-100.0, 70.0]])
+    years = np.array([0.0, 1 / 12])
+    rate = xirr_batch(cash_flows, years)[0]
+    assert (1 + rate) ** (1 / 12) == pytest.approx(0.7, rel=1e-6)
+
+
+def test_log_growth_ignores_contributions():
+    # Buy 100 at start, price +10%, contribute 110 more, then price +10% again and sell all.
+    values = pd.DataFrame({"a": [100.0, 110.0, 220.0, 242.0, 0.0]})
+    flows = pd.DataFrame({"a": [100.0, 0.0, 110.0, 0.0, -242.0]})
+    growth = np.exp(get_log_growth(values, flows)["a"].sum())
+    assert growth == pytest.approx(1.21)
+
+
+def test_compute_return_metrics_twr_and_xirr():
+    dates = pd.date_range("2023-01-01", "2024-01-01", freq="D")
+    values = pd.DataFrame({
+        "a": np.linspace(100.0, 110.0, len(dates)),
+        "b": np.full(len(dates), 50.0),
+    }, index=dates)
+    flows = pd.DataFrame({"a": 0.0, "b": 0.0}, index=dates)
+    flows.iloc[0] = [100.0, 50.0]
+
+    metrics = compute_return_metrics(values, flows, {"a": "stocks", "b": "stocks"}).set_index(
+        ["series", "window"]
+    )
+    assert metrics.loc[("a", "inception"), "twr"] == pytest.approx(0.1)
+    assert metrics.loc[("b", "inception"), "twr"] == pytest.approx(0.0)
+    assert metrics.loc[("stocks", "inception"), "twr"] == pytest.approx(10 / 150)
+    assert metrics.loc[("portfolio", "inception"), "level"] == "portfolio"
+    assert metrics.loc[("a", "inception"), "xirr"] == pytest.approx(0.1, abs=1e-3)
+
+
+def test_compute_return_metrics_ignores_the_time_of_as_of():
+    dates = pd.date_range("2023-01-01", "2024-01-01", freq="D")
+    values = pd.DataFrame({"a": np.linspace(100.0, 110.0, len(dates))}, index=dates)
+    flows = pd.DataFrame({"a": 0.0}, index=dates)
+    flows.iloc[0] = 100.0
+
+    expected = compute_return_metrics(values, flows, as_of=datetime(2023, 12, 1))
+    metrics = compute_return_metrics(values, flows, as_of=pd.Timestamp("2023-12-01 15:30:12"))
+    pd.testing.assert_frame_equal(metrics, expected)
+    assert metrics["start"].isin(dates).all()
+
+
+@pytest.fixture
+def duckdb_conn_str(tmp_path):
+    pytest.importorskip("duckdb")
+    return f"duckdb:///{tmp_path / 'finances.duckdb'}"
+
+
+def test_run_without_records_returns_no_metrics(duckdb_conn_str):
+    metrics = run(duckdb_conn_str, as_of=datetime(2024, 3, 1))
+    assert metrics.empty
+    assert list(metrics.columns) == METRICS_COLUMNS
+
+
+def test_run_persists_a_snapshot_per_day(duckdb_conn_str):
+    persist_dataframe_to_database(
+        pd.DataFrame({
+            "account_id": ["1"], "id": ["1"], "date": [date(2024, 1, 2)],
+            "value_brl": [100.0], "exchange_name": ["binance"],
+        }),
+        "crypto", "brl_deposits", True, duckdb_conn_str, pk_columns=["account_id", "id"],
+    )
+    persist_dataframe_to_database(
+        pd.DataFrame({"date": [date(2024, 1, 2)], "asset": "USD", "currency": "BRL", "value": 5.0}),
+        "currencies", "quotations", True, duckdb_conn_str, pk_columns=["date", "asset", "currency"],
+    )
+    metrics = run(duckdb_conn_str, as_of=datetime(2024, 3, 1, 18))
+    run(duckdb_conn_str, as_of=datetime(2024, 3, 2))
+
+    stored = read_sql_query(
+        "SELECT as_of, series, window_name, twr FROM stocks.return_metrics", duckdb_conn_str
+    )
+    assert len(stored) == 2 * len(metrics)
+    first_day = stored[pd.to_datetime(stored["as_of"]) == "2024-03-01"]
+    assert sorted(first_day["series"].unique()) == ["crypto", "crypto_balance", "portfolio"]
+    assert set(first_day["window_name"]) == set(metrics["window"])
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+from src.data_ingestion.pipeline import run_pipeline
+from src.utils import read_sql_query
+
+pytest.importorskip("duckdb")
+
+
+def _job(asset: str, n_days: int):
+    def fetch() -> pd.DataFrame:
+        return pd.DataFrame({
+            "date": pd.date_range("2024-01-01", periods=n_days).date,
+            "asset": asset,
+            "currency": "BRL",
+            "value": 1.0,
+        })
+    return fetch
+
+
+def _failing_job() -> pd.DataFrame:
+    raise ConnectionError("provider down")
+
+
+def test_run_pipeline_persists_jobs_and_isolates_failures(tmp_path):
+    conn_str = f"duckdb:///{tmp_path / 'finances.duckdb'}"
+    jobs = {f"A{i}": _job(f"A{i}", 10) for i in range(8)}
+    jobs["broken"] = _failing_job
+    jobs["empty"] = lambda: None
+
+    errors = run_pipeline(
+        jobs,
+        "currencies",
+        "quotations",
+        ["date", "asset", "currency"],
+        n_fetchers=3,
+        conn_str=conn_str,
+        max_queue=1,
+        batch_rows=25,
+    )
+
+    assert set(errors) == {"broken"}
+    stored = read_sql_query(
+        "SELECT asset, COUNT(*) AS n, MIN(_processed_at) AS processed_at"
+        " FROM currencies.quotations GROUP BY asset",
+        conn_str,
+    )
+    assert sorted(stored["asset"]) == [f"A{i}" for i in range(8)]
+    assert (stored["n"] == 10).all()
+    assert stored["processed_at"].notna().all()
+
+
+def test_a_bad_frame_only_fails_its_own_job(tmp_path):
+    conn_str = f"duckdb:///{tmp_path / 'finances.duckdb'}"
+    jobs = {f"A{i}": _job(f"A{i}", 10) for i in range(3)}
+    # A NULL key fails the whole batch it is written with.
+    jobs["null_key"] = lambda: _job(None, 10)()
+
+    errors = run_pipeline(
+        jobs,
+        "currencies",
+        "quotations",
+        ["date", "asset", "currency"],
+        n_fetchers=1,
+        conn_str=conn_str,
+        batch_rows=1_000,
+    )
+
+    assert set(errors) == {"null_key"}
+    stored = read_sql_query(
+        "SELECT asset, COUNT(*) AS n FROM currencies.quotations GROUP BY asset", conn_str
+    )
+    assert sorted(stored["asset"]) == ["A0", "A1", "A2"]
+    assert (stored["n"] == 10).all()
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.projections import get_monthly_returns, get_percentile_bands, simulate_wealth_paths
+
+
+def test_constant_returns_match_annuity_formula():
+    rate, contribution, months = 0.01, 100.0, 24
+    paths = simulate_wealth_paths(
+        np.array([rate]), 1000.0, contribution, months, n_paths=3, seed=1, report_every=12
+    )
+    growth = (1 + rate) ** np.array([12, 24])
+    expected = 1000.0 * growth + contribution * (1 + rate) * (growth - 1) / rate
+    assert paths.shape == (3, 2)
+    assert paths == pytest.approx(np.tile(expected, (3, 1)), rel=1e-5)
+
+
+@pytest.mark.parametrize("method", ["bootstrap", "normal"])
+def test_simulation_is_reproducible_across_workers(method):
+    returns = np.random.default_rng(0).normal(0.005, 0.04, 120)
+    kwargs = dict(months=60, n_paths=2_500, method=method, seed=42, chunk_size=1_000)
+    serial = simulate_wealth_paths(returns, 10_000.0, 500.0, n_workers=1, **kwargs)
+    parallel = simulate_wealth_paths(returns, 10_000.0, 500.0, n_workers=2, **kwargs)
+    np.testing.assert_array_equal(serial, parallel)
+
+    bands = get_percentile_bands(serial, pd.Timestamp("2025-01-15"))
+    assert list(bands.columns) == ["p5", "p25", "p50", "p75", "p95", "mean"]
+    assert (bands["p5"] <= bands["p50"]).all() and (bands["p50"] <= bands["p95"]).all()
+
+
+def test_get_monthly_returns_converts_usd_and_rates():
+    dates = pd.to_datetime(["2024-01-31", "2024-02-29", "2024-03-31"])
+    quotations = pd.concat([
+        pd.DataFrame({"date": dates, "asset": "S&P500", "currency": "USD", "value": [100, 110, 110]}),
+        pd.DataFrame({"date": dates, "asset": "USD", "currency": "BRL", "value": [5.0, 5.0, 5.5]}),
+        pd.DataFrame({"date": dates, "asset": "CDI", "currency": "prc", "value": [1.0, 0.9, 0.8]}),
+    ])
+    returns = get_monthly_returns(
+        quotations, {"exterior": ("S&P500", "USD"), "renda_fixa": ("CDI", "prc")}
+    )
+    assert returns["exterior"].tolist() == pytest.approx([0.1, 0.1])
+    assert returns["renda_fixa"].tolist() == pytest.approx([0.009, 0.008])
@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+from src.query_cache import QUERY_CACHE, QueryCache, get_referenced_tables, normalize_sql
+from src.utils import persist_dataframe_to_database, read_sql_query
+
+
+def test_referenced_tables_and_normalization():
+    query = """
+        SELECT t.ticker, d.value
+        FROM stocks.transactions t
+        LEFT JOIN Stocks.Dividends_Incomes d ON d.ticker = t.ticker;
+    """
+    assert get_referenced_tables(query) == ["stocks.dividends_incomes", "stocks.transactions"]
+    assert normalize_sql(query) == normalize_sql(" ".join(query.split()))
+    assert not normalize_sql(query).endswith(";")
+    assert get_referenced_tables(
+        "SELECT * FROM stocks.transactions t, crypto.swaps AS s, currencies.quotations"
+        " WHERE t.date = s.date GROUP BY t.ticker, s.id"
+    ) == ["crypto.swaps", "currencies.quotations", "stocks.transactions"]
+
+
+def test_lru_evicts_least_recently_used():
+    cache = QueryCache(max_entries=2)
+    frames = {key: pd.DataFrame({"x": [i]}) for i, key in enumerate("abc")}
+    cache.put("a", "t", frames["a"], ["s.t"])
+    cache.put("b", "t", frames["b"], ["s.t"])
+    assert cache.get("a", "t") is frames["a"]
+    cache.put("c", "t", frames["c"], ["s.t"])
+    assert cache.get("b", "t") is None
+    assert cache.get("a", "t") is frames["a"]
+    assert cache.get("a", "other token") is None
+
+
+def test_parquet_tier_survives_memory_eviction(tmp_path):
+    pytest.importorskip("pyarrow")
+    cache = QueryCache(max_entries=1, parquet_dir=tmp_path)
+    cache.put("a", "t", pd.DataFrame({"x": [1, 2]}), ["s.t"])
+    cache.put("b", "t", pd.DataFrame({"x": [3]}), ["s.t"])
+    assert cache.get("a", "t")["x"].tolist() == [1, 2]
+    # The hit is back in memory, evicting b to disk.
+    assert list(cache._entries) == ["a"]
+    cache.invalidate("s.t")
+    assert cache.get("a", "t") is None
+
+
+def test_read_sql_query_cache_is_invalidated_by_persist(tmp_path):
+    pytest.importorskip("duckdb")
+    conn_str = f"duckdb:///{tmp_path / 'finances.duckdb'}"
+    QUERY_CACHE.clear()
+    rows = pd.DataFrame({"year_month": ["2024-01-01"], "macroallocation": ["cripto"], "value": [1.0]})
+    persist_dataframe_to_database(
+        rows, "stocks", "allocations", True, conn_str, pk_columns=["year_month", "macroallocation"]
+    )
+    query = "SELECT SUM(value) AS total FROM stocks.allocations"
+
+    hits = QUERY_CACHE.hits
+    assert read_sql_query(query, conn_str, cache=True)["total"].iloc[0] == 1.0
+    assert read_sql_query(query, conn_str, cache=True)["total"].iloc[0] == 1.0
+    assert QUERY_CACHE.hits == hits + 1
+
+    persist_dataframe_to_database(
+        rows.assign(value=5.0), "stocks", "allocations", True, conn_str,
+        pk_columns=["year_month", "macroallocation"],
+    )
+    assert read_sql_query(query, conn_str, cache=True)["total"].iloc[0] == 5.0
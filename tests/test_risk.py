@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.risk import (
+    RollingMetricsCache,
+    compute_rolling_metrics,
+    correlation_matrix,
+    get_drawdowns,
+    get_returns,
+    rolling_beta,
+    rolling_volatility,
+)
+
+
+@pytest.fixture
+def returns():
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2023-01-01", periods=200, freq="D")
+    market = rng.normal(0, 0.01, len(dates))
+    values = pd.DataFrame({
+        "IBOV": market,
+        "PETR4": 1.5 * market + rng.normal(0, 0.005, len(dates)),
+        "BTC": rng.normal(0, 0.03, len(dates)),
+    }, index=dates)
+    # Assets quoted from different days and with gaps.
+    values.iloc[:50, 2] = np.nan
+    values.iloc[120:125, 1] = np.nan
+    return values
+
+
+def test_rolling_volatility_matches_pandas(returns):
+    expected = returns.rolling(30, min_periods=20).std() * np.sqrt(365)
+    pd.testing.assert_frame_equal(rolling_volatility(returns, 30, min_periods=20), expected)
+
+
+def test_rolling_beta_matches_pandas(returns):
+    market = returns["IBOV"]
+    expected = returns["BTC"].rolling(60).cov(market) / market.rolling(60).var()
+    beta = rolling_beta(returns, market, 60)
+    pd.testing.assert_series_equal(beta["BTC"], expected, check_names=False)
+    assert beta["PETR4"].iloc[-1] == pytest.approx(1.5, abs=0.1)
+    assert beta["IBOV"].dropna().to_numpy() == pytest.approx(1.0)
+
+
+def test_correlation_matrix_matches_pandas(returns):
+    pd.testing.assert_frame_equal(correlation_matrix(returns), returns.corr())
+    pd.testing.assert_frame_equal(correlation_matrix(returns, 100), returns.iloc[-100:].corr())
+
+
+def test_drawdowns():
+    prices = pd.DataFrame({"A": [10.0, 12.0, 9.0, 11.0, 13.0, 12.0]})
+    drawdown, max_drawdown = get_drawdowns(prices)
+    np.testing.assert_allclose(drawdown["A"], [0, 0, -0.25, -1 / 12, 0, -1 / 13])
+    np.testing.assert_allclose(max_drawdown["A"], [0, 0, -0.25, -0.25, -0.25, -0.25])
+
+
+def test_rolling_cache_only_recomputes_changed_days(returns, monkeypatch):
+    windows = {"1m": 30}
+    cache = RollingMetricsCache(windows)
+    cache.update(returns.iloc[:150])
+
+    computed_rows = []
+    original = compute_rolling_metrics
+
+    def spy(returns, *args):
+        computed_rows.append(len(returns))
+        return original(returns, *args)
+
+    monkeypatch.setattr("src.risk.compute_rolling_metrics", spy)
+    revised = returns.copy()
+    revised.iloc[149, 0] += 0.01
+    metrics = cache.update(revised)
+
+    assert computed_rows == [30 + 51]
+    pd.testing.assert_frame_equal(metrics, original(revised, windows))
+
+
+def test_get_returns_skips_missing_prices():
+    prices = pd.DataFrame({"A": [1.0, np.nan, 2.0, 4.0]})
+    np.testing.assert_allclose(get_returns(prices)["A"], [np.nan, np.nan, np.log(2)])
@@ -0,0 +1,126 @@
+import threading
+from datetime import datetime
+
+import pytest
+from src.scheduler import CronTrigger, Job, Scheduler, raise_on_errors, run_dag
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("0 2 * * *", datetime(2024, 3, 10, 1, 59), datetime(2024, 3, 10, 2, 0)),
+    ("0 2 * * *", datetime(2024, 3, 10, 2, 0), datetime(2024, 3, 11, 2, 0)),
+    ("*/15 * * * *", datetime(2024, 3, 10, 2, 7, 30), datetime(2024, 3, 10, 2, 15)),
+    # 2024-03-10 is a Sunday, the next weekday is Monday.
+    ("30 8 * * 1-5", datetime(2024, 3, 9, 9, 0), datetime(2024, 3, 11, 8, 30)),
+    ("0 0 1 1,7 *", datetime(2024, 3, 10), datetime(2024, 7, 1)),
+    # Day of month or day of week: the 15th, or any Monday.
+    ("0 0 15 * 1", datetime(2024, 3, 10), datetime(2024, 3, 11)),
+    ("0 0 15 * 1", datetime(2024, 3, 12), datetime(2024, 3, 15)),
+    ("0 0 */10 * 1", datetime(2024, 3, 9), datetime(2024, 3, 11)),
+    # A day of week starting with * is not a restriction: both must match.
+    ("0 0 1-7 * */2", datetime(2024, 3, 9), datetime(2024, 4, 2)),
+])
+def test_cron_trigger_next_after(expression, after, expected):
+    assert CronTrigger(expression).next_after(after) == expected
+
+
+def test_run_dag_runs_independent_jobs_together():
+    barrier = threading.Barrier(2, timeout=5)
+    order = []
+
+    def record(name):
+        order.append(name)
+
+    jobs = [
+        Job("a", barrier.wait),
+        Job("b", barrier.wait),
+        Job("c", record, depends_on=("a", "b"), kwargs={"name": "c"}),
+    ]
+    results = run_dag(jobs, max_workers=2)
+    assert {name: result["status"] for name, result in results.items()} == {
+        "a": "success", "b": "success", "c": "success"
+    }
+    assert order == ["c"]
+
+
+def test_run_dag_retries_and_skips_dependents_of_failures():
+    attempts = {"flaky": 0}
+
+    def flaky():
+        attempts["flaky"] += 1
+        if attempts["flaky"] < 2:
+            raise ConnectionError("timeout")
+
+    def broken():
+        raise ValueError("bad data")
+
+    jobs = [
+        Job("flaky", flaky, retries=1, backoff=0),
+        Job("broken", broken, retries=1, backoff=0),
+        Job("after_flaky", lambda: None, depends_on=("flaky",)),
+        Job("after_broken", lambda: None, depends_on=("broken",)),
+    ]
+    results = run_dag(jobs)
+    assert results["flaky"]["status"] == "success"
+    assert results["flaky"]["attempts"] == 2
+    assert results["broken"]["status"] == "failed"
+    assert results["broken"]["error"] == "ValueError: bad data"
+    assert results["after_flaky"]["status"] == "success"
+    assert results["after_broken"]["status"] == "skipped"
+
+
+def test_run_dag_fails_jobs_reporting_failed_series():
+    attempts = []
+
+    def ingest_series():
+        # Like `ingest_quotation_series`, which logs failed series and returns their errors.
+        attempts.append(1)
+        return {"^GSPC": ConnectionError("timeout")} if len(attempts) < 3 else {}
+
+    jobs = [
+        Job("quotations", ingest_series, retries=1, backoff=0, check=raise_on_errors),
+        Job("gaps", lambda: None, depends_on=("quotations",)),
+    ]
+    results = run_dag(jobs)
+    assert results["quotations"]["status"] == "failed"
+    assert results["quotations"]["attempts"] == 2
+    assert "^GSPC" in results["quotations"]["error"]
+    assert results["gaps"]["status"] == "skipped"
+
+    results = run_dag(jobs)
+    assert results["quotations"]["status"] == "success"
+    assert results["gaps"]["status"] == "success"
+
+
+def test_scheduler_catches_up_and_resumes_interrupted_runs(tmp_path):
+    calls = []
+    fail = {"b": True}
+
+    def job(name):
+        calls.append(name)
+        if fail.get(name):
+            raise RuntimeError("interrupted")
+
+    jobs = [
+        Job("a", job, kwargs={"name": "a"}, retries=0),
+        Job("b", job, depends_on=("a",), kwargs={"name": "b"}, retries=0),
+    ]
+    state_path = tmp_path / "state.json"
+    scheduler = Scheduler(jobs, "0 2 * * *", state_path)
+    scheduler.state["next_run"] = datetime(2024, 3, 9, 2, 0).isoformat()
+
+    # The daemon was down on the 9th and 10th: a single catch-up run starts on the 10th.
+    assert scheduler.run_pending(now=datetime(2024, 3, 10, 12, 0))["status"] == "failed"
+    assert calls == ["a", "b"]
+
+    # Simulate a crash during the run: the next start resumes it without rerunning "a".
+    scheduler.state["runs"][-1]["status"] = "running"
+    scheduler.state["next_run"] = datetime(2024, 3, 9, 2, 0).isoformat()
+    scheduler._save_state()
+    fail["b"] = False
+    restarted = Scheduler(jobs, "0 2 * * *", state_path)
+    run = restarted.run_pending(now=datetime(2024, 3, 10, 12, 5))
+    assert run["status"] == "success"
+    assert calls == ["a", "b", "b"]
+    assert len(restarted.state["runs"]) == 1
+    assert restarted.next_run > datetime.now()
+    assert restarted.run_pending() is None
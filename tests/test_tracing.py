@@ -0,0 +1,63 @@
+from sqlalchemy import create_engine, text
+from src.tracing import (
+    SQLTracer,
+    disable_tracing,
+    explain_command,
+    fingerprint,
+    get_tracer,
+    trace_run,
+    trace_statement,
+)
+
+
+def test_fingerprint_replaces_literals_and_value_lists():
+    assert fingerprint(
+        "SELECT * FROM stocks.transactions\n  WHERE ticker = 'PETR4' AND quantity > 10.5"
+    ) == "SELECT * FROM stocks.transactions WHERE ticker = ? AND quantity > ?"
+    assert fingerprint(
+        "INSERT INTO t (a, b) VALUES (%(a_m0)s, %(b_m0)s), (%(a_m1)s, %(b_m1)s)"
+    ) == fingerprint("INSERT INTO t (a, b) VALUES (%(a_m0)s, %(b_m0)s)")
+    assert fingerprint("SELECT col_1 FROM t1") == "SELECT col_1 FROM t1"
+
+
+def test_trace_run_aggregates_statements_by_fingerprint():
+    engine = create_engine("sqlite://")
+    with trace_run("test") as tracer:
+        with engine.connect() as connection:
+            connection.execute(text("CREATE TABLE t (a INTEGER)"))
+            for value in range(3):
+                connection.execute(text(f"INSERT INTO t VALUES ({value})"))
+        with trace_statement("COPY t FROM STDIN") as traced:
+            traced["rows"] = 7
+
+    report = tracer.report()
+    assert report.loc["INSERT INTO t VALUES (...)", "calls"] == 3
+    assert report.loc["INSERT INTO t VALUES (...)", "rows"] == 3
+    assert report.loc["COPY t FROM STDIN", "rows"] == 7
+    assert list(report.columns) == ["calls", "total_ms", "mean_ms", "max_ms", "rows"]
+    # Tracing stops with the run.
+    assert get_tracer() is None
+
+
+def test_trace_run_disabled_records_nothing():
+    disable_tracing()
+    with trace_run("test", enabled=False) as tracer:
+        with trace_statement("SELECT 1"):
+            pass
+    assert tracer is None
+
+
+def test_only_plain_selects_are_analyzed():
+    assert explain_command("  select * from t") == "EXPLAIN ANALYZE"
+    # A CTE may modify data: ANALYZE would run the DELETE a second time.
+    assert explain_command("WITH d AS (DELETE FROM t RETURNING *) SELECT * FROM d") == "EXPLAIN"
+    assert explain_command("DELETE FROM t") is None
+    assert explain_command("") is None
+
+    tracer = SQLTracer(explain_threshold=10)
+    assert tracer.should_explain("SELECT 1", 0.05)
+    assert not tracer.should_explain("SELECT 1", 0.001)
+    assert not tracer.should_explain("UPDATE t SET a = 1", 0.05)
+    tracer.add_explain("SELECT 1", "Result")
+    # Sampled once per fingerprint.
+    assert not tracer.should_explain("SELECT 2", 0.05)